@@ -0,0 +1,70 @@
+#
+# Scaling of multiprocess fabric simulation with the number of workers.
+#
+#   python benchmarks/fabric_scaling.py [--size 32] [--cycles 50] [--backend bv]
+#
+# Builds a size x size grid of accumulators, each also adding the registered
+# result of its left neighbour, and times the same stimulus single-process
+# and with 1, 2, 4 and 8 workers. Every fabric is built and scheduled
+# before its timer starts. The outputs of every run are checked against
+# the single-process results.
+#
+import argparse
+import time
+import pe
+from pe.pe import DELAY
+from pe.fabric import Fabric
+
+def build(size, backend):
+    f = Fabric(size, size)
+    for x in range(size):
+        for y in range(size):
+            acc = f.place(pe.add().rega(DELAY, 0).regb(DELAY, 0).backend(backend), x, y)
+            f.wire(acc, 'res', acc, 'data0')
+            if x:
+                f.wire(f[x-1, y], 'res', acc, 'data1')
+            else:
+                f.input(y, acc, 'data1')
+    for y in range(size):
+        f.output(y, f[size-1, y], 'res')
+    return f
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=32)
+    parser.add_argument('--cycles', type=int, default=50)
+    parser.add_argument('--backend', default='bv')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    stimulus = [{y: (c * 7 + y) & 0xff for y in range(args.size)}
+                for c in range(args.cycles)]
+
+    fabric = build(args.size, args.backend)
+    fabric.schedule()
+    start = time.perf_counter()
+    expected = list(fabric.run(stimulus))
+    single = time.perf_counter() - start
+
+    print('{} PEs, {} cycles, {} backend'.format(args.size ** 2, args.cycles, args.backend))
+    print('{:>8} {:>10} {:>12} {:>8}'.format('workers', 'seconds', 'cycles/s', 'speedup'))
+    print('{:>8} {:>10.3f} {:>12.1f} {:>8.2f}'.format('single', single, args.cycles / single, 1))
+    for workers in args.workers:
+        fabric = build(args.size, args.backend)
+        fabric.schedule()
+        start = time.perf_counter()
+        results = list(fabric.run(stimulus, workers=workers)) if workers > 1 else \
+                  list(parallel_one(fabric, stimulus))
+        elapsed = time.perf_counter() - start
+        assert results == expected, workers
+        print('{:>8} {:>10.3f} {:>12.1f} {:>8.2f}'.format(
+            workers, elapsed, args.cycles / elapsed, single / elapsed))
+
+def parallel_one(fabric, stimulus):
+    # a single worker process, to show the cost of the process machinery
+    from pe.parallel import ParallelFabric
+    with ParallelFabric(fabric, 1) as f:
+        yield from f.run(stimulus)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#
+# Startup time of the pe package.
+#
+#   python benchmarks/import_time.py [--runs 20]
+#
+# Each case runs in a fresh interpreter; the median wall time over runs is
+# reported along with the time over a bare interpreter. "eager" imports
+# hwtypes up front, as `import pe` did before the lazy imports.
+#
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CASES = [
+    ('python',              'pass',                                   {}),
+    ('import pe',           'import pe',                              {}),
+    ('pe.add() bv',         'import pe; pe.add()(1, 2)',              {}),
+    ('pe.add() int',        'import pe; pe.add()(1, 2)',              {'PE_BACKEND': 'int'}),
+    ('eager',               'import hwtypes, pe.isa; pe.isa.add()(1, 2)', {}),
+]
+
+def run(code, env, runs):
+    env = dict(os.environ, **env)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-W', 'ignore', '-c', code], env=env, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    base = None
+    for name, code, env in CASES:
+        t = run(code, env, args.runs)
+        if base is None:
+            base = t
+        print('{:16} {:8.1f} ms {:+8.1f} ms'.format(name, t * 1e3, (t - base) * 1e3))
+
+if __name__ == '__main__':
+    main()
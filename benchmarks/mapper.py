@@ -0,0 +1,69 @@
+#
+# Mapping time of pe.mapper against kernel size.
+#
+#   python benchmarks/mapper.py [--sizes 4 16 64 256]
+#
+# For n-term dot products and n-input odd-even transposition sorting
+# networks, times tracing and instruction selection (netlist, with the
+# cache cleared), a cached netlist lookup, mapping a second kernel
+# function of the same body, and building the Fabric of PEs.
+#
+# netlist() caches whole kernels by function, not subgraphs: the second
+# kernel shares every node with the first but is traced and selected
+# again, so 'again ms' is close to 'map ms'.
+#
+import argparse
+import inspect
+import time
+from pe import mapper
+
+def kernel(name, n, body):
+    # a kernel of n named inputs x0 ... x{n-1}
+    def f(*xs):
+        return body(list(xs))
+    f.__name__ = '{}{}'.format(name, n)
+    f.__signature__ = inspect.Signature(
+        [inspect.Parameter('x{}'.format(i), inspect.Parameter.POSITIONAL_ONLY) for i in range(n)])
+    return f
+
+def dot(xs):
+    half = len(xs) // 2
+    return sum(a * b for a, b in zip(xs[:half], xs[half:]))
+
+def sort(xs):
+    for k in range(len(xs)):
+        for i in range(k % 2, len(xs) - 1, 2):
+            xs[i], xs[i+1] = mapper.min(xs[i], xs[i+1]), mapper.max(xs[i], xs[i+1])
+    return tuple(xs)
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='*', default=[4, 16, 64, 256])
+    args = parser.parse_args()
+
+    mapper.netlist(kernel('dot', 2, dot)).fabric()  # load hwtypes
+    print('{:10} {:>6} {:>6} {:>10} {:>10} {:>10} {:>10}'.format(
+        'kernel', 'nodes', 'cells', 'map ms', 'cached us', 'again ms', 'fabric ms'))
+    for name, body, scale in [('dot', dot, 2), ('sort', sort, 1)]:
+        for n in args.sizes:
+            if name == 'sort' and n > 64:
+                continue  # n**2 / 2 cells
+            k = kernel(name, n * scale, body)
+            mapper.netlist.cache_clear()
+            netlist, t_map = timed(lambda: mapper.netlist(k))
+            _, t_cached = timed(lambda: mapper.netlist(k))
+            again = kernel(name, n * scale, body)
+            _, t_again = timed(lambda: mapper.netlist(again))
+            _, t_fabric = timed(lambda: netlist.fabric())
+            nodes = len(mapper.trace(k)[2]) - n * scale
+            print('{:10} {:6} {:6} {:10.2f} {:10.2f} {:10.2f} {:10.2f}'.format(
+                k.__name__, nodes, len(netlist.cells), t_map * 1e3, t_cached * 1e6,
+                t_again * 1e3, t_fabric * 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#
+# Memory per PE of PE objects and of a PEArray.
+#
+#   python benchmarks/memory.py [--count 10000]
+#
+# Builds count PEs cycling through every ISA configuration, and measures
+# the memory each representation allocates with tracemalloc.
+#
+import argparse
+import tracemalloc
+from pe.array import PEArray
+from pe.loader import load
+from pe.verify import configs
+
+def measure(build):
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    result = build()
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=10000)
+    args = parser.parse_args()
+
+    constructors = list(configs().values())
+    def pes(backend='bv'):
+        return [constructors[i % len(constructors)][0](*constructors[i % len(constructors)][1])
+                .backend(backend) for i in range(args.count)]
+
+    words = [pe.instruction for pe in pes()[:len(constructors)]]
+    load(words)  # warm the decoder caches
+    prebuilt = pes()
+
+    print('{} PEs'.format(args.count))
+    print('{:>16} {:>12} {:>10}'.format('representation', 'bytes', 'bytes/PE'))
+    for name, build in [('PE bv', pes),
+                        ('PE int', lambda: pes('int')),
+                        ('loader.load', lambda: load(words * (args.count // len(words)))),
+                        ('PEArray', lambda: PEArray.from_pes(prebuilt))]:
+        result, size = measure(build)
+        print('{:>16} {:>12,} {:>10.1f}'.format(name, size, size / len(result)))
+
+if __name__ == '__main__':
+    main()
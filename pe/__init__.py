@@ -1 +1,32 @@
-from .isa import *
+__version__ = '0.1-alpha'
+
+#
+# The isa constructors and profile are imported on first use (PEP 562),
+# so `import pe` does not load hwtypes; it is loaded by the first PE with
+# the bv backend (see pe.pe.BACKEND).
+#
+
+# the isa constructors; pe.isa.__all__ is built from this list
+ISA  = ['or_', 'and_', 'xor']
+ISA += ['shr', 'lshl']
+ISA += ['add', 'sub']
+ISA += ['min', 'max', 'abs']
+ISA += ['ge', 'le']
+ISA += ['sel']
+ISA += ['mul0', 'mul1', 'mul2']
+
+__all__ = ISA + ['profile']
+
+def __getattr__(name):
+    if name in ISA:
+        from . import isa
+        value = getattr(isa, name)
+    elif name == 'profile':
+        from .stats import profile as value
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,166 @@
+import numpy as np
+from . import batch
+from .pe import BYPASS, VALID, DELAY, native
+from .loader import opcodes
+from .bitutils import luteval
+
+__all__ = ['PEArray']
+
+#
+# Struct-of-arrays storage for large PE populations.
+#
+# Configuration and register state live in contiguous numpy arrays with
+# one row per PE, instead of PE, Register and ALU objects:
+#
+#   opcode, flag_sel, irq_en, lut      uint8
+#   signed, carry, debug_trig_p        bool
+#   debug_trig                         uint16
+#   mode, last_clk                     uint8  x 6 registers
+#   value                              uint16 x 6 registers
+#
+# which is 33 bytes per PE; benchmarks/memory.py compares this with PE
+# objects. Only the pe.isa operations can be stored, and LUT code 0
+# stands for no LUT (both evaluate the LUT as 0).
+#
+
+MASK = batch.MASK
+
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+MASKS = np.array([MASK, MASK, MASK, 1, 1, 1], dtype=np.uint32)
+
+FIELDS = [
+    ('opcode', np.uint8, ()),
+    ('signed', bool, ()),
+    ('carry', bool, ()),
+    ('flag_sel', np.uint8, ()),
+    ('irq_en', np.uint8, ()),
+    ('debug_trig', np.uint16, ()),
+    ('debug_trig_p', bool, ()),
+    ('lut', np.uint8, ()),
+    ('mode', np.uint8, (6,)),
+    ('value', np.uint16, (6,)),
+    ('last_clk', np.uint8, (6,)),
+]
+
+class PEArray:
+
+    def __init__(self, n):
+        for name, dtype, shape in FIELDS:
+            setattr(self, name, np.zeros((n,) + shape, dtype))
+        self.mode[:] = BYPASS
+
+    @classmethod
+    def from_pes(cls, pes):
+        array = cls(len(pes))
+        for i, pe in enumerate(pes):
+            array[i] = pe
+        return array
+
+    def __len__(self):
+        return len(self.opcode)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name, dtype, shape in FIELDS)
+
+    def __setitem__(self, i, pe):
+        if pe._opcode not in batch.ALU or not native(pe._alu.op):
+            raise NotImplementedError(pe._opcode)
+        self.opcode[i] = pe._opcode
+        self.signed[i] = pe._alu.signed
+        self.carry[i] = pe._alu._carry
+        self.flag_sel[i] = pe.flag_sel
+        self.irq_en[i] = bool(pe.irq_en_0) | bool(pe.irq_en_1) << 1
+        self.debug_trig[i] = pe._debug_trig & MASK
+        self.debug_trig_p[i] = pe._debug_trig_p & 1
+        self.lut[i] = (pe._lut_code or 0) if pe._lut else 0
+        for j, name in enumerate(REGS):
+            reg = getattr(pe, name)
+            self.mode[i, j] = reg.mode
+            self.value[i, j] = int(reg.value)
+            self.last_clk[i, j] = reg.last_clk
+
+    def __getitem__(self, i):
+        # a PE with the i'th configuration and register state
+        f = opcodes()[int(self.opcode[i])]
+        signed = bool(self.signed[i])
+        pe = f(signed) if f.__code__.co_argcount else f()
+        pe.signed(signed)
+        if self.carry[i]:
+            pe.carry()
+        pe.flag(int(self.flag_sel[i]))
+        pe.irq_en(bool(self.irq_en[i] & 1), bool(self.irq_en[i] & 2))
+        pe.debug_trig(int(self.debug_trig[i])).debug_trig_p(int(self.debug_trig_p[i]))
+        if self.lut[i]:
+            pe.lut(int(self.lut[i]))
+        for j, name in enumerate(['rega', 'regb', 'regc', 'regd', 'rege', 'regf']):
+            getattr(pe, name)(int(self.mode[i, j]), int(self.value[i, j]))
+            getattr(pe, REGS[j]).last_clk = int(self.last_clk[i, j])
+        return pe
+
+    def snapshot(self):
+        # the register state, as pe.checkpoint.snapshot of the PEs
+        from .checkpoint import STATE
+        states = np.zeros(len(self), STATE)
+        states['value'] = self.value
+        states['last_clk'] = (self.last_clk.astype(np.uint8) << np.arange(6, dtype=np.uint8)).sum(1)
+        return states
+
+    def restore(self, states):
+        clocked = (self.mode == DELAY) | (self.mode == VALID)
+        np.copyto(self.value, states['value'], where=clocked)
+        self.last_clk[:] = states['last_clk'][:, None] >> np.arange(6, dtype=np.uint8) & 1
+        return self
+
+    def inputs(self, data0, data1, c, bit0, bit1, bit2):
+        # (n, 6) array of the masked inputs, each a scalar or one per PE
+        inputs = np.empty((len(self), 6), np.uint32)
+        for j, x in enumerate([data0, data1, c, bit0, bit1, bit2]):
+            inputs[:, j] = x
+        return inputs & MASKS
+
+    def eval(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+        # Every PE's __call__ with clk low, returning (res, res_p, irq)
+        # arrays. PEs sharing an operation and flag_sel are evaluated
+        # together by the pe.batch model.
+        n = len(self)
+        regs = np.where(self.mode == BYPASS,
+                        self.inputs(data0, data1, c, bit0, bit1, bit2), self.value)
+        ra, rb, rc, rd, re, rf = regs.T
+        lut = luteval(self.lut, rd, re, rf)
+
+        res = np.zeros(n, np.uint32)
+        res_p = np.zeros(n, bool)
+        keys = (self.opcode.astype(np.uint32) << 8) | (self.signed << 7) | \
+               (self.carry << 6) | self.flag_sel
+        for key in np.unique(keys):
+            key = int(key)
+            opcode, signed, carry, flag_sel = key >> 8, key >> 7 & 1, key >> 6 & 1, key & 0x3f
+            rows = np.flatnonzero(keys == key)
+            a, b, d = ra[rows], rb[rows], rd[rows]
+            r, p = batch.ALU[opcode](a, b, d, signed)
+            if opcode in batch.CARRY and not carry:
+                p = np.zeros(r.shape, bool)
+            res[rows] = r
+            res_p[rows] = batch.get_flag(opcode, flag_sel, a, b, d, r, p, lut[rows])
+
+        irq = ((self.irq_en & 1) != 0) & (res_p != self.debug_trig_p) | \
+              ((self.irq_en & 2) != 0) & (res != self.debug_trig)
+
+        self.last_clk[(self.mode == DELAY) | (self.mode == VALID)] = 0
+        return res.astype(np.uint16), res_p, irq
+
+    def clock(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk_en=1):
+        # The rising clock edge: DELAY registers, and VALID registers if
+        # clk_en, load their inputs.
+        clocked = (self.mode == DELAY) | (self.mode == VALID)
+        load = (self.last_clk == 0) & ((self.mode == DELAY) | (self.mode == VALID) & bool(clk_en))
+        np.copyto(self.value, self.inputs(data0, data1, c, bit0, bit1, bit2),
+                  casting='unsafe', where=load)
+        self.last_clk[clocked] = 1
+
+    def step(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk_en=1):
+        # One cycle: eval with clk low, then the rising edge
+        outputs = self.eval(data0, data1, c, bit0, bit1, bit2)
+        self.clock(data0, data1, c, bit0, bit1, bit2, clk_en)
+        return outputs
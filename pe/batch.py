@@ -0,0 +1,224 @@
+import numpy as np
+from .pe import BYPASS, DATAWIDTH, native
+from .bitutils import luteval
+
+__all__ = ['eval_batch']
+
+MASK = (1 << DATAWIDTH) - 1
+MSB = DATAWIDTH - 1
+
+#
+# Vectorized model of PE.__call__.
+#
+# Every value is held in a uint32 array and masked back to DATAWIDTH bits,
+# so carries out of bit 15 stay visible without widening to 64 bits.
+# The kernels implement the pe.isa ops by opcode; PEs of other ops are
+# evaluated sample by sample with PE.__call__.
+#
+
+def sint(x):
+    return x.astype(np.int32) - ((x >> MSB) << DATAWIDTH).astype(np.int32)
+
+def bit(x, i=MSB):
+    return ((x >> i) & 1).astype(bool)
+
+def ext(x, signed):
+    # 16 -> 32 bit extension, as in a.ext(16)
+    x = x.astype(np.uint64)
+    if signed:
+        x |= (x >> MSB) * np.uint64(0xffff0000)
+    return x
+
+def carry(a, b):
+    return a + b > MASK
+
+def _or(a, b, d, signed):
+    return a | b, carry(a, b)
+
+def _and(a, b, d, signed):
+    return a & b, carry(a, b)
+
+def _xor(a, b, d, signed):
+    return a ^ b, carry(a, b)
+
+def _neg(a, b, d, signed):
+    return (~a + b) & MASK, np.zeros(a.shape, bool)
+
+def _shr(a, b, d, signed):
+    if signed:
+        res = sint(a) >> (b & 0xf).astype(np.int32)
+        return res.astype(np.uint32) & MASK, carry(a, b)
+    return a >> (b & 0xf), carry(a, b)
+
+def _lshl(a, b, d, signed):
+    return (a << (b & 0xf)) & MASK, carry(a, b)
+
+def _add(a, b, d, signed):
+    s = a + b + d
+    return s & MASK, s > MASK
+
+def _sub(a, b, d, signed):
+    return (a - b) & MASK, a + (~b & MASK) + 1 > MASK
+
+def _compare(a, b, signed):
+    return (sint(a), sint(b)) if signed else (a, b)
+
+def _ge(a, b, d, signed):
+    sa, sb = _compare(a, b, signed)
+    res_p = sa >= sb
+    return np.where(res_p, a, b), res_p
+
+def _le(a, b, d, signed):
+    sa, sb = _compare(a, b, signed)
+    res_p = sa <= sb
+    return np.where(res_p, a, b), res_p
+
+def _abs(a, b, d, signed):
+    if signed:
+        return np.where(bit(a), -a & MASK, a), bit(a)
+    return a, bit(a)
+
+def _sel(a, b, d, signed):
+    return np.where(d != 0, a, b), carry(a, b)
+
+def _mul(shift):
+    def mul(a, b, d, signed):
+        p = ext(a, signed) * ext(b, signed)
+        res = (p >> np.uint64(shift)) & np.uint64(MASK)
+        return res.astype(np.uint32), np.zeros(a.shape, bool)
+    return mul
+
+ALU = {
+    0x12: _or,
+    0x13: _and,
+    0x14: _xor,
+    0x15: _neg,
+    0xf:  _shr,
+    0x11: _lshl,
+    0x0:  _add,
+    0x1:  _sub,
+    0x4:  _ge,
+    0x5:  _le,
+    0x3:  _abs,
+    0x8:  _sel,
+    0xb:  _mul(0),
+    0xc:  _mul(8),
+    0xd:  _mul(16),
+}
+
+# ops whose res_p is the carry out of a + b, set by PE.carry()
+CARRY = [0x12, 0x13, 0x14, 0xf, 0x11, 0x8]
+
+def flags(opcode, ra, rb, rd, res):
+    Z = res == 0
+    if opcode == 0x0: # add
+        C = ra + rb + rd > MASK
+    elif opcode in [0x1, 0x4, 0x5]: # sub
+        C = ra + (~rb & MASK) + 1 > MASK
+    elif opcode == 0x3: # abs
+        C = ra == 0
+    else:
+        C = carry(ra, rb)
+    N = bit(res)
+    a15, b15 = bit(ra), bit(rb)
+    if opcode == 0x0: # add
+        V = (a15 == b15) & (a15 != bit(ra + rb + rd))
+    elif opcode == 0x1: # sub
+        V = (a15 != b15) & (a15 != bit(ra + (~rb & MASK) + 1))
+    elif opcode == 0x3: # abs
+        V = ra == 0x8000
+    elif opcode in [0xb, 0xc]: # mul0, mul1
+        p15 = bit((ra * rb) & MASK)
+        V = np.where(a15 == b15, p15, ~p15 & ((ra != 0) | (rb != 0)))
+    elif opcode in [0xd, 0x4, 0x5,
+                    0x12, 0x13, 0x14,  # and, or, xor clear overflow flag
+                    0xf, 0x11,         # lshl, lshr
+                    0x8]:              # sel
+        V = np.zeros(res.shape, bool)
+    else:
+        V = (a15 == b15) & (a15 != bit(ra + rb))
+    return Z, C, N, V
+
+def get_flag(opcode, flag_sel, ra, rb, rd, res, res_p, lut_out):
+    Z, C, N, V = flags(opcode, ra, rb, rd, res)
+    if flag_sel == 0x0:
+        return Z
+    elif flag_sel == 0x1:
+        return ~Z
+    elif flag_sel == 0x2:
+        return C
+    elif flag_sel == 0x3:
+        return ~C
+    elif flag_sel == 0x4:
+        return N
+    elif flag_sel == 0x5:
+        return ~N
+    elif flag_sel == 0x6:
+        return V
+    elif flag_sel == 0x7:
+        return ~V
+    elif flag_sel == 0x8:
+        return C & ~Z
+    elif flag_sel == 0x9:
+        return ~C | Z
+    elif flag_sel == 0xA:
+        return N == V
+    elif flag_sel == 0xB:
+        return N != V
+    elif flag_sel == 0xC:
+        return ~Z & (N == V)
+    elif flag_sel == 0xD:
+        return Z | (N != V)
+    elif flag_sel == 0xE:
+        return lut_out
+    elif flag_sel == 0xF:
+        return res_p
+    raise NotImplementedError(flag_sel)
+
+def register(reg, value, mask):
+    # DELAY and VALID registers hold their value while clk stays low,
+    # which is what the scalar path sees with the default clk=0
+    if reg.mode == BYPASS:
+        return np.asarray(value, dtype=np.uint32) & mask
+    return np.uint32(int(reg.value))
+
+def scalar(pe, *inputs):
+    inputs = np.broadcast_arrays(*[np.asarray(x, dtype=np.uint32) for x in inputs])
+    shape = inputs[0].shape
+    results = [pe(*sample) for sample in zip(*[x.ravel().tolist() for x in inputs])]
+    res, res_p, irq = zip(*results) if results else ((), (), ())
+    return np.array(res, np.uint16).reshape(shape), \
+           np.array(res_p, bool).reshape(shape), \
+           np.array(irq, bool).reshape(shape)
+
+def eval_batch(pe, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+    if not native(pe._alu.op):
+        return scalar(pe, data0, data1, c, bit0, bit1, bit2)
+    if pe._opcode not in ALU:
+        raise NotImplementedError(pe._opcode)
+
+    ra = register(pe.RegA, data0, MASK)
+    rb = register(pe.RegB, data1, MASK)
+    rc = register(pe.RegC, c, MASK)
+    rd = register(pe.RegD, bit0, 1)
+    re = register(pe.RegE, bit1, 1)
+    rf = register(pe.RegF, bit2, 1)
+    ra, rb, rc, rd, re, rf = np.broadcast_arrays(ra, rb, rc, rd, re, rf)
+
+    res, alu_res_p = ALU[pe._opcode](ra, rb, rd, pe._alu.signed)
+    if pe._opcode in CARRY and not pe._alu._carry:
+        alu_res_p = np.zeros(res.shape, bool)
+
+    lut_out = np.zeros(res.shape, bool)
+    if pe._lut:
+        lut_out = luteval(pe._lut_code, rd, re, rf)
+
+    res_p = get_flag(pe._opcode, pe.flag_sel, ra, rb, rd, res, alu_res_p, lut_out)
+
+    irq = np.zeros(res.shape, bool)
+    if pe.irq_en_0:
+        irq |= res_p != pe._debug_trig_p
+    if pe.irq_en_1:
+        irq |= res != (pe._debug_trig & MASK)
+
+    return res.astype(np.uint16), res_p, irq
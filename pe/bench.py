@@ -0,0 +1,157 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+import numpy as np
+from .pe import Register, ALU, COND, CONST, VALID, BYPASS, DELAY, DATAWIDTH
+from .config import config
+from .bitutils import lutinit, fun2seq, fun2planes, lutinits, luteval
+from . import bitslice
+from .fabric import Fabric
+from .isa import add as pe_add, sub as pe_sub
+from .verify import configs
+
+__all__ = ['benchmarks', 'measure', 'compare']
+
+#
+# Microbenchmarks of the PE evaluation hot paths.
+#
+#   python -m pe.bench [-o results.json] [--compare baseline.json] [filter...]
+#
+# Each benchmark reports evaluations per second (best of --repeat runs).
+# With --compare, any benchmark slower than the baseline by more than
+# --threshold is reported and the exit status is 1.
+#
+
+def benchmarks():
+    # name -> zero-argument callable to time
+    result = {}
+
+    for name, (f, args) in configs().items():
+        pe = f(*args)
+        result['pe.call.' + name] = lambda pe=pe: pe(0x1234, 0x0567, 0, 1)
+        pe = f(*args).backend('int')
+        result['pe.call.int.' + name] = lambda pe=pe: pe(0x1234, 0x0567, 0, 1)
+        compiled = f(*args).backend('int').compile()
+        result['pe.compiled.int.' + name] = lambda f=compiled: f(0x1234, 0x0567, 0, 1)
+
+    for mode, name in [(CONST, 'const'), (VALID, 'valid'), (BYPASS, 'bypass'), (DELAY, 'delay')]:
+        reg = Register(mode, 0, DATAWIDTH)
+        result['register.' + name] = lambda reg=reg: reg(0x1234, 1, 1)
+
+    alu = ALU(lambda a, b, c, d: a + b, 0x0, DATAWIDTH)
+    result['alu'] = lambda: alu(0x1234, 0x0567, 0, 1)
+
+    f, args = configs()['sub']
+    pe = f(*args)
+    ra, rb = pe.RegA(0x1234, 0, 1), pe.RegB(0x0567, 0, 1)
+    rc, rd = pe.RegC(0, 0, 1), pe.RegD(1, 0, 1)
+    res, res_p = pe._alu(ra, rb, rc, rd)
+    for flag_sel in range(16):
+        pe = f(*args).flag(flag_sel).lut(0x96)
+        result['get_flag.{:x}'.format(flag_sel)] = \
+            lambda pe=pe: pe.get_flag(ra, rb, rc, rd, res, res_p, 1)
+    for signed, suffix in [(False, ''), (True, '_s')]:
+        cond = COND(lambda ge, eq, le: ge, signed)
+        result['cond.compare' + suffix] = lambda cond=cond: cond.compare(ra, rb, res)
+
+    # compiled for res only: no flag or irq logic
+    for name in ['add', 'mul0_s']:
+        f, args = configs()[name]
+        compiled = f(*args).backend('int').flag(0x6).irq_en().compile({'res'})
+        result['pe.compiled.int.res.' + name] = lambda f=compiled: f(0x1234, 0x0567, 0, 1)
+
+    # a chain of 16 int add/sub PEs, per PE and fused
+    for fused in [False, True]:
+        chain = Fabric()
+        prev = None
+        for x in range(16):
+            p = chain.place((pe_add() if x % 2 else pe_sub()).backend('int'), x, 0)
+            if prev is None:
+                chain.input('a', p, 'data0')
+            else:
+                chain.wire(prev, 'res', p, 'data0')
+            chain.input('b', p, 'data1')
+            prev = p
+        chain.output('out', prev, 'res').fuse(fused).schedule()
+        result['fabric.chain16' + ('.fused' if fused else '')] = \
+            lambda chain=chain: chain.step({'a': 0x1234, 'b': 0x0567})
+
+    result['config'] = lambda: config('r' * 14 + 'ffffiia00soooooo',
+                                      o=0x1, s=0, a=0, i=0, f=0x6, r=0x2aa)
+    result['pe.instruction'] = lambda pe=pe: pe.instruction
+
+    # every 3-input LUT, as a (256, 8) table
+    luts = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    result['bitutils.fun2seq'] = lambda: fun2seq(lambda a, b, c: a ^ b ^ c)
+    result['bitutils.lutinit'] = lambda: lutinit(lambda a, b, c: a and b or c, 8)
+    result['bitutils.fun2planes'] = lambda: fun2planes(lambda a, b, c: a ^ b ^ c)
+    wide = lambda *bits: (bits[0] ^ bits[3]) & bits[7] | bits[15]
+    result['bitutils.fun2seq.16'] = lambda: fun2seq(wide, 1 << 16)
+    result['bitutils.fun2planes.16'] = lambda: fun2planes(wide, 1 << 16)
+    result['bitutils.lutinits.256'] = lambda: lutinits(luts)
+
+    # 1-bit logic over 64k cases, as bool arrays and bit-sliced words
+    rng = np.random.default_rng(0)
+    bits = rng.integers(0, 2, (4, 1 << 16)).astype(bool)
+    words = [bitslice.pack(x) for x in bits]
+    result['lut.batch.64k'] = lambda: luteval(0x96, *bits[:3])
+    result['lut.bitslice.64k'] = lambda: bitslice.lut(0x96, *words[:3])
+    result['flag.batch.64k'] = lambda: ~bits[0] & (bits[2] == bits[3])
+    result['flag.bitslice.64k'] = lambda: bitslice.flag(0xC, *words, 0, 0)
+
+    return result
+
+def measure(f, repeat=5, min_time=0.05):
+    timer = timeit.Timer(f)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / elapsed))
+    best = min(timer.repeat(repeat, number)) / number
+    return {'seconds': best, 'per_second': 1 / best}
+
+def compare(results, baseline, threshold=0.1):
+    # (name, ratio of evaluations per second) for benchmarks slower than
+    # the baseline by more than threshold
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result['per_second'] / baseline[name]['per_second']
+            if ratio < 1 - threshold:
+                regressions.append((name, ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pe.bench')
+    parser.add_argument('filters', nargs='*', help='only run benchmarks containing these')
+    parser.add_argument('-o', '--output', help='write results as JSON')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, f in benchmarks().items():
+        if args.filters and not any(s in name for s in args.filters):
+            continue
+        results[name] = measure(f, args.repeat)
+        print('{:32} {:14,.0f} /s'.format(name, results[name]['per_second']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'time': time.time(),
+                       'results': results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, ratio in regressions:
+            print('REGRESSION {:32} {:6.1%} of baseline'.format(name, ratio))
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
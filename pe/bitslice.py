@@ -0,0 +1,97 @@
+import numpy as np
+from .pe import DATAWIDTH, native
+from . import batch
+
+__all__ = ['pack', 'unpack', 'planes', 'lut', 'flag', 'predicate']
+
+#
+# Bit-sliced evaluation of the PE's 1-bit logic.
+#
+# 64 independent cases share each uint64 word, case i in bit i % 64 of
+# word i // 64, so the LUT and the get_flag equations run as bitwise
+# operations on whole words. Cases can be test vectors for one PE or 64
+# PEs with different LUT codes (given as code planes, see lut()).
+#
+# Only the 1-bit logic is sliced. The ALU and its Z, C, N and V flags are
+# left to pe.batch (batch.flags), whose results are packed once: over bit
+# planes, a ripple-carry chain alone costs more than pe.batch takes for
+# the whole flag computation.
+#
+# predicate() puts the two together: res_p of a PE for arrays of inputs,
+# as packed words.
+#
+
+def pack(bits):
+    # bool array of n cases -> ceil(n / 64) uint64 words
+    packed = np.packbits(np.asarray(bits, dtype=bool), bitorder='little')
+    words = np.zeros(-(-len(packed) // 8) * 8, np.uint8)
+    words[:len(packed)] = packed
+    return words.view('<u8')
+
+def unpack(words, n):
+    bits = np.unpackbits(np.asarray(words, dtype='<u8').view(np.uint8), bitorder='little')
+    return bits[:n].astype(bool)
+
+def planes(values, width=DATAWIDTH):
+    # (width, words) bit planes of an array of values, lsb first
+    values = np.asarray(values)
+    return np.stack([pack((values >> j) & 1) for j in range(width)])
+
+def lut(code, d, e, f):
+    # The LUT as a sum of minterms. code is an int, or (8, words) planes
+    # of per-case codes with plane r holding bit r of each code.
+    out = np.zeros_like(d)
+    for row in range(8):
+        if np.ndim(code) == 0 and not (code >> row) & 1:
+            continue
+        term = (d if row & 1 else ~d) & (e if row & 2 else ~e) & (f if row & 4 else ~f)
+        out |= term if np.ndim(code) == 0 else term & code[row]
+    return out
+
+# flag_sel -> predicate, as pe.FLAGS over words
+FLAGS = [
+    lambda Z, C, N, V, lut, p: Z,
+    lambda Z, C, N, V, lut, p: ~Z,
+    lambda Z, C, N, V, lut, p: C,
+    lambda Z, C, N, V, lut, p: ~C,
+    lambda Z, C, N, V, lut, p: N,
+    lambda Z, C, N, V, lut, p: ~N,
+    lambda Z, C, N, V, lut, p: V,
+    lambda Z, C, N, V, lut, p: ~V,
+    lambda Z, C, N, V, lut, p: C & ~Z,
+    lambda Z, C, N, V, lut, p: ~C | Z,
+    lambda Z, C, N, V, lut, p: ~(N ^ V),
+    lambda Z, C, N, V, lut, p: N ^ V,
+    lambda Z, C, N, V, lut, p: ~Z & ~(N ^ V),
+    lambda Z, C, N, V, lut, p: Z | (N ^ V),
+    lambda Z, C, N, V, lut, p: lut,
+    lambda Z, C, N, V, lut, p: p,
+]
+
+def flag(flag_sel, Z, C, N, V, lut, p):
+    if flag_sel not in range(len(FLAGS)):
+        raise NotImplementedError(flag_sel)
+    return FLAGS[flag_sel](Z, C, N, V, lut, p)
+
+def predicate(pe, data0=0, data1=0, bit0=0, bit1=0, bit2=0):
+    # packed res_p of PE.__call__ for arrays of inputs
+    if not native(pe._alu.op) or pe._opcode not in batch.ALU:
+        raise NotImplementedError(pe._opcode)
+
+    ra = batch.register(pe.RegA, data0, batch.MASK)
+    rb = batch.register(pe.RegB, data1, batch.MASK)
+    rd = batch.register(pe.RegD, bit0, 1)
+    re = batch.register(pe.RegE, bit1, 1)
+    rf = batch.register(pe.RegF, bit2, 1)
+    ra, rb, rd, re, rf = np.broadcast_arrays(ra, rb, rd, re, rf)
+
+    res, p = batch.ALU[pe._opcode](ra, rb, rd, pe._alu.signed)
+    if pe._opcode in batch.CARRY and not pe._alu._carry:
+        p = np.zeros(res.shape, bool)
+    Z, C, N, V = [pack(x) for x in batch.flags(pe._opcode, ra, rb, rd, res)]
+
+    d = pack(rd)
+    out = np.zeros_like(d)
+    if pe._lut:
+        out = lut(pe._lut_code, d, pack(re), pack(rf))
+    return flag(pe.flag_sel, Z, C, N, V, out, pack(p))
@@ -1,11 +1,13 @@
 # https://wiki.python.org/moin/BitManipulation
 # https://code.google.com/p/python-bitstring/
 from types import FunctionType
-from collections import Sequence
-import inspect
+from collections.abc import Sequence
+from itertools import product
+import numpy as np
 from .compatibility import StringTypes
 
 __all__  = ['seq2int', 'int2seq', 'ints2seq', 'fun2seq', 'lutinit']
+__all__ += ['bitplanes', 'fun2planes', 'lutinits', 'luteval']
 __all__ += ['int2uint', 'clz', 'pow2', 'log2', 'clog2', 'rol', 'ror']
 
 #
@@ -47,21 +49,67 @@ def ints2seq(l, n):
 #
 def fun2seq(f, n=None):
     if not n:
-        logn = len(inspect.getargspec(f).args)
+        import inspect
+        logn = len(inspect.signature(f).parameters)
         n = 1 << logn
     else:
         logn = log2(n)
     
-    l = []
-    for i in range(n):
-         arg = int2seq(i, logn)
-         l.append(1 if f(*arg) else 0)
-    return l
+    # product counts with the first argument as msb; rows want it as lsb
+    return [1 if f(*arg[::-1]) else 0
+            for arg in product((0, 1), repeat=logn)][:n]
+
+#
+# bit planes
+#
+# bitplanes(n)[j][i] is bit j of row i, the j'th argument fun2seq passes
+# for row i, so a function of boolean arrays written with &, |, ^ and ~
+# gives the whole table from one call.
+#
+def bitplanes(n):
+    rows = np.arange(n)
+    return [((rows >> j) & 1).astype(bool) for j in range(log2(n))]
+
+def fun2planes(f, n=None):
+    if not n:
+        import inspect
+        n = 1 << len(inspect.signature(f).parameters)
+    return np.broadcast_to(np.asarray(f(*bitplanes(n)), dtype=bool), (n,))
+
+def lutinits(table):
+    # Init words for boolean tables of shape (..., n), row 0 the lsb;
+    # uint64 for n <= 64, python ints otherwise.
+    table = np.asarray(table, dtype=bool)
+    n = table.shape[-1]
+    packed = np.packbits(table, axis=-1, bitorder='little')
+    if n <= 64:
+        words = np.zeros(table.shape[:-1] + (8,), np.uint8)
+        words[..., :packed.shape[-1]] = packed
+        return words.view('<u8')[..., 0]
+    rows = packed.reshape(-1, packed.shape[-1])
+    words = np.empty(len(rows), dtype=object)
+    words[:] = [int.from_bytes(row.tobytes(), 'little') for row in rows]
+    return words.reshape(table.shape[:-1])
+
+def luteval(code, *bits):
+    # LUT outputs for arrays of input bits, bits[0] the lsb of the row
+    assert len(bits) <= 6, len(bits)
+    row = np.uint64(0)
+    for j, bit in enumerate(bits):
+        row = row | (np.asarray(bit, dtype=np.uint64) << np.uint64(j))
+    return ((np.asarray(code, dtype=np.uint64) >> row) & np.uint64(1)).astype(bool)
 
 def lutinit(init, n=None):
     if isinstance(init, FunctionType):
         init = fun2seq(init, n)
 
+    if isinstance(init, np.ndarray):
+        nlut = len(init)
+        if n != nlut:
+            assert n % nlut == 0
+            init = np.tile(init, n//nlut)
+        init = int(lutinits(init))
+
     if isinstance(init, Sequence):
         nlut = len(init)
         if n != nlut:
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from . import __version__
+from .pe import native
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+__all__ = ['ResultCache', 'DIRECTORY']
+
+#
+# Persistent cache of PE.eval_batch results.
+#
+# Results are stored as .npy files named by a hash of the PE
+# configuration (instruction word, register modes and values, LUT code,
+# debug triggers), the input arrays and the package version, with
+#
+#   res | res_p << 16 | irq << 17
+#
+# packed into a uint32 per vector, as in pe.table. Hits are memory-mapped.
+#
+# Files are written to a temporary name and renamed into place, so any
+# number of processes can read and write one directory. Reading a file
+# marks it recently used (its mtime); after a write the least recently
+# used files are removed, under an flock, until the directory is within
+# max_bytes.
+#
+# The configuration identifies the op by its opcode, which holds for the
+# pe.isa PEs only; PEs of other ops are refused.
+#
+
+DIRECTORY = os.environ.get('PE_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'pe'))
+MAX_BYTES = 1 << 30
+
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+
+def config(pe):
+    if not native(pe._alu.op):
+        raise NotImplementedError(pe._opcode)
+    return (pe.instruction, bool(pe._alu.signed), pe._alu._carry,
+            tuple((getattr(pe, name).mode, int(getattr(pe, name).value)) for name in REGS),
+            pe._lut_code if pe._lut else None,
+            pe._debug_trig, pe._debug_trig_p)
+
+class ResultCache:
+
+    def __init__(self, directory=DIRECTORY, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, pe, *inputs):
+        h = hashlib.sha256(repr((__version__, config(pe))).encode())
+        for x in inputs:
+            x = np.ascontiguousarray(x)
+            h.update('{} {}'.format(x.dtype, x.shape).encode())
+            h.update(x.tobytes())
+        return h.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            data = np.load(path, mmap_mode='r')
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return data
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, data)
+            os.replace(tmp, self.path(key))
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self.evict()
+
+    @contextmanager
+    def lock(self):
+        with open(os.path.join(self.directory, 'lock'), 'w') as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def evict(self):
+        with self.lock():
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.npy'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for mtime, size, path in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            with self.lock():
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith('.npy'):
+                        os.unlink(entry.path)
+
+    def eval_batch(self, pe, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+        # pe.eval_batch(...), from the cache when these inputs have been
+        # evaluated for the same configuration before
+        key = self.key(pe, data0, data1, c, bit0, bit1, bit2)
+        data = self.get(key)
+        if data is None:
+            self.misses += 1
+            res, res_p, irq = pe.eval_batch(data0, data1, c, bit0, bit1, bit2)
+            data = res.astype(np.uint32) | (res_p.astype(np.uint32) << 16) \
+                                         | (irq.astype(np.uint32) << 17)
+            self.put(key, data)
+        else:
+            self.hits += 1
+        return (data & 0xffff).astype(np.uint16), \
+               ((data >> 16) & 1).astype(bool), \
+               (data >> 17).astype(bool)
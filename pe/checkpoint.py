@@ -0,0 +1,96 @@
+import multiprocessing
+import numpy as np
+from .pe import PE, CONST, BYPASS
+
+__all__ = ['STATE', 'snapshot', 'restore', 'branch']
+
+#
+# Checkpointing of PE state.
+#
+# The mutable state of a PE is its register values and clocks and the
+# debug trigger flags of the last evaluation; its configuration is not
+# part of the state. The state of n PEs is an (n,) array of STATE records,
+#
+#   value       uint16 x 6 registers
+#   last_clk    uint8, bit j for register j
+#   trig        uint8, raise_debug_trig | raise_debug_trig_p << 1
+#
+# 14 bytes per PE. PE.snapshot() gives one record as bytes.
+#
+# branch() runs many what-if simulations from one checkpoint: the worker
+# processes are forked after the checkpoint is taken, so the warmed-up
+# PEs and the state array are shared copy-on-write, and each scenario
+# starts by restoring the checkpoint in its worker.
+#
+
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+
+STATE = np.dtype([('value', '<u2', (6,)), ('last_clk', 'u1'), ('trig', 'u1')])
+
+def pes(target):
+    # the PEs of a PE, a Fabric or a sequence of PEs
+    if isinstance(target, PE):
+        return [target]
+    return getattr(target, 'pes', target)
+
+def snapshot(target):
+    pes_ = pes(target)
+    states = np.zeros(len(pes_), STATE)
+    value, last_clk, trig = states['value'], states['last_clk'], states['trig']
+    for i, pe in enumerate(pes_):
+        for j, name in enumerate(REGS):
+            reg = getattr(pe, name)
+            value[i, j] = int(reg.value)
+            last_clk[i] |= bool(reg.last_clk) << j
+        trig[i] = bool(getattr(pe, 'raise_debug_trig', False)) | \
+                  bool(getattr(pe, 'raise_debug_trig_p', False)) << 1
+    return states
+
+def restore(target, states):
+    # Load states (from snapshot(), or its bytes) into target. Only
+    # clocked registers take their value from the state; CONST and BYPASS
+    # values are configuration.
+    pes_ = pes(target)
+    if isinstance(states, (bytes, bytearray, memoryview)):
+        states = np.frombuffer(states, STATE)
+    if len(states) != len(pes_):
+        raise ValueError('{} states for {} PEs'.format(len(states), len(pes_)))
+    value = states['value'].tolist()
+    last_clk = states['last_clk'].tolist()
+    trig = states['trig'].tolist()
+    for i, pe in enumerate(pes_):
+        for j, name in enumerate(REGS):
+            reg = getattr(pe, name)
+            if reg.mode not in (CONST, BYPASS):
+                reg.value = type(reg)(reg.mode, value[i][j], reg.width).value
+            reg.last_clk = last_clk[i] >> j & 1
+        pe.raise_debug_trig = bool(trig[i] & 1)
+        pe.raise_debug_trig_p = bool(trig[i] & 2)
+    return target
+
+# (target, checkpoint, run) of the branch() in progress, inherited by the
+# forked workers
+BRANCH = None
+
+def scenario(arg):
+    target, checkpoint, run = BRANCH
+    restore(target, checkpoint)
+    return run(target, arg)
+
+def branch(target, scenarios, run, workers=None):
+    # [run(target, s) for s in scenarios], each starting from target's
+    # current state, which target is left in. workers=1 runs them in this
+    # process.
+    global BRANCH
+    checkpoint = snapshot(target)
+    scenarios = list(scenarios)
+    BRANCH = (target, checkpoint, run)
+    try:
+        if workers == 1 or len(scenarios) < 2:
+            return [scenario(s) for s in scenarios]
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            return pool.map(scenario, scenarios)
+    finally:
+        BRANCH = None
+        restore(target, checkpoint)
@@ -1,39 +1,62 @@
+from functools import lru_cache
+
+__all__ = ['Field', 'Format', 'config']
+
 class Field:
     def __init__(self, start):
         self.start = start
         self.width = 1
 
+    @property
+    def shift(self):
+        return self.start - self.width
+
+    @property
+    def mask(self):
+        return (1 << (self.width)) - 1
+
     def __call__(self, value):
-        mask = (1 << (self.width)) - 1
-        return (value & mask) << (self.start - self.width)
+        return (value & self.mask) << self.shift
 
-def config(format, **args):
-    n = len(format)
-    bits = 0
-    fields = {}
-    field = None
-    for i in range(n):
-        c = format[i]
-        if c != ' ' and c != '\t':
-            bits <<= 1
+class Format:
+    # A parsed format string, one character per bit, msb first. '0' and
+    # '1' are constant bits, any other character names a field of
+    # consecutive bits; spaces and tabs are ignored.
+    def __init__(self, format):
+        self.format = format
+        chars = [c for c in format if c != ' ' and c != '\t']
+        n = len(chars)
+        self.width = n
+        self.bits = 0
+        self.fields = {}
+        for i, c in enumerate(chars):
             if c == '0' or c == '1':
-                field = None
-                bits |= (c == '1')
+                self.bits |= (c == '1') << (n-1-i)
+            elif c not in self.fields:
+                self.fields[c] = Field(n-i)
+            elif chars[i-1] == c:
+                self.fields[c].width += 1
             else:
-                # should check that c's are consecutive
-                if c not in fields:
-                    field = Field(n-i)
-                    fields[c] = field
-                else:
-                    field.width += 1
+                raise ValueError('field {} is not consecutive in {}'.format(c, format))
+        self._fields = [(c, field.shift, field.mask) for c, field in self.fields.items()]
 
-    for c, field in fields.items():
-        value = args[c] if c in args else 0
-        bits |= field(value)
+    def encode(self, **args):
+        bits = self.bits
+        for c, shift, mask in self._fields:
+            if c in args:
+                bits |= (args[c] & mask) << shift
+        return bits
 
-    return bits
+    def decode(self, bits):
+        return {c: (bits >> shift) & mask for c, shift, mask in self._fields}
+
+@lru_cache(maxsize=None)
+def parse(format):
+    return Format(format)
+
+def config(format, **args):
+    return parse(format).encode(**args)
 
 #print(bin(config('11bb', b=2)))
 #print(bin(config('aabb', a=1, b=2)))
 #print(bin(config('l0dsooooo', o=0x8)))
-
@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import os
+import sys
+import numpy as np
+from .verify import configs, vectors, verilator, verilator_binary, report
+
+__all__ = ['Bridge', 'check', 'cosimulate', 'serve', 'STANDIN']
+
+#
+# Asynchronous co-simulation of the python PE model with an external one.
+#
+# The model is a long-lived subprocess speaking the frame protocol of
+# verilator.Driver: each frame
+#
+#   uint32   opcode           the instruction word & 0x1ff
+#   uint32   count
+#   uint16   tests[count][3]  op_a, op_b, op_d_p
+#
+# is answered by uint16 results[count][2] (res, res_p), in order. It is
+# the verilated test_pe_comp_unq1 driver, or the python stand-in (serve())
+# when verilator is not available. The frames are packed and unpacked by
+# verilator/verilator.py, loaded as in pe.verify.
+#
+# A Bridge keeps up to depth frames in flight, so the model computes one
+# frame while the next is written and the python PE evaluates its own
+# copy of the vectors. Results are compared as they arrive. Any number of
+# configurations share one event loop and a pool of model processes:
+#
+#   python -m pe.cosim [--vectors N] [--processes N] [--verilator] [names...]
+#
+# The report is that of python -m pe.verify.
+#
+
+BATCH = 1 << 12
+DEPTH = 4
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STANDIN = [sys.executable, '-m', 'pe.cosim', '--serve']
+
+class Bridge:
+
+    def __init__(self, command=STANDIN, depth=DEPTH):
+        self.command = command
+        self.depth = depth
+        self.process = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def start(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command, stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, env=env)
+        self.slots = asyncio.Semaphore(self.depth)
+        self.pending = asyncio.Queue()
+        self.error = None
+        self.reader = asyncio.ensure_future(self.read())
+        return self
+
+    async def submit(self, word, a, b, d=0):
+        # Send one frame, returning a future of its (res, res_p) arrays.
+        # Waits while depth frames are in flight.
+        await self.slots.acquire()
+        if self.error is not None:
+            self.slots.release()
+            raise self.error
+        future = asyncio.get_running_loop().create_future()
+        a = np.asarray(a)
+        self.pending.put_nowait((len(a), future))
+        try:
+            self.process.stdin.write(verilator().pack(word, a, b, d))
+            await self.process.stdin.drain()
+        except ConnectionError as e:
+            raise RuntimeError('model exited: {}'.format(e))
+        return future
+
+    async def run(self, word, a, b, d=0):
+        return await (await self.submit(word, a, b, d))
+
+    async def read(self):
+        while True:
+            count, future = await self.pending.get()
+            try:
+                data = await self.process.stdout.readexactly(4 * count)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.fail(future, RuntimeError('model exited: {}'.format(e)))
+                return
+            if not future.cancelled():
+                future.set_result(verilator().unpack(data))
+            self.slots.release()
+
+    def fail(self, future, error):
+        # fail this and every queued frame, and unblock submit()
+        self.error = error
+        while True:
+            if not future.done():
+                future.set_exception(error)
+            if self.pending.empty():
+                break
+            count, future = self.pending.get_nowait()
+        for _ in range(self.depth):
+            self.slots.release()
+
+    async def close(self):
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        await self.process.wait()
+        self.reader.cancel()
+        self.process = None
+
+async def check(bridge, name, n=1 << 16, seed=0, limit=8, batch=BATCH):
+    # verify.check over a bridge, one frame per batch of vectors
+    f, args = configs()[name]
+    pe = f(*args).flag(0xF)
+    a, b, d = vectors(n, seed)
+    word = pe.instruction & 0x1ff
+
+    async def compare(future, res, res_p):
+        # one frame's (res, res_p, rtl res, rtl res_p, mismatches)
+        rtl_res, rtl_res_p = await future
+        return res, res_p, rtl_res, rtl_res_p, (res != rtl_res) | (res_p != rtl_res_p)
+
+    comparisons = []
+    for start in range(0, n, batch):
+        s = slice(start, start + batch)
+        future = await bridge.submit(word, a[s], b[s], d[s])
+        # evaluated while the model works on the frame
+        res, res_p, _ = pe.eval_batch(a[s], b[s], 0, d[s])
+        comparisons.append(asyncio.ensure_future(compare(future, res, res_p)))
+    frames = await asyncio.gather(*comparisons)
+
+    res, res_p, rtl_res, rtl_res_p, bad = [np.concatenate(x) for x in zip(*frames)]
+    bad = np.flatnonzero(bad)
+    rows = [tuple(int(x[i]) for x in (a, b, d, res, res_p, rtl_res, rtl_res_p))
+            for i in bad[:limit]]
+    return name, len(bad), rows
+
+async def cosimulate(names=None, n=1 << 16, seed=0, command=STANDIN, processes=1,
+                     depth=DEPTH, batch=BATCH, limit=8):
+    # verify.verify with every configuration in flight at once, spread
+    # over processes model subprocesses
+    names = names or list(configs())
+    bridges = [Bridge(command, depth) for _ in range(processes)]
+    try:
+        for bridge in bridges:
+            await bridge.start()
+        return await asyncio.gather(*[
+            check(bridges[k % processes], name, n, seed, limit, batch)
+            for k, name in enumerate(names)])
+    finally:
+        for bridge in bridges:
+            await bridge.close()
+
+#
+# The python stand-in model
+#
+
+def standin(word):
+    # the PE test_pe_comp_unq1 computes for a frame's opcode: the ALU with
+    # its inputs unregistered and res_p the ALU predicate
+    from .loader import decode
+    return decode(word).rega().regb().regd().flag(0xF)
+
+def serve(stdin=None, stdout=None):
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    FRAME = verilator().FRAME
+    models = {}
+    while True:
+        header = stdin.read(FRAME.size)
+        if len(header) < FRAME.size:
+            break
+        word, count = FRAME.unpack(header)
+        data = stdin.read(6 * count)
+        if len(data) < 6 * count:
+            break
+        tests = np.frombuffer(data, dtype='<u2').reshape(count, 3)
+        if word not in models:
+            models[word] = standin(word)
+        res, res_p, _ = models[word].eval_batch(tests[:, 0], tests[:, 1], 0, tests[:, 2])
+        results = np.empty((count, 2), dtype='<u2')
+        results[:, 0] = res
+        results[:, 1] = res_p
+        stdout.write(results.tobytes())
+        stdout.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pe.cosim')
+    parser.add_argument('names', nargs='*', help='configurations, default all')
+    parser.add_argument('--vectors', type=int, default=1 << 16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--depth', type=int, default=DEPTH)
+    parser.add_argument('--batch', type=int, default=BATCH)
+    parser.add_argument('--limit', type=int, default=8)
+    parser.add_argument('--verilator', action='store_true',
+                        help='co-simulate with the verilated RTL, not the stand-in')
+    parser.add_argument('--serve', action='store_true', help='run the stand-in model')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve()
+        return 0
+
+    command = [verilator_binary()] if args.verilator else STANDIN
+    results = asyncio.run(cosimulate(args.names, args.vectors, args.seed, command,
+                                     args.processes, args.depth, args.batch, args.limit))
+    return report(results)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+from .pe import CONST, BYPASS
+from . import stats
+
+__all__ = ['Fabric']
+
+INPUTS = ['data0', 'data1', 'c', 'bit0', 'bit1', 'bit2']
+OUTPUTS = ['res', 'res_p', 'irq']
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+
+#
+# A grid of placed PEs, wired output to input, simulated cycle by cycle.
+#
+# Each cycle first settles the combinational network with clk low, so
+# DELAY/VALID registers present their stored value, evaluating PEs in
+# topological levels of the BYPASS wires. Then on the posedge every
+# DELAY/VALID register captures the value now on its input.
+#
+# The schedule is computed once, from the wiring and register modes at the
+# time of the first step; call schedule() after reconfiguring any PE. Each
+# PE is compiled for the outputs that are wired or probed, so the logic of
+# the others is skipped. After fuse() a step runs as one generated
+# function with the PEs' logic inlined (see pe.fuse).
+#
+
+class Fabric:
+
+    def __init__(self, width=None, height=None):
+        self.width = width
+        self.height = height
+        self.pes = []
+        self.grid = {}
+        self.wires = {}    # (dst, input) -> (src, output) or input name
+        self.outputs = {}  # name -> (src, output)
+        self.levels = None
+        self.fused = False
+
+    def __getitem__(self, xy):
+        return self.grid[xy]
+
+    def __len__(self):
+        return len(self.pes)
+
+    def place(self, pe, x, y):
+        if self.width is not None and not 0 <= x < self.width:
+            raise ValueError('x={} is outside the fabric'.format(x))
+        if self.height is not None and not 0 <= y < self.height:
+            raise ValueError('y={} is outside the fabric'.format(y))
+        if (x, y) in self.grid:
+            raise ValueError('({}, {}) is already occupied'.format(x, y))
+        pe.place(x, y)
+        self.grid[x, y] = pe
+        self.pes.append(pe)
+        self.levels = None
+        return pe
+
+    def wire(self, src, output, dst, input):
+        assert output in OUTPUTS, output
+        assert input in INPUTS, input
+        self.wires[dst, input] = (src, output)
+        self.levels = None
+        return self
+
+    def input(self, name, dst, input):
+        assert input in INPUTS, input
+        self.wires[dst, input] = name
+        self.levels = None
+        return self
+
+    def output(self, name, src, output):
+        assert output in OUTPUTS, output
+        self.outputs[name] = (src, output)
+        self.levels = None
+        return self
+
+    def fuse(self, fused=True):
+        self.fused = fused
+        self.levels = None
+        return self
+
+    def snapshot(self):
+        # The state of every PE, in placement order, see pe.checkpoint
+        from .checkpoint import snapshot
+        return snapshot(self)
+
+    def restore(self, states):
+        from .checkpoint import restore
+        return restore(self, states)
+
+    def schedule(self):
+        # Group the PEs into levels so that every PE only reads BYPASS
+        # inputs from PEs in earlier levels.
+        index = {id(pe): i for i, pe in enumerate(self.pes)}
+        preds = [set() for pe in self.pes]
+        succs = [[] for pe in self.pes]
+        for (dst, input), src in self.wires.items():
+            reg = getattr(dst, REGS[INPUTS.index(input)])
+            if isinstance(src, tuple) and reg.mode == BYPASS:
+                i, j = index[id(src[0])], index[id(dst)]
+                if i not in preds[j]:
+                    preds[j].add(i)
+                    succs[i].append(j)
+
+        levels = []
+        count = [len(p) for p in preds]
+        ready = [i for i in range(len(self.pes)) if not count[i]]
+        while ready:
+            levels.append(ready)
+            next = []
+            for i in ready:
+                for j in succs[i]:
+                    count[j] -= 1
+                    if not count[j]:
+                        next.append(j)
+            ready = next
+        if sum(len(level) for level in levels) != len(self.pes):
+            raise ValueError('combinational loop between PEs {}'.format(
+                [(pe.x, pe.y) for i, pe in enumerate(self.pes) if count[i]]))
+
+        self.levels = levels
+        self.order = [i for level in levels for i in level]
+
+        # per PE, per input: None, an input name, or (src index, output index)
+        self.sources = []
+        self.registers = []
+        for i, pe in enumerate(self.pes):
+            sources = []
+            for j, input in enumerate(INPUTS):
+                src = self.wires.get((pe, input))
+                if isinstance(src, tuple):
+                    src = (index[id(src[0])], OUTPUTS.index(src[1]))
+                sources.append(src)
+                reg = getattr(pe, REGS[j])
+                if reg.mode not in [CONST, BYPASS]:
+                    self.registers.append((reg, i, j))
+            self.sources.append(sources)
+        self.probes = {name: (index[id(src)], OUTPUTS.index(output))
+                       for name, (src, output) in self.outputs.items()}
+
+        # the outputs of each PE that are read
+        self.demand = [set() for pe in self.pes]
+        for sources in self.sources:
+            for src in sources:
+                if isinstance(src, tuple):
+                    self.demand[src[0]].add(OUTPUTS[src[1]])
+        for i, k in self.probes.values():
+            self.demand[i].add(OUTPUTS[k])
+        self.funcs = [pe.compile(demand) for pe, demand in zip(self.pes, self.demand)]
+        self.fused_step = None
+        if self.fused:
+            from .fuse import fuse
+            self.fused_step = fuse(self)
+        return self
+
+    def step(self, inputs={}, clk_en=1):
+        # Simulate one clock cycle, returning the named outputs.
+        if self.levels is None:
+            self.schedule()
+        if self.fused_step is not None and stats.ACTIVE is None:
+            return self.fused_step(inputs, clk_en)
+
+        values = [None] * len(self.pes)
+
+        def value(src):
+            if src is None:
+                return 0
+            elif isinstance(src, tuple):
+                outputs = values[src[0]]
+                # registered inputs may read a PE later in the order
+                return 0 if outputs is None else outputs[src[1]]
+            return inputs.get(src, 0)
+
+        # while profiling, evaluate the PEs so they are counted
+        funcs = self.funcs if stats.ACTIVE is None else self.pes
+        for i in self.order:
+            args = [value(src) for src in self.sources[i]]
+            values[i] = funcs[i](*args, clk=0, clk_en=clk_en)
+
+        # posedge
+        for reg, i, j in self.registers:
+            reg(value(self.sources[i][j]), 1, clk_en)
+
+        return {name: values[i][k] for name, (i, k) in self.probes.items()}
+
+    def run(self, stimulus, clk_en=1, workers=1):
+        # Yield the named outputs for each cycle of stimulus, an iterable
+        # of {input name: value} dicts. With workers > 1 the fabric is
+        # split into tiles simulated in separate processes.
+        if workers > 1:
+            from .parallel import ParallelFabric
+            with ParallelFabric(self, workers) as fabric:
+                yield from fabric.run(stimulus, clk_en)
+            return
+        for inputs in stimulus:
+            yield self.step(inputs, clk_en)
@@ -0,0 +1,189 @@
+from . import intops
+from .pe import INT, CONST, BYPASS, FLAGS
+
+__all__ = ['fuse', 'source']
+
+#
+# Fusion of a scheduled Fabric into one step function.
+#
+# The generated step(inputs, clk_en) evaluates the PEs in schedule order
+# with each output in a local variable, res_i, p_i and irq_i for PE i,
+# rather than a (res, res_p, irq) tuple per PE, then clocks the registers
+# and returns the probed outputs. Only outputs in fabric.demand are
+# computed. PEs on the int backend are inlined, with the ALU, the flag
+# fabric.demand needs and the irq logic written out as expressions; other
+# PEs (bv, tabulated) are called through their compiled function.
+#
+# As for the compiled PEs, CONST values and the configuration are read
+# at fuse time: reschedule after reconfiguring.
+#
+
+MASK = intops.MASK
+
+# opcode -> (res, alu res_p) expressions over a, b, d (unsigned only)
+INLINE = {
+    0x12: ('{a} | {b}', None),
+    0x13: ('{a} & {b}', None),
+    0x14: ('{a} ^ {b}', None),
+    0x11: ('({a} << ({b} & 15)) & 65535', None),
+    0x0:  ('({a} + {b} + {d}) & 65535', '({a} + {b} + {d}) > 65535'),
+    0x1:  ('({a} - {b}) & 65535', '{a} >= {b}'),
+    0x4:  ('{a} if {a} >= {b} else {b}', '{a} >= {b}'),
+    0x5:  ('{a} if {a} <= {b} else {b}', '{a} <= {b}'),
+    0x8:  ('{a} if {d} else {b}', None),
+}
+SIGNED = {0x4, 0x5, 0xf, 0x3, 0xb, 0xc, 0xd}
+
+# flag_sel -> predicate over the flag expressions, as pe.FLAGS
+FLAG = [
+    '{Z}', 'not {Z}', '{C}', 'not {C}', '{N}', 'not {N}', '{V}', 'not {V}',
+    '{C} and not {Z}', 'not {C} or {Z}', '{N} == {V}', '{N} != {V}',
+    'not {Z} and ({N} == {V})', '{Z} or ({N} != {V})', '{lut}', '{p}',
+]
+
+class Generator:
+
+    def __init__(self, fabric):
+        self.fabric = fabric
+        self.namespace = {}
+        self.lines = []
+
+    def bind(self, name, value):
+        self.namespace[name] = value
+        return name
+
+    def emit(self, line):
+        self.lines.append('    ' + line)
+
+    def source(self, src, done):
+        # expression for an input source; outputs of PEs not yet
+        # evaluated are only read by registers, which ignore them with clk
+        # low
+        if src is None:
+            return '0'
+        if isinstance(src, tuple):
+            i, k = src
+            if i not in done:
+                return '0'
+            return ['res_{}', 'p_{}', 'irq_{}'][k].format(i)
+        return self.inputs[src]
+
+    def pe(self, i, done):
+        fabric = self.fabric
+        pe = fabric.pes[i]
+        demand = fabric.demand[i]
+        args = [self.source(src, done) for src in fabric.sources[i]]
+        if pe._backend != INT or pe._table is not None or pe._opcode not in intops.ALU \
+           or pe.flag_sel not in range(len(FLAGS)):
+            func = self.bind('func_{}'.format(i), fabric.funcs[i])
+            self.emit('res_{0}, p_{0}, irq_{0} = {1}({2}, 0, clk_en)'.format(i, func, ', '.join(args)))
+            return
+
+        need_alu, need_flag, need_irq = pe.demand(demand)
+        regs = []
+        for j, name in enumerate(['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']):
+            reg = getattr(pe, name)
+            var = '{}_{}'.format('abcdef'[j], i)
+            if reg.mode == CONST:
+                regs.append(str(int(reg.value)))
+                continue
+            if reg.mode == BYPASS and args[j] == '0':
+                regs.append('0')
+                continue
+            if reg.mode == BYPASS:
+                self.emit('{} = ({}) & {}'.format(var, args[j], reg.mask))
+            else:
+                r = self.bind('r{}'.format(var), reg)
+                self.emit('{} = {}({}, 0, clk_en)'.format(var, r, args[j]))
+            regs.append(var)
+        a, b, c, d, e, f = regs
+        opcode, signed = pe._opcode, bool(pe._alu.signed)
+
+        res, p = 'res_{}'.format(i), 'ap_{}'.format(i)
+        if not need_alu:
+            self.emit('{} = 0'.format(res))
+        elif opcode in INLINE and not (signed and opcode in SIGNED):
+            res_expr, p_expr = INLINE[opcode]
+            self.emit('{} = {}'.format(res, res_expr.format(a=a, b=b, d=d)))
+            if need_flag and pe.flag_sel == 0xF:
+                if p_expr is None:
+                    p_expr = '{a} + {b} > 65535' if pe._alu._carry else '0'
+                self.emit('{} = {}'.format(p, p_expr.format(a=a, b=b, d=d)))
+        else:
+            alu = self.bind('alu_{}'.format(i), intops.ALU[opcode])
+            call = '{}({}, {}, {}, {}, {})'.format(alu, a, b, c, d, signed)
+            if isinstance(intops.ALU[opcode](0, 0, 0, 0, signed), tuple):
+                self.emit('{}, {} = {}'.format(res, p, call))
+            else:
+                self.emit('{} = {}'.format(res, call))
+                if pe._alu._carry:
+                    self.emit('{} = {} + {} > 65535'.format(p, a, b))
+                else:
+                    self.emit('{} = 0'.format(p))
+
+        if need_flag:
+            flags = {'Z': '({} == 0)'.format(res), 'N': '({} >> 15)'.format(res), 'p': p}
+            needs = FLAGS[pe.flag_sel][0]
+            if 'C' in needs:
+                C = self.bind('C_{}'.format(i), intops.CARRY.get(opcode, intops.carry))
+                flags['C'] = '{}({}, {}, {})'.format(C, a, b, d)
+            if 'V' in needs:
+                V = self.bind('V_{}'.format(i), intops.OVERFLOW.get(opcode, intops.overflow))
+                flags['V'] = '{}({}, {}, {})'.format(V, a, b, d)
+            code = pe._lut_code if pe._lut and pe.flag_sel == 0xE else 0
+            flags['lut'] = '({} >> (({} << 2) | ({} << 1) | {})) & 1'.format(code, f, e, d)
+            self.emit('p_{} = 1 if {} else 0'.format(i, FLAG[pe.flag_sel].format(**flags)))
+        else:
+            self.emit('p_{} = 0'.format(i))
+
+        if need_irq:
+            q = self.bind('pe_{}'.format(i), pe)
+            self.emit('{0}.raise_debug_trig = t_{1} = {2} != {3}'.format(
+                q, i, res, pe._debug_trig & MASK))
+            self.emit('{0}.raise_debug_trig_p = tp_{1} = p_{1} != {2}'.format(
+                q, i, pe._debug_trig_p & 1))
+            terms = []
+            if pe.irq_en_0:
+                terms.append('tp_{}'.format(i))
+            if pe.irq_en_1:
+                terms.append('t_{}'.format(i))
+            self.emit('irq_{} = {}'.format(i, ' or '.join(terms)))
+        else:
+            self.emit('irq_{} = False'.format(i))
+
+    def generate(self):
+        fabric = self.fabric
+        self.lines.append('def step(inputs, clk_en=1):')
+        self.inputs = {}
+        for sources in fabric.sources:
+            for src in sources:
+                if src is not None and not isinstance(src, tuple) and src not in self.inputs:
+                    name = self.bind('name_{}'.format(len(self.inputs)), src)
+                    self.inputs[src] = 'in_{}'.format(len(self.inputs))
+                    self.emit('{} = inputs.get({}, 0)'.format(self.inputs[src], name))
+
+        done = set()
+        for i in fabric.order:
+            self.pe(i, done)
+            done.add(i)
+
+        # posedge
+        for n, (reg, i, j) in enumerate(fabric.registers):
+            r = self.bind('clock_{}'.format(n), reg)
+            self.emit('{}({}, 1, clk_en)'.format(r, self.source(fabric.sources[i][j], done)))
+
+        outputs = ', '.join('{}: {}'.format(self.bind('probe_{}'.format(n), name),
+                                            ['res_{}', 'p_{}', 'irq_{}'][k].format(i))
+                            for n, (name, (i, k)) in enumerate(fabric.probes.items()))
+        self.emit('return {{{}}}'.format(outputs))
+        return '\n'.join(self.lines) + '\n'
+
+def source(fabric):
+    # the generated source of fabric's step function
+    return Generator(fabric).generate()
+
+def fuse(fabric):
+    generator = Generator(fabric)
+    code = compile(generator.generate(), '<fused fabric>', 'exec')
+    exec(code, generator.namespace)
+    return generator.namespace['step']
@@ -0,0 +1,117 @@
+#
+# PE semantics on plain python ints, for PE(..., backend='int')
+#
+# Values are unsigned ints masked to 16 bits; signed ops convert with sint().
+#
+__all__ = ['ALU', 'CARRY', 'OVERFLOW', 'carry', 'overflow']
+
+MASK = 0xffff
+
+def sint(x):
+    return x - ((x & 0x8000) << 1)
+
+def ext(x, signed):
+    # 16 -> 32 bit extension, as in a.ext(16)
+    return (sint(x) if signed else x) & 0xffffffff
+
+def shr(a, b, c, d, signed):
+    if signed:
+        return (sint(a) >> (b & 0xf)) & MASK
+    return a >> (b & 0xf)
+
+def add(a, b, c, d, signed):
+    s = a + b + d
+    return s & MASK, s > MASK
+
+def sub(a, b, c, d, signed):
+    return (a - b) & MASK, a + (~b & MASK) + 1 > MASK
+
+def ge(a, b, c, d, signed):
+    res_p = sint(a) >= sint(b) if signed else a >= b
+    return a if res_p else b, res_p
+
+def le(a, b, c, d, signed):
+    res_p = sint(a) <= sint(b) if signed else a <= b
+    return a if res_p else b, res_p
+
+def abs(a, b, c, d, signed):
+    if signed and a & 0x8000:
+        return -a & MASK, 1
+    return a, a >> 15
+
+def mul(shift):
+    def _mul(a, b, c, d, signed):
+        return (((ext(a, signed) * ext(b, signed)) & 0xffffffff) >> shift) & MASK, 0
+    return _mul
+
+# opcode -> alu(a, b, c, d, signed), returning res or (res, res_p) like the
+# lambdas in isa.py
+ALU = {
+    0x12: lambda a, b, c, d, signed: a | b,
+    0x13: lambda a, b, c, d, signed: a & b,
+    0x14: lambda a, b, c, d, signed: a ^ b,
+    0x15: lambda a, b, c, d, signed: (~a + b) & MASK,
+    0xf:  shr,
+    0x11: lambda a, b, c, d, signed: (a << (b & 0xf)) & MASK,
+    0x0:  add,
+    0x1:  sub,
+    0x4:  ge,
+    0x5:  le,
+    0x3:  abs,
+    0x8:  lambda a, b, c, d, signed: a if d else b,
+    0xb:  mul(0),
+    0xc:  mul(8),
+    0xd:  mul(16),
+}
+
+#
+# flags, mirroring CARRY and OVERFLOW in pe.py
+#
+def carry(ra, rb, rd):
+    return ra + rb > MASK
+
+def carry_add(ra, rb, rd):
+    return ra + rb + rd > MASK
+
+def carry_sub(ra, rb, rd):
+    return ra + (~rb & MASK) + 1 > MASK
+
+def carry_abs(ra, rb, rd):
+    return ra == 0
+
+CARRY = {
+    0x0: carry_add,
+    0x1: carry_sub, 0x4: carry_sub, 0x5: carry_sub,
+    0x3: carry_abs,
+}
+
+def overflow(ra, rb, rd):
+    return (ra >> 15 == rb >> 15) and (ra >> 15 != ((ra + rb) >> 15) & 1)
+
+def overflow_add(ra, rb, rd):
+    return (ra >> 15 == rb >> 15) and (ra >> 15 != ((ra + rb + rd) >> 15) & 1)
+
+def overflow_sub(ra, rb, rd):
+    return (ra >> 15 != rb >> 15) and (ra >> 15 != ((ra - rb) >> 15) & 1)
+
+def overflow_abs(ra, rb, rd):
+    return ra == 0x8000
+
+def overflow_mul(ra, rb, rd):
+    p15 = ((ra * rb) >> 15) & 1
+    return p15 if (ra >> 15 == rb >> 15) else p15 == 0 and (ra != 0 or rb != 0)
+
+def overflow_none(ra, rb, rd):
+    return 0
+
+OVERFLOW = {
+    0x0: overflow_add,
+    0x1: overflow_sub,
+    0x3: overflow_abs,
+    0xb: overflow_mul, 0xc: overflow_mul, # mul0, mul1
+    0xd: overflow_none,
+    0x4: overflow_none, 0x5: overflow_none,
+    0x12: overflow_none, 0x13: overflow_none, 0x14: overflow_none, # and, or, xor clear overflow flag
+    0xf: overflow_none, 0x11: overflow_none, # lshl, lshr
+    0x8: overflow_none, # sel
+}
@@ -1,15 +1,11 @@
+from . import ISA
 from .config import config
 from .pe import PE, CONST
-from .bv import BitVector
 import functools
 
-__all__  = ['or_', 'and_', 'xor']
-__all__ += ['shr', 'lshl']
-__all__ += ['add', 'sub']
-__all__ += ['min', 'max', 'abs']
-__all__ += ['ge', 'le']
-__all__ += ['sel']
-__all__ += ['mul0', 'mul1', 'mul2']
+# the names are listed in pe.ISA, which `import pe` reads without
+# importing this module
+__all__ = list(ISA)
 
 def or_():
     return PE( 0x12, lambda a, b, c, d: a | b).carry()
@@ -49,12 +45,14 @@ def lshl():
 def add():
     # res_p = cout
     def _add(a, b, c, d):
+        from .bv import BitVector
         res_p = BitVector(a, a.num_bits + 1) + BitVector(b, b.num_bits + 1) + d >= 2 ** 16
         return a + b + d, res_p
     return PE( 0x0 , _add)
 
 def sub():
     def _sub(a, b, c, d):
+        from .bv import BitVector
         res_p = BitVector(a, a.num_bits + 1) + BitVector(~b, b.num_bits + 1) + 1 >= 2 ** 16
         return a - b, res_p
     return PE( 0x1 , _sub)
@@ -0,0 +1,115 @@
+from functools import lru_cache
+from . import isa
+from .pe import INSTRUCTION, CONST, BYPASS
+
+__all__ = ['opcodes', 'decode', 'load']
+
+#
+# Rebuilding PEs from instruction words.
+#
+# A word holds the opcode, signed, flag_sel, irq_en and the modes of
+# registers a, b, d, e and f (c is not encoded and is always BYPASS).
+# Register constants and the LUT code are not part of the word, so they
+# are passed alongside: consts maps register names 'a'..'f' to values.
+#
+# backend=None keeps the backend the isa constructor picks (PE_BACKEND
+# for the isa ops).
+#
+# Each distinct configuration is decoded once into a prototype PE, and
+# PEs are built by copying it. load(..., compiled=True) also shares one
+# compiled function between all PEs of a configuration without clocked
+# registers.
+#
+
+REGCODE = {'a': 0, 'b': 2, 'd': 8, 'e': 10, 'f': 12}
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+
+@lru_cache(maxsize=None)
+def opcodes():
+    # opcode -> isa constructor, over every constructor in pe.isa:
+    # __all__ first, then those it leaves out (neg)
+    names = list(isa.__all__)
+    names += [name for name, f in vars(isa).items()
+              if not name.startswith('_') and name not in names
+              and callable(f) and getattr(f, '__module__', None) == isa.__name__]
+    result = {}
+    for name in names:
+        f = getattr(isa, name)
+        args = (False,) if f.__code__.co_argcount else ()
+        result.setdefault(f(*args)._opcode, f)
+    return result
+
+def freeze(consts):
+    if not consts:
+        return ()
+    unknown = set(consts) - set(REGCODE)
+    if unknown:
+        raise ValueError('no constant for registers {}'.format(sorted(unknown)))
+    return tuple(sorted(consts.items()))
+
+@lru_cache(maxsize=4096)
+def prototype(word, consts, lut, backend):
+    fields = INSTRUCTION.decode(word)
+    f = opcodes().get(fields['o'])
+    if f is None:
+        raise ValueError('unknown opcode {:#x}'.format(fields['o']))
+    signed = fields['s']
+    pe = f(signed) if f.__code__.co_argcount else f()
+    if pe._signed != signed:
+        pe.signed(signed)
+    pe.flag(fields['f'])
+    pe.irq_en(bool(fields['i'] & 1), bool(fields['i'] & 2))
+    consts = dict(consts)
+    for name, shift in REGCODE.items():
+        mode = (fields['r'] >> shift) & 3
+        getattr(pe, 'reg' + name)(mode, consts.get(name, 0))
+    pe.regc()
+    if lut is not None:
+        pe.lut(lut)
+    return pe if backend is None else pe.backend(backend)
+
+SLOTS = {}
+
+def shallow(obj):
+    # copy.copy without the __reduce_ex__ round trip
+    cls = type(obj)
+    if cls not in SLOTS:
+        SLOTS[cls] = [name for c in cls.__mro__ for name in getattr(c, '__slots__', ())]
+    new = object.__new__(cls)
+    for name in SLOTS[cls]:
+        if hasattr(obj, name):
+            setattr(new, name, getattr(obj, name))
+    return new
+
+def clone(pe):
+    # a copy sharing the configuration but with its own registers
+    new = shallow(pe)
+    new._alu = shallow(pe._alu)
+    for name in REGS:
+        setattr(new, name, shallow(getattr(pe, name)))
+    return new
+
+@lru_cache(maxsize=4096)
+def shared(pe):
+    return pe.compile()
+
+def decode(word, consts=None, lut=None, backend=None):
+    return clone(prototype(int(word), freeze(consts), lut, backend))
+
+def load(words, consts=None, luts=None, backend=None, compiled=False):
+    # A PE for each instruction word, or with compiled its compiled
+    # function. consts and luts, if given, hold one entry per word.
+    n = len(words)
+    consts = [None] * n if consts is None else consts
+    luts = [None] * n if luts is None else luts
+    assert len(consts) == len(luts) == n, (len(consts), len(luts), n)
+    result = []
+    for word, const, lut in zip(words, consts, luts):
+        pe = prototype(int(word), freeze(const), None if lut is None else int(lut), backend)
+        if not compiled:
+            result.append(clone(pe))
+        elif all(getattr(pe, name).mode in (CONST, BYPASS) for name in REGS):
+            result.append(shared(pe))
+        else:
+            result.append(clone(pe).compile())
+    return result
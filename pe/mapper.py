@@ -0,0 +1,512 @@
+import builtins
+import inspect
+from collections import namedtuple
+from functools import lru_cache
+from . import isa
+from .pe import CONST
+from .fabric import Fabric
+
+__all__ = ['Node', 'Cell', 'Netlist', 'netlist', 'fabric', 'evaluate']
+__all__ += ['select', 'max', 'min', 'ge', 'le', 'lt', 'gt', 'eq', 'ne']
+__all__ += ['ashr', 'mulmid', 'mulhi']
+
+#
+# Mapping dataflow kernels onto PEs.
+#
+# A kernel is a python function of 16-bit unsigned values, e.g.
+#
+#   def mac(x, w, acc):
+#       return acc + x * w
+#
+# It is traced with a Node for each parameter: the operators + - * & | ^
+# ~ << >> and -x, abs(), the comparisons >= <= > < (and eq, ne) and the
+# helpers below build a graph, with arithmetic on constants folded and
+# common subexpressions shared. Shifts by a constant of 16 or more give
+# 0 (or the sign), as in python; variable shift amounts are taken mod 16,
+# as by the PE. Comparisons give bits, which can only select between
+# values or be returned. evaluate(kernel, *args) gives the outputs the
+# mapped PEs compute.
+#
+# Instruction selection is greedy, one node at a time in trace order:
+#
+#   select(a >= b, a, b)        ge, as max(a, b)   (le and min likewise)
+#   a == b, a != b, a < b       sub with flag Z, ~Z, ~C (N != V signed)
+#   a >= b, a <= b              ge, le with flag 0xF, the ALU predicate
+#   x * 2**k                    lshl by k
+#   -x, ~x                      sub from CONST 0, xor with CONST 0xffff
+#
+# constant operands become CONST registers, and cells with the same
+# operation and operands are merged, so max(a, b) and a >= b are one PE.
+# Each cell is placed in the column of its depth in the graph.
+#
+# netlist(kernel) is cached per kernel function, and only as a whole:
+# subgraphs are shared within one trace, but a cone common to two kernels
+# is traced and selected again for each. fabric(kernel) builds a Fabric
+# of fresh PEs with an input per parameter and outputs 'out' (or 'out0',
+# 'out1', ... for a tuple, or the keys of a returned dict).
+#
+
+MASK = 0xffff
+
+# the graph being traced
+TRACING = None
+
+class Node:
+    __slots__ = ['op', 'args', 'signed', 'bit', 'name', 'index']
+
+    def __init__(self, op, args, signed=False, bit=False, name=None):
+        self.op = op
+        self.args = args
+        self.signed = signed
+        self.bit = bit
+        self.name = name
+
+    def __repr__(self):
+        return self.name or '{}{}'.format(self.op, self.args)
+
+    def __add__(self, other):
+        return apply('add', self, other)
+
+    def __radd__(self, other):
+        return apply('add', other, self)
+
+    def __sub__(self, other):
+        return apply('sub', self, other)
+
+    def __rsub__(self, other):
+        return apply('sub', other, self)
+
+    def __mul__(self, other):
+        return apply('mul0', self, other)
+
+    def __rmul__(self, other):
+        return apply('mul0', other, self)
+
+    def __and__(self, other):
+        return apply('and_', self, other)
+
+    def __rand__(self, other):
+        return apply('and_', other, self)
+
+    def __or__(self, other):
+        return apply('or_', self, other)
+
+    def __ror__(self, other):
+        return apply('or_', other, self)
+
+    def __xor__(self, other):
+        return apply('xor', self, other)
+
+    def __rxor__(self, other):
+        return apply('xor', other, self)
+
+    def __lshift__(self, other):
+        return apply('lshl', self, other)
+
+    def __rlshift__(self, other):
+        return apply('lshl', other, self)
+
+    def __rshift__(self, other):
+        return apply('shr', self, other)
+
+    def __rrshift__(self, other):
+        return apply('shr', other, self)
+
+    def __neg__(self):
+        return apply('sub', 0, self)
+
+    def __invert__(self):
+        return apply('xor', self, MASK)
+
+    def __abs__(self):
+        return apply('abs', self, 0, signed=True)
+
+    def __ge__(self, other):
+        return apply('ge', self, other)
+
+    def __le__(self, other):
+        return apply('le', self, other)
+
+    def __gt__(self, other):
+        return apply('lt', other, self)
+
+    def __lt__(self, other):
+        return apply('lt', self, other)
+
+    def __eq__(self, other):
+        raise TypeError('== of a traced value, use mapper.eq()')
+
+    def __ne__(self, other):
+        raise TypeError('!= of a traced value, use mapper.ne()')
+
+    def __bool__(self):
+        raise TypeError('a traced value has no truth value, use select()')
+
+    __hash__ = object.__hash__
+
+def signed(x):
+    return x - (1 << 16) if x & 0x8000 else x
+
+def mul(shift, signed_):
+    def _mul(a, b):
+        if signed_:
+            a, b = signed(a), signed(b)
+        return (a * b) >> shift
+    return _mul
+
+# op -> the value of op on constants, before masking
+FOLD = {
+    'add':   lambda a, b: a + b,
+    'sub':   lambda a, b: a - b,
+    'mul0':  mul(0, False),
+    'mul1':  mul(8, False),
+    'mul2':  mul(16, False),
+    'and_':  lambda a, b: a & b,
+    'or_':   lambda a, b: a | b,
+    'xor':   lambda a, b: a ^ b,
+    'lshl':  lambda a, b: a << b if b < 16 else 0,
+    'shr':   lambda a, b: a >> b,
+    'abs':   lambda a, b: builtins.abs(signed(a)),
+    'max':   builtins.max,
+    'min':   builtins.min,
+    'ge':    lambda a, b: a >= b,
+    'le':    lambda a, b: a <= b,
+    'lt':    lambda a, b: a < b,
+    'eq':    lambda a, b: a == b,
+    'ne':    lambda a, b: a != b,
+}
+
+FOLD_SIGNED = {
+    'mul1':  mul(8, True),
+    'mul2':  mul(16, True),
+    'shr':   lambda a, b: signed(a) >> b,
+    'lt':    lambda a, b: signed(a) < signed(b),
+    'ge':    lambda a, b: signed(a) >= signed(b),
+    'le':    lambda a, b: signed(a) <= signed(b),
+    'max':   lambda a, b: a if signed(a) >= signed(b) else b,
+    'min':   lambda a, b: a if signed(a) <= signed(b) else b,
+}
+
+BITS = ['ge', 'le', 'lt', 'eq', 'ne']
+COMMUTATIVE = ['add', 'mul0', 'and_', 'or_', 'xor', 'eq', 'ne']
+
+def fold(op, a, b, signed_):
+    f = FOLD_SIGNED[op] if signed_ and op in FOLD_SIGNED else FOLD[op]
+    value = f(a, b)
+    return value if op in BITS else value & MASK
+
+def simplify(op, a, b, signed):
+    # identities with one constant operand, or None
+    if isinstance(a, int) and op in COMMUTATIVE:
+        a, b = b, a
+    if not isinstance(b, int):
+        return None
+    if b == 0 and op in ('add', 'sub', 'or_', 'xor', 'shr', 'lshl'):
+        return a
+    if b == 0 and op in ('mul0', 'and_'):
+        return 0
+    if (op == 'mul0' and b == 1) or (op == 'and_' and b == MASK):
+        return a
+    if op in ('shr', 'lshl') and b >= 16:
+        return apply(op, a, 15, signed) if op == 'shr' and signed else 0
+    if op == 'mul0' and b & (b - 1) == 0:
+        return apply('lshl', a, b.bit_length() - 1)
+    return None
+
+def apply(op, a, b, signed=False):
+    for x in (a, b):
+        if isinstance(x, bool) or isinstance(x, Node) and x.bit:
+            raise TypeError('{} of a bit'.format(op))
+    if isinstance(a, int) and isinstance(b, int):
+        return fold(op, a & MASK, b & MASK, signed)
+    if isinstance(b, int):
+        b &= MASK
+    if isinstance(a, int):
+        a &= MASK
+    value = simplify(op, a, b, signed)
+    if value is not None:
+        return value
+    if op in COMMUTATIVE and isinstance(a, int):
+        a, b = b, a
+    return node(op, (a, b), signed, op in BITS)
+
+def node(op, args, signed=False, bit=False):
+    if TRACING is None:
+        raise RuntimeError('nodes are only built while tracing a kernel')
+    key = (op, signed) + tuple(arg if isinstance(arg, int) else id(arg) for arg in args)
+    if key not in TRACING:
+        TRACING[key] = Node(op, args, signed, bit)
+        TRACING[key].index = len(TRACING)
+    return TRACING[key]
+
+#
+# Helpers for what python operators do not express
+#
+
+def same(args, values):
+    # args == values, comparing nodes by identity (Node has no ==)
+    return all(x is y if isinstance(x, Node) or isinstance(y, Node) else x == y
+               for x, y in zip(args, values))
+
+def select(cond, a, b):
+    # a if cond else b
+    if isinstance(cond, Node):
+        if not cond.bit:
+            raise TypeError('select on a value, not a bit')
+        if cond.op in ('ge', 'le') and same(cond.args, (a, b)):
+            return apply('max' if cond.op == 'ge' else 'min', a, b, cond.signed)
+        if cond.op in ('ge', 'le') and same(cond.args, (b, a)):
+            return apply('min' if cond.op == 'ge' else 'max', a, b, cond.signed)
+        for x in (a, b):
+            if isinstance(x, bool) or isinstance(x, Node) and x.bit:
+                raise TypeError('select of a bit')
+        if a is b:
+            return a
+        a, b = [x & MASK if isinstance(x, int) else x for x in (a, b)]
+        return node('sel', (a, b, cond))
+    return a if cond else b
+
+def max(a, b, signed=False):
+    return apply('max', a, b, signed)
+
+def min(a, b, signed=False):
+    return apply('min', a, b, signed)
+
+def ge(a, b, signed=False):
+    return apply('ge', a, b, signed)
+
+def le(a, b, signed=False):
+    return apply('le', a, b, signed)
+
+def lt(a, b, signed=False):
+    return apply('lt', a, b, signed)
+
+def gt(a, b, signed=False):
+    return apply('lt', b, a, signed)
+
+def eq(a, b):
+    return apply('eq', a, b)
+
+def ne(a, b):
+    return apply('ne', a, b)
+
+def ashr(a, b):
+    return apply('shr', a, b, signed=True)
+
+def mulmid(a, b, signed=False):
+    # bits 8..23 of the 32-bit product
+    return apply('mul1', a, b, signed)
+
+def mulhi(a, b, signed=False):
+    # bits 16..31 of the 32-bit product
+    return apply('mul2', a, b, signed)
+
+#
+# Instruction selection
+#
+
+# node op -> (isa constructor, flag_sel, output)
+SELECT = {
+    'add':  ('add', None, 'res'),
+    'sub':  ('sub', None, 'res'),
+    'mul0': ('mul0', None, 'res'),
+    'mul1': ('mul1', None, 'res'),
+    'mul2': ('mul2', None, 'res'),
+    'and_': ('and_', None, 'res'),
+    'or_':  ('or_', None, 'res'),
+    'xor':  ('xor', None, 'res'),
+    'lshl': ('lshl', None, 'res'),
+    'shr':  ('shr', None, 'res'),
+    'abs':  ('abs', None, 'res'),
+    'max':  ('ge', None, 'res'),
+    'min':  ('le', None, 'res'),
+    'sel':  ('sel', None, 'res'),
+    'ge':   ('ge', 0xF, 'res_p'),
+    'le':   ('le', 0xF, 'res_p'),
+    'eq':   ('sub', 0x0, 'res_p'),
+    'ne':   ('sub', 0x1, 'res_p'),
+    'lt':   ('sub', 0x3, 'res_p'),
+}
+
+PORTS = ['data0', 'data1', 'bit0']
+REGS = {'data0': 'rega', 'data1': 'regb', 'bit0': 'regd'}
+
+# A PE: its isa constructor, signedness and flag_sel (None for the
+# default), and per input port a constant, an input name or a
+# (cell index, output) wire
+Cell = namedtuple('Cell', ['op', 'signed', 'flag', 'sources', 'x', 'y'])
+
+class Netlist(namedtuple('Netlist', ['cells', 'inputs', 'outputs'])):
+
+    def fabric(self, width=None, height=None):
+        # A Fabric of new PEs for the cells. With height, the cells of
+        # a column that does not fit continue in the next ones.
+        if height is not None:
+            cells = self.place(height)
+        else:
+            cells = self.cells
+        f = Fabric(width, height)
+        pes = []
+        for cell in cells:
+            pes.append(f.place(build(cell), cell.x, cell.y))
+        for pe, cell in zip(pes, cells):
+            for port, src in zip(PORTS, cell.sources):
+                if isinstance(src, str):
+                    f.input(src, pe, port)
+                elif isinstance(src, tuple):
+                    f.wire(pes[src[0]], src[1], pe, port)
+        for name, (i, output) in self.outputs.items():
+            f.output(name, pes[i], output)
+        return f
+
+    def place(self, height):
+        cells = []
+        x, y, column = -1, height, None
+        for cell in self.cells:
+            if cell.x != column or y == height:
+                x, y, column = x + 1, 0, cell.x
+            cells.append(cell._replace(x=x, y=y))
+            y += 1
+        return cells
+
+def build(cell):
+    f = getattr(isa, cell.op)
+    pe = f(cell.signed) if f.__code__.co_argcount else f()
+    if cell.flag is not None:
+        pe.flag(cell.flag)
+    for port, src in zip(PORTS, cell.sources):
+        if isinstance(src, int):
+            getattr(pe, REGS[port])(CONST, src)
+    return pe
+
+class Selector:
+
+    def __init__(self, inputs):
+        self.inputs = inputs
+        self.cells = []
+        self.merge = {}   # (op, signed, sources) -> cell indices
+        self.wires = {}   # id(node) -> source
+        self.levels = []
+
+    def source(self, x):
+        if isinstance(x, bool):
+            return int(x)
+        if isinstance(x, int):
+            return x
+        return self.wires[id(x)]
+
+    def level(self, sources):
+        return 1 + builtins.max([self.levels[src[0]] for src in sources
+                                 if isinstance(src, tuple)], default=-1)
+
+    def cell(self, op, signed, flag, sources):
+        # the index of a cell computing op, merged with an existing one
+        # where flag_sel allows
+        key = (op, signed, sources)
+        for i in self.merge.get(key, []):
+            if flag is None or self.cells[i].flag in (None, flag):
+                if flag is not None:
+                    self.cells[i] = self.cells[i]._replace(flag=flag)
+                return i
+        i = len(self.cells)
+        level = self.level(sources)
+        self.levels.append(level)
+        self.cells.append(Cell(op, signed, flag, sources, level, 0))
+        self.merge.setdefault(key, []).append(i)
+        return i
+
+    def select(self, node):
+        if node.op == 'input':
+            self.wires[id(node)] = node.name
+            return
+        op, flag, output = SELECT[node.op]
+        if node.op == 'lt' and node.signed:
+            flag = 0xB
+        sources = tuple(self.source(arg) for arg in node.args)
+        if node.op == 'abs':
+            sources = sources[:1]
+        signed = (node.signed and op != 'sub') or op == 'abs'
+        self.wires[id(node)] = (self.cell(op, signed, flag, sources), output)
+
+    def output(self, value):
+        # a (cell, output) for a returned value
+        if isinstance(value, Node) and value.op != 'input':
+            return self.wires[id(value)]
+        if isinstance(value, bool):
+            # or_ of 0 and 0 with flag Z (1) or ~Z (0)
+            return self.cell('or_', False, 0x0 if value else 0x1, (0, 0)), 'res_p'
+        return self.cell('or_', False, None, (self.source(value), 0)), 'res'
+
+    def netlist(self, outputs):
+        outputs = {name: self.output(value) for name, value in outputs.items()}
+        # number the rows of each column
+        rows = {}
+        cells = []
+        for cell in self.cells:
+            cells.append(cell._replace(y=rows.get(cell.x, 0)))
+            rows[cell.x] = cells[-1].y + 1
+        return Netlist(tuple(cells), tuple(self.inputs), outputs)
+
+def live(outputs):
+    # ids of the nodes the outputs depend on
+    seen = set()
+    stack = [x for x in outputs.values() if isinstance(x, Node)]
+    while stack:
+        x = stack.pop()
+        if id(x) not in seen:
+            seen.add(id(x))
+            stack.extend(arg for arg in x.args if isinstance(arg, Node))
+    return seen
+
+def trace(kernel):
+    # (input names, {output name: value}, nodes in trace order)
+    global TRACING
+    names = list(inspect.signature(kernel).parameters)
+    TRACING = {}
+    try:
+        inputs = [Node('input', (), name=name) for name in names]
+        result = kernel(*inputs)
+        nodes = sorted(TRACING.values(), key=lambda node: node.index)
+    finally:
+        TRACING = None
+    if isinstance(result, dict):
+        outputs = dict(result)
+    elif isinstance(result, (tuple, list)):
+        outputs = {'out{}'.format(i): value for i, value in enumerate(result)}
+    else:
+        outputs = {'out': result}
+    return names, outputs, inputs + nodes
+
+@lru_cache(maxsize=256)
+def netlist(kernel):
+    names, outputs, nodes = trace(kernel)
+    selector = Selector(names)
+    used = live(outputs)
+    for node in nodes:
+        if id(node) in used or node.op == 'input':
+            selector.select(node)
+    return selector.netlist(outputs)
+
+def fabric(kernel, width=None, height=None):
+    return netlist(kernel).fabric(width, height)
+
+def evaluate(kernel, *args):
+    # {output name: value} of the kernel for inputs args, with the
+    # semantics of the mapped PEs
+    names, outputs, nodes = trace(kernel)
+    if len(args) != len(names):
+        raise ValueError('{} takes {} inputs'.format(kernel.__name__, len(names)))
+    values = {}
+    value = lambda x: values[id(x)] if isinstance(x, Node) else int(x)
+    for node in nodes:
+        if node.op == 'input':
+            values[id(node)] = int(args[names.index(node.name)]) & MASK
+        elif node.op == 'sel':
+            a, b, d = [value(arg) for arg in node.args]
+            values[id(node)] = a if d else b
+        else:
+            a, b = [value(arg) for arg in node.args]
+            if node.op in ('shr', 'lshl') and isinstance(node.args[1], Node):
+                b &= 0xf
+            values[id(node)] = fold(node.op, a, b, node.signed)
+    return {name: int(value(x)) & MASK for name, x in outputs.items()}
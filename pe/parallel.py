@@ -0,0 +1,202 @@
+import multiprocessing
+import threading
+from multiprocessing import shared_memory
+
+__all__ = ['ParallelFabric']
+
+#
+# Multiprocess simulation of a Fabric.
+#
+# The placed PEs are split into column tiles by x, one per worker process.
+# Workers are forked from the parent, so each starts with a copy of the
+# fabric, and only evaluate and clock the PEs of their own tile.
+#
+# Signals crossing a tile boundary (and the named outputs) go through one
+# shared int32 buffer laid out as
+#
+#   [run, clk_en] [external inputs x 2] [res, res_p, irq per PE]
+#
+# The inputs are double buffered by cycle parity, so the parent can write
+# the next cycle's inputs while workers still clock registers from them.
+# Each cycle everyone meets at a barrier once the inputs are written, again
+# before any level that reads a signal produced by another tile in the same
+# cycle, and once the network has settled. The parent reads the outputs at
+# that point while workers clock their registers.
+#
+
+NOUTPUTS = 3
+
+class ParallelFabric:
+
+    def __init__(self, fabric, workers):
+        if fabric.levels is None:
+            fabric.schedule()
+        self.fabric = fabric
+        self.workers = workers
+        self.processes = None
+
+        pes = fabric.pes
+        order = sorted(range(len(pes)), key=lambda i: (pes[i].x, pes[i].y))
+        self.tile = [0] * len(pes)
+        for n, i in enumerate(order):
+            self.tile[i] = n * workers // len(pes)
+
+        names = [src for sources in fabric.sources for src in sources
+                 if src is not None and not isinstance(src, tuple)]
+        self.inputs = {name: 2 + k for k, name in enumerate(dict.fromkeys(names))}
+        self.ninputs = len(self.inputs)
+        self.base = 2 + 2 * self.ninputs
+        self.cycle = 0
+
+        # PEs whose outputs are read by another tile, or probed
+        self.boundary = set(i for i, _ in fabric.probes.values())
+        for dst, sources in enumerate(fabric.sources):
+            for src in sources:
+                if isinstance(src, tuple) and self.tile[src[0]] != self.tile[dst]:
+                    self.boundary.add(src[0])
+
+        # levels that must wait for another tile in the same cycle
+        level = {i: n for n, lvl in enumerate(fabric.levels) for i in lvl}
+        registered = set((i, j) for reg, i, j in fabric.registers)
+        self.syncs = set()
+        for dst, sources in enumerate(fabric.sources):
+            for j, src in enumerate(sources):
+                if isinstance(src, tuple) and self.tile[src[0]] != self.tile[dst] \
+                   and (dst, j) not in registered:
+                    self.syncs.add(level[dst])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        context = multiprocessing.get_context('fork')
+        size = 4 * (self.base + NOUTPUTS * len(self.fabric.pes))
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.buf = self.shm.buf.cast('i')
+        self.buf[0] = 1
+        self.barrier = context.Barrier(self.workers + 1)
+        self.queue = context.Queue()
+        self.processes = [context.Process(target=self.work, args=(tile,), daemon=True)
+                          for tile in range(self.workers)]
+        for process in self.processes:
+            process.start()
+
+    def close(self):
+        if self.processes is None:
+            return
+        self.buf[0] = 0
+        try:
+            self.barrier.wait()
+        except threading.BrokenBarrierError:
+            # a worker failed; its register state is lost
+            for process in self.processes:
+                process.terminate()
+        else:
+            # copy the register state back into the parent's fabric
+            registers = {(i, j): reg for reg, i, j in self.fabric.registers}
+            for process in self.processes:
+                for i, j, value, last_clk in self.queue.get():
+                    reg = registers[i, j]
+                    reg.value = type(reg)(reg.mode, value, reg.width).value
+                    reg.last_clk = last_clk
+        for process in self.processes:
+            process.join()
+        self.buf.release()
+        self.shm.close()
+        self.shm.unlink()
+        self.processes = None
+
+    def step(self, inputs={}, clk_en=1):
+        if self.processes is None:
+            self.start()
+        buf = self.buf
+        buf[1] = int(clk_en)
+        parity = self.ninputs * (self.cycle & 1)
+        for name, k in self.inputs.items():
+            buf[k + parity] = int(inputs.get(name, 0))
+        self.cycle += 1
+        self.barrier.wait()
+        for n in range(len(self.syncs)):
+            self.barrier.wait()
+        self.barrier.wait()
+        return {name: buf[self.base + NOUTPUTS * i + k]
+                for name, (i, k) in self.fabric.probes.items()}
+
+    def run(self, stimulus, clk_en=1):
+        for inputs in stimulus:
+            yield self.step(inputs, clk_en)
+
+    def work(self, tile):
+        try:
+            self._work(tile)
+        except BaseException:
+            self.barrier.abort()
+            raise
+
+    def _work(self, tile):
+        fabric, buf, barrier, base = self.fabric, self.buf, self.barrier, self.base
+        funcs = fabric.funcs
+        mine = [i for i in range(len(fabric.pes)) if self.tile[i] == tile]
+        levels = [[i for i in level if self.tile[i] == tile] for level in fabric.levels]
+        registers = [(reg, i, j) for reg, i, j in fabric.registers if self.tile[i] == tile]
+
+        # resolve every input to a (kind, a, b) source
+        LOCAL, SHARED, INPUT, ZERO = 0, 1, 2, 3
+        sources = {}
+        for i in mine:
+            resolved = []
+            for src in fabric.sources[i]:
+                if src is None:
+                    resolved.append((ZERO, 0, 0))
+                elif isinstance(src, tuple):
+                    if self.tile[src[0]] == tile:
+                        resolved.append((LOCAL, src[0], src[1]))
+                    else:
+                        resolved.append((SHARED, base + NOUTPUTS * src[0] + src[1], 0))
+                else:
+                    resolved.append((INPUT, self.inputs[src], 0))
+            sources[i] = resolved
+        boundary = [i in self.boundary for i in range(len(fabric.pes))]
+
+        values = [None] * len(fabric.pes)
+        parity = 0
+
+        def value(kind, a, b):
+            if kind == LOCAL:
+                outputs = values[a]
+                return 0 if outputs is None else outputs[b]
+            elif kind == SHARED:
+                return buf[a]
+            elif kind == INPUT:
+                return buf[a + parity]
+            return 0
+
+        cycle = 0
+        while True:
+            barrier.wait()
+            if not buf[0]:
+                break
+            clk_en = buf[1]
+            parity = self.ninputs * (cycle & 1)
+            cycle += 1
+            for n, level in enumerate(levels):
+                if n in self.syncs:
+                    barrier.wait()
+                for i in level:
+                    args = [value(*src) for src in sources[i]]
+                    values[i] = outputs = funcs[i](*args, clk=0, clk_en=clk_en)
+                    if boundary[i]:
+                        k = base + NOUTPUTS * i
+                        buf[k], buf[k+1], buf[k+2] = \
+                            int(outputs[0]), int(outputs[1]), int(bool(outputs[2]))
+            barrier.wait()
+
+            # posedge
+            for reg, i, j in registers:
+                reg(value(*sources[i][j]), 1, clk_en)
+
+        self.queue.put([(i, j, int(reg.value), reg.last_clk) for reg, i, j in registers])
+        self.buf.release()
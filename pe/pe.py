@@ -1,5 +1,7 @@
-from hwtypes import BitVector, UIntVector, SIntVector
-from .config import config
+import os
+from .config import config, Format
+from . import intops
+from . import stats
 
 __all__ = ['PE']
 
@@ -10,8 +12,37 @@ VALID = 1
 BYPASS = 2
 DELAY = 3
 
-BITZERO = BitVector(0, num_bits=1)
-ZERO = BitVector(0, num_bits=DATAWIDTH)
+BV = 'bv'
+INT = 'int'
+BACKENDS = [BV, INT]
+
+# backend of the pe.isa PEs constructed without one; PEs of other ops
+# are always bv
+BACKEND = os.environ.get('PE_BACKEND', BV)
+
+# regcode (register modes), flag_sel, irq_en, signed and opcode
+INSTRUCTION = Format('r' * 14 + 'ffffiia00soooooo')
+
+#
+# hwtypes takes most of the package's import time and only the bv backend
+# needs it, so it is imported by load_hwtypes(): by the first bv Register,
+# COND or ALU evaluation. Until then the names below are resolved through
+# the module __getattr__, so `from pe.pe import BitVector` loads it.
+#
+HWTYPES = ['BitVector', 'UIntVector', 'SIntVector', 'BITZERO', 'ZERO']
+
+def load_hwtypes():
+    global BitVector, UIntVector, SIntVector, BITZERO, ZERO
+    if 'ZERO' not in globals():
+        from hwtypes import BitVector, UIntVector, SIntVector
+        BITZERO = BitVector(0, num_bits=1)
+        ZERO = BitVector(0, num_bits=DATAWIDTH)
+
+def __getattr__(name):
+    if name in HWTYPES:
+        load_hwtypes()
+        return globals()[name]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def msb(value):
@@ -19,12 +50,100 @@ def msb(value):
 
 
 def signed(value):
+    load_hwtypes()
     return SIntVector(value._value, value.num_bits)
 
 
+#
+# Z/C/N/V flag logic, shared by PE.get_flag and PE.compile
+#
+def carry(ra, rb, rd):
+    return (ra.ext(1) + rb.ext(1))[16]
+
+def carry_add(ra, rb, rd):
+    return (ra.ext(1) + rb.ext(1) + rd.ext(1))[16]
+
+def carry_sub(ra, rb, rd):
+    return (ra.ext(1) + (~rb).ext(1) + 1)[16]
+
+def carry_abs(ra, rb, rd):
+    return ((~ra).ext(1) + 1)[16]
+
+CARRY = {
+    0x0: carry_add,
+    0x1: carry_sub, 0x4: carry_sub, 0x5: carry_sub,
+    0x3: carry_abs,
+}
+
+def overflow(ra, rb, rd):
+    return (ra[15] == rb[15]) and (ra[15] != (ra + rb)[15])
+
+def overflow_add(ra, rb, rd):
+    return (ra[15] == rb[15]) and (ra[15] != (ra + rb + rd)[15])
+
+def overflow_sub(ra, rb, rd):
+    return (ra[15] != rb[15]) and (ra[15] != (ra + ~rb + 1)[15])
+
+def overflow_abs(ra, rb, rd):
+    return ra == 0x8000
+
+def overflow_mul(ra, rb, rd):
+    return (ra * rb)[15] if (ra[15] == rb[15]) else (ra * rb)[15] == 0 and (ra != 0 or rb != 0)
+
+def overflow_none(ra, rb, rd):
+    return 0
+
+OVERFLOW = {
+    0x0: overflow_add,
+    0x1: overflow_sub,
+    0x3: overflow_abs,
+    0xb: overflow_mul, 0xc: overflow_mul, # mul0, mul1
+    0xd: overflow_none,
+    0x4: overflow_none, 0x5: overflow_none,
+    0x12: overflow_none, 0x13: overflow_none, 0x14: overflow_none, # and, or, xor clear overflow flag
+    0xf: overflow_none, 0x11: overflow_none, # lshl, lshr
+    0x8: overflow_none, # sel
+}
+
+# flag_sel -> (flags used, predicate)
+FLAGS = [
+    ('Z',   lambda Z, C, N, V, lut, p: Z),
+    ('Z',   lambda Z, C, N, V, lut, p: not Z),
+    ('C',   lambda Z, C, N, V, lut, p: C),
+    ('C',   lambda Z, C, N, V, lut, p: not C),
+    ('N',   lambda Z, C, N, V, lut, p: N),
+    ('N',   lambda Z, C, N, V, lut, p: not N),
+    ('V',   lambda Z, C, N, V, lut, p: V),
+    ('V',   lambda Z, C, N, V, lut, p: not V),
+    ('ZC',  lambda Z, C, N, V, lut, p: C and not Z),
+    ('ZC',  lambda Z, C, N, V, lut, p: not C or Z),
+    ('NV',  lambda Z, C, N, V, lut, p: N == V),
+    ('NV',  lambda Z, C, N, V, lut, p: N != V),
+    ('ZNV', lambda Z, C, N, V, lut, p: not Z and (N == V)),
+    ('ZNV', lambda Z, C, N, V, lut, p: Z or (N != V)),
+    ('',    lambda Z, C, N, V, lut, p: lut),
+    ('',    lambda Z, C, N, V, lut, p: p),
+]
+
+def unused(*args):
+    return None
+
+OUTPUTS = frozenset(['res', 'res_p', 'irq'])
+
+ISA = __name__.rpartition('.')[0] + '.isa'
+
+def native(op):
+    # True for the ops of the pe.isa constructors, which intops and
+    # pe.batch implement by opcode; any other op needs the bv backend
+    op = getattr(op, 'func', op)
+    return getattr(op, '__module__', None) == ISA
+
+
 class Register:
+    __slots__ = ['mode', 'value', 'width', 'last_clk']
 
     def __init__(self, mode, init, width):
+        load_hwtypes()
         self.mode = mode
         self.value = BitVector(init, num_bits=width)
         self.width = width
@@ -54,8 +173,69 @@ class Register:
         else:
             raise NotImplementedError()
 
+    def compile(self):
+        # __call__ specialized to the current mode
+        if self.mode == CONST:
+            const = self.value
+            return lambda value, clk, clk_en: const
+        elif self.mode == BYPASS:
+            width = self.width
+            def bypass(value, clk, clk_en):
+                if not isinstance(value, BitVector):
+                    value = BitVector(value, width)
+                return value
+            return bypass
+        elif self.mode in [DELAY, VALID]:
+            return self.__call__
+        else:
+            raise NotImplementedError()
+
+
+class IntRegister(Register):
+    # Register holding a masked int, for the int backend
+    __slots__ = ['mask']
+
+    def __init__(self, mode, init, width):
+        self.mode = mode
+        self.mask = (1 << width) - 1
+        self.value = int(init) & self.mask
+        self.width = width
+        self.last_clk = 0
+
+    def __call__(self, value, clk, clk_en):
+        value &= self.mask
+
+        if self.mode in [DELAY, VALID]:
+            retvalue = self.value
+            # TODO: Assumes posedge
+            if not self.last_clk and clk:
+                if self.mode == DELAY or clk_en:
+                    self.value = value
+                    retvalue = value
+            self.last_clk = clk
+            return retvalue
+        elif self.mode == CONST:
+            return self.value
+        elif self.mode == BYPASS:
+            return value
+        else:
+            raise NotImplementedError()
+
+    def compile(self):
+        if self.mode == CONST:
+            const = self.value
+            return lambda value, clk, clk_en: const
+        elif self.mode == BYPASS:
+            mask = self.mask
+            return lambda value, clk, clk_en: value & mask
+        elif self.mode in [DELAY, VALID]:
+            return self.__call__
+        else:
+            raise NotImplementedError()
+
 
 class ALU:
+    __slots__ = ['op', 'signed', 'double', 'opcode', 'width', '_carry']
 
     def __init__(self, op, opcode, width, signed=False, double=False):
         self.op = op
@@ -66,6 +246,7 @@ class ALU:
         self._carry = False
 
     def __call__(self, op_a=0, op_b=0, c=0, op_d_p=0):
+        load_hwtypes()
         bv = UIntVector if not self.signed else  SIntVector
         a = bv(op_a, num_bits=self.width)
         b = bv(op_b, num_bits=self.width)
@@ -81,10 +262,31 @@ class ALU:
     def carry(self):
         self._carry = True
 
+    def compile(self):
+        # __call__ specialized to the current signedness and carry mode
+        load_hwtypes()
+        bv = UIntVector if not self.signed else  SIntVector
+        op, width = self.op, self.width
+        if self._carry:
+            def alu(op_a=0, op_b=0, c=0, op_d_p=0):
+                a = bv(op_a, num_bits=width)
+                b = bv(op_b, num_bits=width)
+                res = op(a, b, bv(c, num_bits=width), bv(op_d_p, num_bits=width))
+                return res, BitVector(a._value + b._value >= (2 ** width), 1)
+        else:
+            def alu(op_a=0, op_b=0, c=0, op_d_p=0):
+                return op(bv(op_a, num_bits=width),
+                          bv(op_b, num_bits=width),
+                          bv(c, num_bits=width),
+                          bv(op_d_p, num_bits=width))
+        return alu
+
 
 class COND:
+    __slots__ = ['cond', 'signed']
 
     def __init__(self, cond, signed=False):
+        load_hwtypes()
         self.cond = cond
         self.signed = signed
 
@@ -93,8 +295,7 @@ class COND:
         return self.cond(*return_vals)
 
     def compare(self, a, b, res):
-        eq = a == b
-        eq = eq.as_int()
+        eq = int(a == b)
         a_msb = msb(a)
         b_msb = msb(b)
         c_msb = msb(res)
@@ -111,57 +312,285 @@ class COND:
 
 
 class PE:
-
-    def __init__(self, opcode, alu=None, signed=0):
+    __slots__ = ['_backend', '_table', '_opcode', '_signed', '_alu', '_add', '_cond',
+                 'regcode', 'RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF',
+                 'raconst', 'rbconst', 'rcconst', 'rdconst', 'reconst', 'rfconst',
+                 'x', 'y', '_lut', '_lut_code', 'flag_sel', 'irq_en_0', 'irq_en_1',
+                 '_debug_trig', '_debug_trig_p', 'raise_debug_trig', 'raise_debug_trig_p',
+                 '_outputs']
+
+    def __init__(self, opcode, alu=None, signed=0, backend=None):
+        if backend is None:
+            backend = BACKEND if opcode in intops.ALU and native(alu) else BV
+        if backend not in BACKENDS:
+            raise ValueError(backend)
+        if backend == INT and (opcode not in intops.ALU or not native(alu)):
+            raise NotImplementedError(opcode)
+        self._backend = backend
+        self._table = None
         self.alu(opcode, signed, alu)
         self.cond()
         self.reg()
         self.place()
         self._lut = None
+        self._lut_code = None
         self.flag_sel = 0x0
         self.irq_en_0 = False
         self.irq_en_1 = False
         self._debug_trig = 0x0
         self._debug_trig_p = 0x0
+        self._outputs = None
+
+    @classmethod
+    def from_instruction(cls, word, consts=None, lut=None, backend=None):
+        # The PE configured by an instruction word. Register constants
+        # ({'a': value, ...}) and the LUT code are not encoded in the word.
+        from .loader import decode
+        return decode(word, consts, lut, backend)
+
+    def snapshot(self):
+        # The register and trigger state as bytes, see pe.checkpoint
+        from .checkpoint import snapshot
+        return snapshot(self).tobytes()
+
+    def restore(self, state):
+        from .checkpoint import restore
+        return restore(self, state)
 
     def __call__(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk=0, clk_en=1):
+        if stats.ACTIVE is not None:
+            return stats.ACTIVE.call(self, data0, data1, c, bit0, bit1, bit2, clk, clk_en)
+        if self._table is not None:
+            return self._table(data0, data1, c, bit0, bit1, bit2)
+        if self._backend == INT:
+            return self._call_int(data0, data1, c, bit0, bit1, bit2, clk, clk_en)
+
+        # the stages are methods shared with stats.Stats.staged
+        ra, rb, rc, rd, re, rf = self.get_registers(data0, data1, c, bit0, bit1, bit2,
+                                                    clk, clk_en)
+        res, alu_res_p = self.get_alu(ra, rb, rc, rd)
+        lut_out = self.get_lut(rd, re, rf)
+        res_p = self.get_res_p(ra, rb, rc, rd, res, alu_res_p, lut_out)
+        # if self._cond:
+        #     res_p = self._cond(ra, rb, res)
+        irq = self.get_irq(res, res_p)
 
-        ra = self.RegA(data0, clk, clk_en)
-        rb = self.RegB(data1, clk, clk_en)
-        rc = self.RegC(c, clk, clk_en)
-        rd = self.RegD(bit0, clk, clk_en)
-        re = self.RegE(bit1, clk, clk_en)
-        rf = self.RegF(bit2, clk, clk_en)
+        return res.as_uint(), res_p.as_uint(), irq
+
+    def get_registers(self, data0, data1, c, bit0, bit1, bit2, clk, clk_en):
+        return self.RegA(data0, clk, clk_en), \
+               self.RegB(data1, clk, clk_en), \
+               self.RegC(c, clk, clk_en), \
+               self.RegD(bit0, clk, clk_en), \
+               self.RegE(bit1, clk, clk_en), \
+               self.RegF(bit2, clk, clk_en)
 
+    def get_alu(self, ra, rb, rc, rd):
+        # (res, alu res_p)
         res = ZERO
-        res_p = BITZERO
         alu_res_p = BITZERO
-
         if self._add:
             add = self._add(ra, rb, rc, rd)
-
         if self._alu:
             res = self._alu(ra, rb, rc, rd)
             if isinstance(res, tuple):
                 res, alu_res_p = res[0], res[1]
+        return res, alu_res_p
 
-        lut_out = BITZERO
-        if self._lut:
-            lut_out = self._lut(rd, re, rf)
+    def get_lut(self, rd, re, rf):
+        # only evaluated when flag_sel selects it
+        if self._lut and self.flag_sel == 0xE:
+            return self._lut(rd, re, rf)
+        return BITZERO
 
+    def get_res_p(self, ra, rb, rc, rd, res, alu_res_p, lut_out):
         res_p = self.get_flag(ra, rb, rc, rd, res, alu_res_p, lut_out)
         if not isinstance(res_p, BitVector):
             assert res_p in {0, 1}, res_p
             res_p = BitVector(res_p, 1)
-        # if self._cond:
-        #     res_p = self._cond(ra, rb, res)
+        return res_p
 
+    def get_irq(self, res, res_p):
         # Set internal flags to determine whether debug trigger should be raised
         # for both the result and the predicate.
         self.raise_debug_trig = res != self._debug_trig
         self.raise_debug_trig_p = res_p != self._debug_trig_p
+        return self.get_irq_trigger()
+
+    def _call_int(self, data0, data1, c, bit0, bit1, bit2, clk, clk_en):
+        ra = self.RegA(data0, clk, clk_en)
+        rb = self.RegB(data1, clk, clk_en)
+        rc = self.RegC(c, clk, clk_en)
+        rd = self.RegD(bit0, clk, clk_en)
+        re = self.RegE(bit1, clk, clk_en)
+        rf = self.RegF(bit2, clk, clk_en)
 
-        return res.as_uint(), res_p.as_uint(), self.get_irq_trigger()
+        res = intops.ALU[self._opcode](ra, rb, rc, rd, self._alu.signed)
+        alu_res_p = 0
+        if isinstance(res, tuple):
+            res, alu_res_p = res
+        elif self._alu._carry:
+            alu_res_p = intops.carry(ra, rb, rd)
+
+        lut_out = 0
+        if self._lut and self.flag_sel == 0xE:
+            lut_out = (self._lut_code >> ((rf << 2) | (re << 1) | rd)) & 1
+
+        if self.flag_sel not in range(len(FLAGS)):
+            raise NotImplementedError(self.flag_sel)
+        needs, flag = FLAGS[self.flag_sel]
+        Z = res == 0 if 'Z' in needs else None
+        C = intops.CARRY.get(self._opcode, intops.carry)(ra, rb, rd) if 'C' in needs else None
+        N = res >> 15 if 'N' in needs else None
+        V = intops.OVERFLOW.get(self._opcode, intops.overflow)(ra, rb, rd) if 'V' in needs else None
+        res_p = int(bool(flag(Z, C, N, V, lut_out, alu_res_p)))
+
+        self.raise_debug_trig = res != (self._debug_trig & intops.MASK)
+        self.raise_debug_trig_p = res_p != (self._debug_trig_p & 1)
+
+        return res, res_p, self.get_irq_trigger()
+
+    def eval_batch(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+        # Evaluate many samples at once over numpy arrays, returning
+        # (res, res_p, irq) arrays. Registers are not clocked.
+        if self._table is not None:
+            return self._table.eval_batch(data0, data1, c, bit0, bit1, bit2)
+        from .batch import eval_batch
+        return eval_batch(self, data0, data1, c, bit0, bit1, bit2)
+
+    def run(self, stimulus, clk_en=1, vcd=None):
+        # Yield (res, res_p, irq) for each cycle of stimulus, toggling the
+        # clock internally; see simulator.Simulator.
+        from .simulator import Simulator
+        with Simulator(self, vcd) as simulator:
+            yield from simulator.run(stimulus, clk_en)
+
+    def tabulate(self):
+        # Replace evaluation with lookups into a precomputed truth table.
+        # Requires all registers in BYPASS or CONST mode; reconfiguring
+        # the PE drops the table.
+        from .table import tabulate
+        self._table = tabulate(self)
+        return self
+
+    def compile(self, outputs=None):
+        # Return a function equivalent to __call__ for the current
+        # configuration, with every configuration-time branch resolved.
+        # Recompile after reconfiguring the PE. outputs (by default those
+        # set by outputs()) limits the work to the outputs used.
+        if self._table is not None:
+            return self._table
+        need_alu, need_flag, need_irq = self.demand(self._outputs if outputs is None else outputs)
+        if self._backend == INT:
+            return self._compile_int(need_alu, need_flag, need_irq)
+
+        RegA = self.RegA.compile()
+        RegB = self.RegB.compile()
+        RegC = self.RegC.compile()
+        RegD = self.RegD.compile()
+        RegE = self.RegE.compile()
+        RegF = self.RegF.compile()
+        alu = self._alu.compile()
+
+        if self.flag_sel not in range(len(FLAGS)):
+            raise NotImplementedError(self.flag_sel)
+        needs, flag = FLAGS[self.flag_sel]
+        Z = (lambda res: res == 0) if 'Z' in needs else unused
+        C = CARRY.get(self._opcode, carry) if 'C' in needs else unused
+        N = (lambda res: res[15]) if 'N' in needs else unused
+        V = OVERFLOW.get(self._opcode, overflow) if 'V' in needs else unused
+        lut = self._lut if self._lut and self.flag_sel == 0xE else \
+              lambda bit0, bit1, bit2: BITZERO
+
+        if need_irq:
+            debug_trig, debug_trig_p = self._debug_trig, self._debug_trig_p
+            def irq(res, res_p):
+                self.raise_debug_trig = res != debug_trig
+                self.raise_debug_trig_p = res_p != debug_trig_p
+                return self.get_irq_trigger()
+        else:
+            def irq(res, res_p):
+                return False
+
+        def evaluate(data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk=0, clk_en=1):
+            ra = RegA(data0, clk, clk_en)
+            rb = RegB(data1, clk, clk_en)
+            rc = RegC(c, clk, clk_en)
+            rd = RegD(bit0, clk, clk_en)
+            re = RegE(bit1, clk, clk_en)
+            rf = RegF(bit2, clk, clk_en)
+
+            res = ZERO
+            alu_res_p = BITZERO
+            if need_alu:
+                res = alu(ra, rb, rc, rd)
+                if isinstance(res, tuple):
+                    res, alu_res_p = res[0], res[1]
+
+            res_p = BITZERO
+            if need_flag:
+                res_p = flag(Z(res), C(ra, rb, rd), N(res), V(ra, rb, rd),
+                             lut(rd, re, rf), alu_res_p)
+                if not isinstance(res_p, BitVector):
+                    res_p = BitVector(res_p, 1)
+
+            return res.as_uint(), res_p.as_uint(), irq(res, res_p)
+
+        return evaluate
+
+    def _compile_int(self, need_alu=True, need_flag=True, need_irq=True):
+        RegA = self.RegA.compile()
+        RegB = self.RegB.compile()
+        RegC = self.RegC.compile()
+        RegD = self.RegD.compile()
+        RegE = self.RegE.compile()
+        RegF = self.RegF.compile()
+        alu = intops.ALU[self._opcode]
+        signed = self._alu.signed
+        alu_carry = intops.carry if self._alu._carry else unused
+
+        if self.flag_sel not in range(len(FLAGS)):
+            raise NotImplementedError(self.flag_sel)
+        needs, flag = FLAGS[self.flag_sel]
+        C = intops.CARRY.get(self._opcode, intops.carry) if 'C' in needs else unused
+        V = intops.OVERFLOW.get(self._opcode, intops.overflow) if 'V' in needs else unused
+        code = self._lut_code if self._lut and self.flag_sel == 0xE else 0
+
+        if need_irq:
+            debug_trig = self._debug_trig & intops.MASK
+            debug_trig_p = self._debug_trig_p & 1
+            def irq(res, res_p):
+                self.raise_debug_trig = res != debug_trig
+                self.raise_debug_trig_p = res_p != debug_trig_p
+                return self.get_irq_trigger()
+        else:
+            def irq(res, res_p):
+                return False
+
+        def evaluate(data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk=0, clk_en=1):
+            ra = RegA(data0, clk, clk_en)
+            rb = RegB(data1, clk, clk_en)
+            rc = RegC(c, clk, clk_en)
+            rd = RegD(bit0, clk, clk_en)
+            re = RegE(bit1, clk, clk_en)
+            rf = RegF(bit2, clk, clk_en)
+
+            res = alu_res_p = 0
+            if need_alu:
+                res = alu(ra, rb, rc, rd, signed)
+                if isinstance(res, tuple):
+                    res, alu_res_p = res
+                else:
+                    alu_res_p = alu_carry(ra, rb, rd)
+
+            res_p = 0
+            if need_flag:
+                res_p = int(bool(flag(res == 0, C(ra, rb, rd), res >> 15, V(ra, rb, rd),
+                                      (code >> ((rf << 2) | (re << 1) | rd)) & 1, alu_res_p)))
+
+            return res, res_p, irq(res, res_p)
+
+        return evaluate
 
     def get_irq_trigger(self):
         return (self.irq_en_0 and self.raise_debug_trig_p) \
@@ -170,93 +599,89 @@ class PE:
     def irq_en(self, en_0=True, en_1=True):
         self.irq_en_0 = en_0
         self.irq_en_1 = en_1
+        self._table = None
         return self
 
     def debug_trig(self, value):
         self._debug_trig = value
+        self._table = None
         return self
 
     def debug_trig_p(self, value):
         self._debug_trig_p = value
+        self._table = None
         return self
 
     def get_flag(self, ra, rb, rc, rd, alu_res, alu_res_p, lut_out):
-        Z = alu_res == 0
-        if self._opcode == 0x0: # add
-            C = (ra.ext(1) + rb.ext(1) + rd.ext(1))[16]
-        elif self._opcode in [0x1, 0x4, 0x5]: # sub
-            C = (ra.ext(1) + (~rb).ext(1) + 1)[16]
-        elif self._opcode == 0x3: # abs
-            C = ((~ra).ext(1) + 1)[16]
-        else:
-            C = (ra.ext(1) + rb.ext(1))[16]
-        N = alu_res[15]
-        if self._opcode == 0x0: # add
-            V = (ra[15] == rb[15]) and (ra[15] != (ra + rb + rd)[15])
-        elif self._opcode == 0x1: # sub
-            V = (ra[15] != rb[15]) and (ra[15] != (ra + ~rb + 1)[15])
-        elif self._opcode == 0x3: # abs
-            V = ra == 0x8000
-            # V = alu_res[15]
-        elif self._opcode in [0xb, 0xc]: # mul0, mul1
-            V = (ra * rb)[15] if (ra[15] == rb[15]) else (ra * rb)[15] == 0 and (ra != 0 or rb != 0)
-        elif self._opcode == 0xd:
-            V = 0
-        elif self._opcode in [0x4, 0x5]:
-            V = 0
-        else:
-            V = (ra[15] == rb[15]) and (ra[15] != (ra + rb)[15])
-        if self._opcode in [0x12, 0x13, 0x14,  # and, or, xor clear overflow flag
-                                  0xf, 0x11,         # lshl, lshr
-                                  0x8]:              # sel
-            V = 0
-        if self.flag_sel == 0x0:
-            return Z
-        elif self.flag_sel == 0x1:
-            return not Z
-        elif self.flag_sel == 0x2:
-            return C
-        elif self.flag_sel == 0x3:
-            return not C
-        elif self.flag_sel == 0x4:
-            return N
-        elif self.flag_sel == 0x5:
-            return not N
-        elif self.flag_sel == 0x6:
-            return V
-        elif self.flag_sel == 0x7:
-            return not V
-        elif self.flag_sel == 0x8:
-            return C and not Z
-        elif self.flag_sel == 0x9:
-            return not C or Z
-        elif self.flag_sel == 0xA:
-            return N == V
-        elif self.flag_sel == 0xB:
-            return N != V
-        elif self.flag_sel == 0xC:
-            return not Z and (N == V)
-        elif self.flag_sel == 0xD:
-            return Z or (N != V)
-        elif self.flag_sel == 0xE:
-            return lut_out
-        elif self.flag_sel == 0xF:
-            return alu_res_p
-        raise NotImplementedError(self.flag_sel)
+        # only the flags flag_sel reads are computed
+        if self.flag_sel not in range(len(FLAGS)):
+            raise NotImplementedError(self.flag_sel)
+        needs, flag = FLAGS[self.flag_sel]
+        Z = alu_res == 0 if 'Z' in needs else None
+        C = CARRY.get(self._opcode, carry)(ra, rb, rd) if 'C' in needs else None
+        N = alu_res[15] if 'N' in needs else None
+        V = OVERFLOW.get(self._opcode, overflow)(ra, rb, rd) if 'V' in needs else None
+        return flag(Z, C, N, V, lut_out, alu_res_p)
+
+    def outputs(self, outputs=None):
+        # Declare which of res, res_p and irq are used, None for all.
+        # compile() then skips the logic of the others and returns them
+        # as 0 (and does not update raise_debug_trig if irq is unused).
+        if outputs is not None:
+            outputs = frozenset(outputs)
+            if not outputs <= OUTPUTS:
+                raise ValueError('unknown outputs {}'.format(sorted(outputs - OUTPUTS)))
+        self._outputs = outputs
+        return self
+
+    def demand(self, outputs=None):
+        # (alu, flag, irq): which parts of the PE the outputs need
+        outputs = OUTPUTS if outputs is None else outputs
+        irq = 'irq' in outputs and bool(self.irq_en_0 or self.irq_en_1)
+        flag = 'res_p' in outputs or (irq and bool(self.irq_en_0))
+        needs = FLAGS[self.flag_sel][0] if self.flag_sel in range(len(FLAGS)) else 'ZN'
+        alu = 'res' in outputs or (irq and bool(self.irq_en_1)) or \
+              (flag and ('Z' in needs or 'N' in needs or self.flag_sel == 0xF))
+        return alu, flag, irq
+
+    def backend(self, backend):
+        # Select the arithmetic backend: BV evaluates with hwtypes
+        # bit vectors, INT with masked python ints.
+        if backend not in BACKENDS:
+            raise ValueError(backend)
+        if backend == INT and (self._opcode not in intops.ALU or not native(self._alu.op)):
+            raise NotImplementedError(self._opcode)
+        self._backend = backend
+        for name in ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']:
+            reg = getattr(self, name)
+            new = self._register(reg.mode, int(reg.value), reg.width)
+            new.last_clk = reg.last_clk
+            setattr(self, name, new)
+        return self
+
+    def _register(self, regmode, regvalue, width):
+        if self._backend == INT:
+            return IntRegister(regmode, regvalue, width)
+        return Register(regmode, regvalue, width)
 
     def alu(self, opcode, signed, _alu):
+        if self._backend == INT and (opcode not in intops.ALU or not native(_alu)):
+            raise NotImplementedError(opcode)
         self._opcode = opcode
         self._signed = signed
         self._alu = ALU(_alu, opcode, DATAWIDTH, signed=signed)
+        self._table = None
         return self
 
     def signed(self, _signed=True):
         self._signed = _signed
         self._alu.signed = _signed
+        self._table = None
         return self
 
     def flag(self, flag_sel):
         self.flag_sel = flag_sel
+        self._table = None
         return self
 
     def add(self, _add=None):
@@ -265,6 +690,7 @@ class PE:
 
     def carry(self):
         self._alu.carry()
+        self._table = None
         return self
 
     def cond(self, _cond=None):
@@ -286,41 +712,47 @@ class PE:
         return self
 
     def rega(self, regmode=BYPASS, regvalue=0):
-        self.RegA = Register(regmode, regvalue, DATAWIDTH)
+        self.RegA = self._register(regmode, regvalue, DATAWIDTH)
         self.raconst = regvalue
+        self._table = None
         self.regcode &= ~(3 << 0)
         self.regcode |= config('aa', a=regmode)
         return self
 
     def regb(self, regmode=BYPASS, regvalue=0):
-        self.RegB = Register(regmode, regvalue, DATAWIDTH)
+        self.RegB = self._register(regmode, regvalue, DATAWIDTH)
         self.rbconst = regvalue
+        self._table = None
         self.regcode &= ~(3 << 2)
         self.regcode |= config('aa', a=regmode) << 2
         return self
 
     def regc(self, regmode=BYPASS, regvalue=0):
-        self.RegC = Register(regmode, regvalue, DATAWIDTH)
+        self.RegC = self._register(regmode, regvalue, DATAWIDTH)
         self.rcconst = regvalue
+        self._table = None
         return self
 
     def regd(self, regmode=BYPASS, regvalue=0):
-        self.RegD = Register(regmode, regvalue, 1)
+        self.RegD = self._register(regmode, regvalue, 1)
         self.rdconst = regvalue
+        self._table = None
         self.regcode &= ~(3 << 8)
         self.regcode |= config('aa', a=regmode) << 8
         return self
 
     def rege(self, regmode=BYPASS, regvalue=0):
-        self.RegE = Register(regmode, regvalue, 1)
+        self.RegE = self._register(regmode, regvalue, 1)
         self.reconst = regvalue
+        self._table = None
         self.regcode &= ~(3 << 10)
         self.regcode |= config('aa', a=regmode) << 10
         return self
 
     def regf(self, regmode=BYPASS, regvalue=0):
-        self.RegF = Register(regmode, regvalue, 1)
+        self.RegF = self._register(regmode, regvalue, 1)
         self.rfconst = regvalue
+        self._table = None
         self.regcode &= ~(3 << 12)
         self.regcode |= config('aa', a=regmode) << 12
         return self
@@ -328,8 +760,8 @@ class PE:
     @property
     def instruction(self):
         irq_en = self.irq_en_0 | (self.irq_en_1 << 1)
-        return config('r' * 14 + 'ffffiia00soooooo',
-                      o=self._opcode, s=self._signed, a=0, i=irq_en, f=self.flag_sel, r=self.regcode)
+        return INSTRUCTION.encode(o=self._opcode, s=self._signed, a=0, i=irq_en,
+                                  f=self.flag_sel, r=self.regcode)
 
 
     def lut(self, code=None):
@@ -337,6 +769,8 @@ class PE:
             idx = (bit2.as_uint() << 2) | (bit1.as_uint() << 1) | bit0.as_uint()
             return (code >> idx) & 1
         self._lut = _lut
+        self._lut_code = code
+        self._table = None
         # if self.lut:
         #     self.opcode |= 1 << 9
         # else:
@@ -0,0 +1,90 @@
+from collections.abc import Mapping
+from . import stats
+from .pe import VALID, DELAY, DATAWIDTH
+from .vcd import VCDWriter
+
+__all__ = ['Simulator']
+
+#
+# Cycle-by-cycle simulation of a PE with an internal clock.
+#
+# Each cycle evaluates the PE with clk low, which gives that cycle's
+# outputs, then raises clk so DELAY (and VALID, if clk_en) registers load
+# their inputs. A stimulus entry is either a mapping of input names
+# (data0, data1, c, bit0, bit1, bit2, and optionally clk_en) or a tuple
+# of inputs in that order.
+#
+# With vcd (a filename or open file) the inputs, outputs and clocked
+# register values are streamed to a VCD file: cycle k is written at time
+# 2k with clk low and 2k+1 with clk high.
+#
+
+INPUTS = ['data0', 'data1', 'c', 'bit0', 'bit1', 'bit2']
+REGS = ['RegA', 'RegB', 'RegC', 'RegD', 'RegE', 'RegF']
+WIDTHS = [DATAWIDTH] * 3 + [1] * 3
+
+class Simulator:
+
+    def __init__(self, pe, vcd=None):
+        self.pe = pe
+        self.func = pe.compile()
+        self.cycle = 0
+        # registers loaded at the clock edge, with their input's index
+        self.registers = [(getattr(pe, name), i) for i, name in enumerate(REGS)
+                          if getattr(pe, name).mode in (DELAY, VALID)]
+        self.vcd = None
+        if vcd is not None:
+            self.vcd = VCDWriter(vcd)
+            self.vcd.var('clk')
+            self.vcd.var('clk_en')
+            for name, width in zip(INPUTS, WIDTHS):
+                self.vcd.var(name, width)
+            for reg, i in self.registers:
+                self.vcd.var(REGS[i], reg.width)
+            self.vcd.var('res', DATAWIDTH)
+            self.vcd.var('res_p')
+            self.vcd.var('irq')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self.vcd is not None:
+            self.vcd.close()
+            self.vcd = None
+
+    def step(self, inputs=(), clk_en=1):
+        # Simulate one cycle, returning (res, res_p, irq).
+        if isinstance(inputs, Mapping):
+            clk_en = inputs.get('clk_en', clk_en)
+            inputs = [inputs.get(name, 0) for name in INPUTS]
+        else:
+            inputs = list(inputs) + [0] * (len(INPUTS) - len(inputs))
+
+        func = self.func if stats.ACTIVE is None else self.pe
+        outputs = func(*inputs, clk=0, clk_en=clk_en)
+        if self.vcd is not None:
+            self.trace(2 * self.cycle, 0, clk_en, inputs, outputs)
+
+        # posedge
+        for reg, i in self.registers:
+            reg(inputs[i], 1, clk_en)
+        if self.vcd is not None:
+            self.trace(2 * self.cycle + 1, 1, clk_en, inputs, outputs)
+
+        self.cycle += 1
+        return outputs
+
+    def trace(self, time, clk, clk_en, inputs, outputs):
+        values = [clk, clk_en] + inputs
+        values += [int(reg.value) for reg, i in self.registers]
+        values += [outputs[0], outputs[1], bool(outputs[2])]
+        self.vcd.change(time, values)
+
+    def run(self, stimulus, clk_en=1):
+        # Yield (res, res_p, irq) for each cycle of stimulus.
+        for inputs in stimulus:
+            yield self.step(inputs, clk_en)
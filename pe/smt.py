@@ -0,0 +1,236 @@
+from collections import namedtuple
+import z3
+from .pe import BYPASS, DATAWIDTH, native
+from .cache import config
+
+__all__ = ['Formula', 'INPUTS', 'formula', 'counterexample', 'equivalent', 'check']
+
+#
+# Symbolic evaluation of PEs with z3.
+#
+# formula(pe) gives z3 expressions for the res (16 bit vector), res_p and
+# irq (bools) of PE.__call__ over the symbolic INPUTS, with registers not
+# clocked as in PE.eval_batch. A single solver query then stands in for
+# an exhaustive sweep of the inputs:
+#
+#   equivalent(pe0, pe1)   None, or an {input: value} counterexample
+#   check(pe, spec)        likewise, against spec(*INPUTS) -> (res, res_p)
+#
+# The semantics mirror pe.intops, which implements the pe.isa ops by
+# opcode; PEs of other ops are refused. (The isa ops branch in python on
+# their comparisons, so PE.__call__ itself cannot run on z3 values.)
+# Formulas are cached per configuration.
+#
+# z3 is the optional 'smt' dependency: pip install pe[smt].
+#
+
+INPUTS = [z3.BitVec(name, DATAWIDTH) for name in ['data0', 'data1', 'c']] + \
+         [z3.BitVec(name, 1) for name in ['bit0', 'bit1', 'bit2']]
+
+FALSE = z3.BoolVal(False)
+
+def msb(x):
+    return z3.Extract(x.size() - 1, x.size() - 1, x) == 1
+
+def cout(*args):
+    # carry out of the sum of args, zero extended by a bit
+    s = sum(z3.ZeroExt(DATAWIDTH + 1 - arg.size(), arg) for arg in args)
+    return msb(s)
+
+def carry(a, b, d):
+    return cout(a, b)
+
+def carry_add(a, b, d):
+    return cout(a, b, d)
+
+def carry_sub(a, b, d):
+    return cout(a, ~b, z3.BitVecVal(1, 1))
+
+def carry_abs(a, b, d):
+    return a == 0
+
+def shr(a, b, c, d, signed):
+    return a >> (b & 0xf) if signed else z3.LShR(a, b & 0xf)
+
+def add(a, b, c, d, signed):
+    return a + b + z3.ZeroExt(DATAWIDTH - 1, d), carry_add(a, b, d)
+
+def sub(a, b, c, d, signed):
+    return a - b, carry_sub(a, b, d)
+
+def ge(a, b, c, d, signed):
+    res_p = a >= b if signed else z3.UGE(a, b)
+    return z3.If(res_p, a, b), res_p
+
+def le(a, b, c, d, signed):
+    res_p = a <= b if signed else z3.ULE(a, b)
+    return z3.If(res_p, a, b), res_p
+
+def abs(a, b, c, d, signed):
+    if signed:
+        return z3.If(msb(a), -a, a), msb(a)
+    return a, msb(a)
+
+def mul(shift):
+    def _mul(a, b, c, d, signed):
+        ext = z3.SignExt if signed else z3.ZeroExt
+        p = ext(DATAWIDTH, a) * ext(DATAWIDTH, b)
+        return z3.Extract(shift + DATAWIDTH - 1, shift, p), FALSE
+    return _mul
+
+# opcode -> alu(a, b, c, d, signed), as pe.intops.ALU
+ALU = {
+    0x12: lambda a, b, c, d, signed: a | b,
+    0x13: lambda a, b, c, d, signed: a & b,
+    0x14: lambda a, b, c, d, signed: a ^ b,
+    0x15: lambda a, b, c, d, signed: (~a + b, FALSE),
+    0xf:  shr,
+    0x11: lambda a, b, c, d, signed: a << (b & 0xf),
+    0x0:  add,
+    0x1:  sub,
+    0x4:  ge,
+    0x5:  le,
+    0x3:  abs,
+    0x8:  lambda a, b, c, d, signed: z3.If(d == 1, a, b),
+    0xb:  mul(0),
+    0xc:  mul(8),
+    0xd:  mul(16),
+}
+
+CARRY = {
+    0x0: carry_add,
+    0x1: carry_sub, 0x4: carry_sub, 0x5: carry_sub,
+    0x3: carry_abs,
+}
+
+def overflow(a, b, d):
+    return z3.And(msb(a) == msb(b), msb(a) != msb(a + b))
+
+def overflow_add(a, b, d):
+    return z3.And(msb(a) == msb(b), msb(a) != msb(a + b + z3.ZeroExt(DATAWIDTH - 1, d)))
+
+def overflow_sub(a, b, d):
+    return z3.And(msb(a) != msb(b), msb(a) != msb(a - b))
+
+def overflow_abs(a, b, d):
+    return a == 0x8000
+
+def overflow_mul(a, b, d):
+    p15 = msb(a * b)
+    return z3.If(msb(a) == msb(b), p15, z3.And(z3.Not(p15), z3.Or(a != 0, b != 0)))
+
+def overflow_none(a, b, d):
+    return FALSE
+
+OVERFLOW = {
+    0x0: overflow_add,
+    0x1: overflow_sub,
+    0x3: overflow_abs,
+    0xb: overflow_mul, 0xc: overflow_mul,
+    0xd: overflow_none, 0x4: overflow_none, 0x5: overflow_none,
+    0x12: overflow_none, 0x13: overflow_none, 0x14: overflow_none,
+    0xf: overflow_none, 0x11: overflow_none, 0x8: overflow_none,
+}
+
+# flag_sel -> predicate, as pe.FLAGS
+FLAGS = [
+    lambda Z, C, N, V, lut, p: Z,
+    lambda Z, C, N, V, lut, p: z3.Not(Z),
+    lambda Z, C, N, V, lut, p: C,
+    lambda Z, C, N, V, lut, p: z3.Not(C),
+    lambda Z, C, N, V, lut, p: N,
+    lambda Z, C, N, V, lut, p: z3.Not(N),
+    lambda Z, C, N, V, lut, p: V,
+    lambda Z, C, N, V, lut, p: z3.Not(V),
+    lambda Z, C, N, V, lut, p: z3.And(C, z3.Not(Z)),
+    lambda Z, C, N, V, lut, p: z3.Or(z3.Not(C), Z),
+    lambda Z, C, N, V, lut, p: N == V,
+    lambda Z, C, N, V, lut, p: N != V,
+    lambda Z, C, N, V, lut, p: z3.And(z3.Not(Z), N == V),
+    lambda Z, C, N, V, lut, p: z3.Or(Z, N != V),
+    lambda Z, C, N, V, lut, p: lut,
+    lambda Z, C, N, V, lut, p: p,
+]
+
+class Formula(namedtuple('Formula', ['res', 'res_p', 'irq'])):
+
+    def __call__(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+        # the outputs for concrete inputs, as PE.__call__ returns them
+        values = [z3.BitVecVal(int(x), var.size())
+                  for x, var in zip([data0, data1, c, bit0, bit1, bit2], INPUTS)]
+        substitute = lambda e: z3.simplify(z3.substitute(e, *zip(INPUTS, values)))
+        return substitute(self.res).as_long(), \
+               int(z3.is_true(substitute(self.res_p))), \
+               z3.is_true(substitute(self.irq))
+
+FORMULAS = {}
+
+def formula(pe):
+    key = config(pe)
+    if key not in FORMULAS:
+        FORMULAS[key] = build(pe)
+    return FORMULAS[key]
+
+def build(pe):
+    opcode = pe._opcode
+    if opcode not in ALU or not native(pe._alu.op):
+        raise NotImplementedError(opcode)
+    if pe.flag_sel not in range(len(FLAGS)):
+        raise NotImplementedError(pe.flag_sel)
+
+    regs = [pe.RegA, pe.RegB, pe.RegC, pe.RegD, pe.RegE, pe.RegF]
+    ra, rb, rc, rd, re, rf = [
+        var if reg.mode == BYPASS else z3.BitVecVal(int(reg.value), var.size())
+        for reg, var in zip(regs, INPUTS)]
+
+    signed = bool(pe._alu.signed)
+    res = ALU[opcode](ra, rb, rc, rd, signed)
+    if isinstance(res, tuple):
+        res, alu_res_p = res
+    else:
+        alu_res_p = carry(ra, rb, rd) if pe._alu._carry else FALSE
+
+    lut = FALSE
+    if pe._lut:
+        row = z3.ZeroExt(5, z3.Concat(rf, re, rd))
+        lut = z3.Extract(0, 0, z3.LShR(z3.BitVecVal(pe._lut_code & 0xff, 8), row)) == 1
+
+    Z = res == 0
+    C = CARRY.get(opcode, carry)(ra, rb, rd)
+    N = msb(res)
+    V = OVERFLOW.get(opcode, overflow)(ra, rb, rd)
+    res_p = z3.simplify(FLAGS[pe.flag_sel](Z, C, N, V, lut, alu_res_p))
+
+    irq = FALSE
+    if pe.irq_en_0:
+        irq = z3.Or(irq, res_p != bool(pe._debug_trig_p & 1))
+    if pe.irq_en_1:
+        irq = z3.Or(irq, res != (pe._debug_trig & 0xffff))
+    return Formula(z3.simplify(res), res_p, z3.simplify(irq))
+
+def counterexample(condition):
+    # None if condition is unsatisfiable, else inputs satisfying it
+    solver = z3.Solver()
+    solver.add(condition)
+    if solver.check() == z3.unsat:
+        return None
+    model = solver.model()
+    return {str(var): model.eval(var, model_completion=True).as_long() for var in INPUTS}
+
+def differ(f0, f1, outputs):
+    return z3.Or([getattr(f0, name) != getattr(f1, name) for name in outputs])
+
+def equivalent(pe0, pe1, outputs=('res', 'res_p', 'irq')):
+    # None if pe0 and pe1 agree on outputs for all inputs, else a
+    # counterexample
+    return counterexample(differ(formula(pe0), formula(pe1), outputs))
+
+def check(pe, spec, outputs=('res', 'res_p')):
+    # None if pe agrees with spec for all inputs, else a counterexample.
+    # spec(data0, data1, c, bit0, bit1, bit2) returns the outputs as
+    # z3 expressions; None for one it does not constrain.
+    expected = spec(*INPUTS)
+    f = formula(pe)
+    return counterexample(z3.Or([getattr(f, name) != value
+                                 for name, value in zip(outputs, expected)
+                                 if value is not None]))
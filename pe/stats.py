@@ -0,0 +1,125 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+from . import pe as _pe
+
+__all__ = ['Stats', 'profile']
+
+#
+# Opt-in instrumentation of PE.__call__.
+#
+#   with pe.profile(timing=True) as stats:
+#       ... simulate ...
+#   print(stats.summary())
+#   stats.write_collapsed('pe.folded')   # flamegraph.pl pe.folded > pe.svg
+#
+# While no profile is active, PE.__call__ only pays for one global check.
+# Fabric.step evaluates the PEs themselves instead of their compiled
+# functions while profiling; other callers of PE.compile() are not seen.
+#
+# With timing, bv evaluation is split into STAGES. The int backend and
+# tabulated PEs are timed as a whole, as stage 'call'.
+#
+
+ACTIVE = None
+
+STAGES = ['registers', 'alu', 'lut', 'flag', 'irq']
+
+class Stats:
+
+    def __init__(self, timing=False):
+        self.timing = timing
+        self.calls = 0
+        self.opcodes = Counter()
+        self.flags = Counter()
+        self.triggers = Counter()  # 'irq', 'debug_trig', 'debug_trig_p'
+        self.time = defaultdict(float)  # (opcode, stage) -> seconds
+
+    def call(self, pe, *args):
+        global ACTIVE
+        self.calls += 1
+        self.opcodes[pe._opcode] += 1
+        self.flags[pe.flag_sel] += 1
+
+        tabulated = pe._table is not None
+        if self.timing and not tabulated and pe._backend == _pe.BV:
+            result = self.staged(pe, *args)
+        else:
+            start = perf_counter()
+            ACTIVE = None
+            try:
+                result = pe(*args)
+            finally:
+                ACTIVE = self
+            if self.timing:
+                self.time[pe._opcode, 'call'] += perf_counter() - start
+
+        if result[2]:
+            self.triggers['irq'] += 1
+        if not tabulated:
+            self.triggers['debug_trig'] += bool(pe.raise_debug_trig)
+            self.triggers['debug_trig_p'] += bool(pe.raise_debug_trig_p)
+        return result
+
+    def staged(self, pe, data0, data1, c, bit0, bit1, bit2, clk, clk_en):
+        # PE.__call__ for the bv backend, timing each of its stages
+        t0 = perf_counter()
+        ra, rb, rc, rd, re, rf = pe.get_registers(data0, data1, c, bit0, bit1, bit2,
+                                                  clk, clk_en)
+        t1 = perf_counter()
+        res, alu_res_p = pe.get_alu(ra, rb, rc, rd)
+        t2 = perf_counter()
+        lut_out = pe.get_lut(rd, re, rf)
+        t3 = perf_counter()
+        res_p = pe.get_res_p(ra, rb, rc, rd, res, alu_res_p, lut_out)
+        t4 = perf_counter()
+        irq = pe.get_irq(res, res_p)
+
+        t5 = perf_counter()
+        time, opcode = self.time, pe._opcode
+        time[opcode, 'registers'] += t1 - t0
+        time[opcode, 'alu'] += t2 - t1
+        time[opcode, 'lut'] += t3 - t2
+        time[opcode, 'flag'] += t4 - t3
+        time[opcode, 'irq'] += t5 - t4
+        return res.as_uint(), res_p.as_uint(), irq
+
+    def summary(self):
+        lines = ['{} calls'.format(self.calls), '',
+                 '{:>8} {:>10}'.format('opcode', 'calls')]
+        for opcode, n in sorted(self.opcodes.items()):
+            lines.append('{:>#8x} {:>10}'.format(opcode, n))
+        lines += ['', '{:>8} {:>10}'.format('flag_sel', 'calls')]
+        for flag_sel, n in sorted(self.flags.items()):
+            lines.append('{:>#8x} {:>10}'.format(flag_sel, n))
+        lines += ['', '{:>12} {:>10}'.format('trigger', 'count')]
+        for name in ['irq', 'debug_trig', 'debug_trig_p']:
+            lines.append('{:>12} {:>10}'.format(name, self.triggers[name]))
+        if self.time:
+            stages = Counter()
+            for (opcode, stage), t in self.time.items():
+                stages[stage] += t
+            total = sum(stages.values())
+            lines += ['', '{:>10} {:>10} {:>6}'.format('stage', 'seconds', '%')]
+            for stage, t in stages.most_common():
+                lines.append('{:>10} {:>10.4f} {:>6.1f}'.format(stage, t, 100 * t / total))
+        return '\n'.join(lines)
+
+    def collapsed(self):
+        # flamegraph.pl folded stacks, PE;opcode;stage microseconds
+        return ['PE;{:#04x};{} {}'.format(opcode, stage, int(round(t * 1e6)))
+                for (opcode, stage), t in sorted(self.time.items())]
+
+    def write_collapsed(self, filename):
+        with open(filename, 'w') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
+
+@contextmanager
+def profile(timing=False):
+    global ACTIVE
+    previous, ACTIVE = ACTIVE, Stats(timing)
+    try:
+        yield ACTIVE
+    finally:
+        ACTIVE = previous
@@ -0,0 +1,134 @@
+import numpy as np
+from collections import OrderedDict
+from .pe import CONST, BYPASS, FLAGS, native
+from .batch import eval_batch
+
+__all__ = ['Table', 'TableCache', 'TABLES', 'tabulate']
+
+#
+# Truth tables for PEs whose registers are all BYPASS or CONST.
+#
+# Such a PE is a pure function of its inputs. Only the input bits that can
+# reach an output are enumerated, and each entry packs
+#
+#   res | res_p << 16 | irq << 17
+#
+# into a uint32. Tables are keyed on the configuration and fields() on the
+# opcode, which only identify the op of the pe.isa PEs; others are refused.
+#
+
+MAX_ENTRIES = 1 << 20
+
+class Table:
+
+    def __init__(self, fields, data):
+        # fields: (input index, width) pairs, most significant first
+        self.fields = fields
+        self.data = data
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    def index(self, *args):
+        idx = 0
+        for i, width in self.fields:
+            idx = (idx << width) | (args[i] & ((1 << width) - 1))
+        return idx
+
+    def __call__(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0, clk=0, clk_en=1):
+        entry = int(self.data[self.index(data0, data1, c, bit0, bit1, bit2)])
+        return entry & 0xffff, (entry >> 16) & 1, bool(entry >> 17)
+
+    def eval_batch(self, data0=0, data1=0, c=0, bit0=0, bit1=0, bit2=0):
+        args = [np.asarray(x, dtype=np.uint32) for x in (data0, data1, c, bit0, bit1, bit2)]
+        entry = self.data[self.index(*args)]
+        return (entry & 0xffff).astype(np.uint16), \
+               ((entry >> 16) & 1).astype(bool), \
+               (entry >> 17).astype(bool)
+
+
+class TableCache:
+    # process-wide LRU cache of tables, bounded by total size in bytes
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.tables = OrderedDict()
+
+    def __len__(self):
+        return len(self.tables)
+
+    def get(self, key):
+        table = self.tables.get(key)
+        if table is not None:
+            self.tables.move_to_end(key)
+        return table
+
+    def put(self, key, table):
+        if key in self.tables:
+            self.nbytes -= self.tables.pop(key).nbytes
+        self.tables[key] = table
+        self.nbytes += table.nbytes
+        while self.nbytes > self.max_bytes and len(self.tables) > 1:
+            _, old = self.tables.popitem(last=False)
+            self.nbytes -= old.nbytes
+
+    def clear(self):
+        self.tables.clear()
+        self.nbytes = 0
+
+TABLES = TableCache(64 << 20)
+
+
+def key(pe):
+    regs = (pe.RegA, pe.RegB, pe.RegC, pe.RegD, pe.RegE, pe.RegF)
+    return (pe.instruction, pe._alu.signed, pe._alu._carry,
+            tuple(int(reg.value) if reg.mode == CONST else None for reg in regs),
+            pe._lut_code if pe._lut else None,
+            pe._debug_trig, pe._debug_trig_p)
+
+def fields(pe):
+    # the inputs (and how many of their low bits) that reach an output
+    needs = FLAGS[pe.flag_sel][0]
+    lut = pe._lut is not None and pe.flag_sel == 0xE
+    bwidth = 16
+    if pe._opcode in [0xf, 0x11] and 'C' not in needs and pe.flag_sel != 0xF:
+        bwidth = 4  # shifts only use b[3:0]
+    widths = [(0, pe.RegA, 16),
+              (1, pe.RegB, bwidth),
+              (3, pe.RegD, 1 if lut or pe._opcode in [0x0, 0x8] else 0),
+              (4, pe.RegE, 1 if lut else 0),
+              (5, pe.RegF, 1 if lut else 0)]
+    return [(i, width) for i, reg, width in widths if width and reg.mode == BYPASS]
+
+def tabulate(pe, max_entries=MAX_ENTRIES, cache=TABLES):
+    if not native(pe._alu.op):
+        raise NotImplementedError(pe._opcode)
+    regs = (pe.RegA, pe.RegB, pe.RegC, pe.RegD, pe.RegE, pe.RegF)
+    if any(reg.mode not in [CONST, BYPASS] for reg in regs):
+        raise ValueError('tabulate requires BYPASS or CONST registers')
+
+    k = key(pe)
+    table = cache.get(k)
+    if table is not None:
+        return table
+
+    f = fields(pe)
+    nbits = sum(width for i, width in f)
+    if (1 << nbits) > max_entries:
+        raise ValueError('{} input bits is too many to tabulate'.format(nbits))
+
+    idx = np.arange(1 << nbits, dtype=np.uint32)
+    args = [0] * 6
+    shift = nbits
+    for i, width in f:
+        shift -= width
+        args[i] = (idx >> shift) & ((1 << width) - 1)
+
+    res, res_p, irq = eval_batch(pe, *args)
+    data = res.astype(np.uint32) | (res_p.astype(np.uint32) << 16) \
+                                 | (irq.astype(np.uint32) << 17)
+    table = Table(f, data)
+    cache.put(k, table)
+    return table
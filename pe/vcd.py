@@ -0,0 +1,84 @@
+import time
+
+__all__ = ['VCDWriter']
+
+#
+# Streaming Value Change Dump writer.
+#
+# Variables are declared with var() before the first change(); each
+# change() writes one timestep holding only the values that differ from
+# the previous one, so nothing but the last values is kept in memory.
+# Output goes through a buffered file, flushed on close().
+#
+
+def identifier(n):
+    # printable VCD identifier codes, '!' to '~'
+    code = ''
+    while True:
+        n, k = divmod(n, 94)
+        code += chr(33 + k)
+        if not n:
+            return code
+        n -= 1
+
+class VCDWriter:
+
+    def __init__(self, file, scope='pe', timescale='1ns', buffering=1 << 16):
+        if isinstance(file, str):
+            self.file = open(file, 'w', buffering=buffering)
+            self.owned = True
+        else:
+            self.file = file
+            self.owned = False
+        self.scope = scope
+        self.timescale = timescale
+        self.vars = []
+        self.last = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def var(self, name, width=1):
+        # declare a variable, returning its index in change()'s values
+        assert self.last is None, 'variables must be declared before changes'
+        self.vars.append((name, width, identifier(len(self.vars))))
+        return len(self.vars) - 1
+
+    def header(self):
+        lines = ['$date {} $end'.format(time.asctime()),
+                 '$version pe $end',
+                 '$timescale {} $end'.format(self.timescale),
+                 '$scope module {} $end'.format(self.scope)]
+        for name, width, code in self.vars:
+            lines.append('$var wire {} {} {} $end'.format(width, code, name))
+        lines += ['$upscope $end', '$enddefinitions $end', '']
+        self.file.write('\n'.join(lines))
+
+    def change(self, time, values):
+        # values holds one int per declared variable
+        lines = ['#{}'.format(time)]
+        if self.last is None:
+            self.header()
+            self.last = [None] * len(self.vars)
+        last = self.last
+        for i, value in enumerate(values):
+            value = int(value)
+            if value != last[i]:
+                last[i] = value
+                name, width, code = self.vars[i]
+                if width == 1:
+                    lines.append('{}{}'.format(value & 1, code))
+                else:
+                    lines.append('b{:b} {}'.format(value & ((1 << width) - 1), code))
+        if len(lines) > 1:
+            lines.append('')
+            self.file.write('\n'.join(lines))
+
+    def close(self):
+        if self.owned:
+            self.file.close()
+        else:
+            self.file.flush()
@@ -0,0 +1,126 @@
+import argparse
+import importlib.util
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
+from . import isa
+
+__all__ = ['configs', 'vectors', 'check', 'verify', 'report', 'verilator_binary', 'verilator_model']
+
+#
+# Differential check of the python PE model against the RTL.
+#
+# Every ISA constructor (both signed variants where it takes one) is run
+# over the same vectors through PE.eval_batch and through an RTL model, one
+# process per configuration. The RTL is test_pe_comp_unq1 by default, whose
+# res_p is the ALU predicate, so the python PE is compared with flag 0xF.
+# Its verilated driver is built (or found in the build cache) once, before
+# the processes start.
+#
+#   python -m pe.verify [--vectors N] [--workers N] [names...]
+#
+
+SV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'verilator',
+                  'build', 'test_pe_comp_unq1.sv')
+TOP = 'test_pe_comp_unq1'
+
+def configs():
+    # name -> (constructor, args)
+    result = {}
+    seen = set()
+    for name in isa.__all__:
+        f = getattr(isa, name)
+        if f in seen:
+            continue  # min, max
+        seen.add(f)
+        if f.__code__.co_argcount:
+            result[f.__name__] = (f, (False,))
+            result[f.__name__ + '_s'] = (f, (True,))
+        else:
+            result[f.__name__] = (f, ())
+    return result
+
+def vectors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    corners = np.array([0, 1, 0x7fff, 0x8000, 0xffff], dtype=np.uint16)
+    a = rng.integers(0, 1 << 16, n, dtype=np.uint16)
+    b = rng.integers(0, 1 << 16, n, dtype=np.uint16)
+    d = rng.integers(0, 2, n, dtype=np.uint16)
+    k = min(n, len(corners) ** 2)
+    a[:k] = np.repeat(corners, len(corners))[:k]
+    b[:k] = np.tile(corners, len(corners))[:k]
+    return a, b, d
+
+@lru_cache(maxsize=None)
+def verilator():
+    # verilator/verilator.py, which is not part of the package
+    spec = importlib.util.spec_from_file_location(
+        'verilator', os.path.join(os.path.dirname(SV), '..', 'verilator.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def verilator_binary():
+    # the path of the verilated driver of TOP
+    return verilator().build([SV], TOP, verilator().driversource(TOP))
+
+def verilator_model(binary=None):
+    return verilator().Driver(binary or verilator_binary())
+
+def check(name, n=1 << 16, seed=0, rtl=None, limit=8):
+    # Returns (name, number of mismatches, the first limit of them as
+    # (a, b, d, res, res_p, rtl res, rtl res_p) rows). rtl is the path of
+    # a verilated driver, built if None, or a callable returning a model
+    # with run() and close().
+    f, args = configs()[name]
+    pe = f(*args).flag(0xF)
+    a, b, d = vectors(n, seed)
+    res, res_p, _ = pe.eval_batch(a, b, 0, d)
+
+    if rtl is None:
+        rtl = verilator_binary()
+    model = verilator_model(rtl) if isinstance(rtl, str) else rtl()
+    try:
+        rtl_res, rtl_res_p = model.run(pe.instruction & 0x1ff, a, b, d)
+    finally:
+        model.close()
+
+    bad = np.flatnonzero((res != rtl_res) | (res_p != rtl_res_p))
+    rows = [tuple(int(x[i]) for x in (a, b, d, res, res_p, rtl_res, rtl_res_p))
+            for i in bad[:limit]]
+    return name, len(bad), rows
+
+def verify(names=None, n=1 << 16, seed=0, rtl=None, workers=None, limit=8):
+    names = names or list(configs())
+    if rtl is None:
+        rtl = verilator_binary()
+    with ProcessPoolExecutor(workers) as pool:
+        jobs = [pool.submit(check, name, n, seed, rtl, limit) for name in names]
+        return [job.result() for job in jobs]
+
+def report(results):
+    # print check() results, returning the exit status
+    failed = 0
+    for name, count, rows in results:
+        print('{:8} {}'.format(name, 'ok' if not count else '{} mismatches'.format(count)))
+        for row in rows:
+            print('    a={:#06x} b={:#06x} d={}  pe {:#06x} {}  rtl {:#06x} {}'.format(*row))
+        failed += bool(count)
+    return 1 if failed else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m pe.verify')
+    parser.add_argument('names', nargs='*', help='configurations, default all')
+    parser.add_argument('--vectors', type=int, default=1 << 16)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    return report(verify(args.names, args.vectors, args.seed,
+                         workers=args.workers, limit=args.limit))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,5 +9,8 @@ setup(
     packages=[
         "pe",
     ],
-    python_requires='>=3.6'
+    extras_require={
+        'smt': ['z3-solver'],
+    },
+    python_requires='>=3.8'
 )
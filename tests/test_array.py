@@ -0,0 +1,36 @@
+import numpy as np
+from pe.pe import CONST, VALID, DELAY
+from pe.array import PEArray
+from pe.verify import configs
+
+def population():
+    pes = []
+    for k, (name, (f, args)) in enumerate(sorted(configs().items())):
+        pes.append(f(*args).flag(k % 16).lut(0x96))
+        pes.append(f(*args).flag(0xF).rega(DELAY, 3).regb(CONST, 5).irq_en())
+        pes.append(f(*args).regd(VALID, 1).irq_en(False, True).debug_trig(7))
+    return pes
+
+def test_roundtrip():
+    pes = population()
+    array = PEArray.from_pes(pes)
+    assert len(array) == len(pes)
+    for i, p in enumerate(pes):
+        q = array[i]
+        assert q.instruction == p.instruction
+        assert q(0x1234, 0x8001, 0, 1, 0, 1) == p(0x1234, 0x8001, 0, 1, 0, 1)
+
+def test_step():
+    pes = population()
+    array = PEArray.from_pes(pes)
+    rng = np.random.default_rng(0)
+    for cycle in range(4):
+        a, b = rng.integers(0, 1 << 16, (2, len(pes)))
+        d = rng.integers(0, 2, len(pes))
+        clk_en = cycle != 2
+        res, res_p, irq = array.step(a, b, 0, d, 1, 0, clk_en=clk_en)
+        for i, p in enumerate(pes):
+            expected = p(int(a[i]), int(b[i]), 0, int(d[i]), 1, 0, clk=0, clk_en=clk_en)
+            p(int(a[i]), int(b[i]), 0, int(d[i]), 1, 0, clk=1, clk_en=clk_en)
+            assert (res[i], res_p[i], irq[i]) == expected, (i, cycle)
+    assert array.nbytes == 33 * len(pes)
@@ -0,0 +1,46 @@
+import pytest
+import pe
+from pe.isa import neg
+from pe.pe import PE, BV, INT, CONST, DELAY, VALID
+
+def pes():
+    yield from [pe.or_, pe.and_, pe.xor, neg, pe.lshl, pe.add, pe.sub, pe.sel, pe.abs]
+    for signed in [False, True]:
+        for f in [pe.shr, pe.ge, pe.le, pe.mul0, pe.mul1, pe.mul2]:
+            yield lambda f=f, signed=signed: f(signed)
+
+inputs = [(1, 2, 0, 1, 1, 0), (0x8000, 0x8000, 0, 0, 1, 1), (0xffff, 1, 0, 1, 0, 1),
+          (0, 0, 0, 0, 0, 0), (0x7fff, 0xfff3, 0, 1, 1, 1), (0x1234, 0x8001, 0, 0, 0, 1)]
+
+def test_int_backend():
+    for flag_sel in range(16):
+        for make in pes():
+            a = make().flag(flag_sel).lut(0x6a)
+            b = make().flag(flag_sel).lut(0x6a).backend(INT)
+            f = make().flag(flag_sel).lut(0x6a).backend(INT).compile()
+            for args in inputs:
+                assert a(*args) == b(*args) == f(*args)
+
+def test_int_irq():
+    a = pe.add().irq_en().debug_trig(3)
+    b = pe.add().irq_en().debug_trig(3).backend(INT)
+    for args in inputs:
+        assert a(*args) == b(*args)
+
+def test_int_registers():
+    a = pe.add().rega(DELAY, 4).regb(CONST, 9).regd(VALID, 1)
+    b = pe.add().rega(DELAY, 4).regb(CONST, 9).regd(VALID, 1).backend(INT)
+    f = pe.add().rega(DELAY, 4).regb(CONST, 9).regd(VALID, 1).backend(INT).compile()
+    for clk, clk_en, data0 in [(0, 1, 1), (1, 0, 2), (0, 1, 3), (1, 1, 4), (0, 0, 5)]:
+        args = (data0, 1, 0, data0 & 1)
+        assert a(*args, clk=clk, clk_en=clk_en) == b(*args, clk=clk, clk_en=clk_en) \
+            == f(*args, clk=clk, clk_en=clk_en)
+
+def test_int_custom_op():
+    # intops implements the isa ops by opcode, not arbitrary ones
+    xor = lambda a, b, c, d: a ^ b
+    with pytest.raises(NotImplementedError):
+        PE(0x0, xor, backend=INT)
+    with pytest.raises(NotImplementedError):
+        PE(0x0, xor, backend=BV).backend(INT)
+    assert PE(0x0, xor, backend=BV)(1, 3) == (2, 0, False)
@@ -0,0 +1,46 @@
+import numpy as np
+import pe
+from pe.isa import neg
+from pe.pe import PE, CONST
+
+def pes():
+    yield from [pe.or_(), pe.and_(), pe.xor(), neg(), pe.lshl(),
+                pe.add(), pe.sub(), pe.sel(), pe.abs()]
+    for signed in [False, True]:
+        yield from [pe.shr(signed), pe.ge(signed), pe.le(signed),
+                    pe.mul0(signed), pe.mul1(signed), pe.mul2(signed)]
+
+def vectors(n=64):
+    rng = np.random.RandomState(0)
+    data0 = rng.randint(0, 1 << 16, n).astype(np.uint16)
+    data1 = rng.randint(0, 1 << 16, n).astype(np.uint16)
+    data0[:4] = [0, 0x8000, 0xffff, 0x7fff]
+    data1[:4] = [0, 0x8000, 1, 0xffff]
+    bits = rng.randint(0, 2, (3, n)).astype(bool)
+    return data0, data1, bits
+
+def check(a, data0, data1, bits):
+    res, res_p, irq = a.eval_batch(data0, data1, 0, *bits)
+    for i in range(len(data0)):
+        expected = a(int(data0[i]), int(data1[i]), 0, *[int(b[i]) for b in bits])
+        assert (res[i], res_p[i], irq[i]) == expected
+
+def test_batch_flags():
+    data0, data1, bits = vectors()
+    for flag_sel in range(16):
+        for a in pes():
+            check(a.flag(flag_sel).lut(0x96), data0, data1, bits)
+
+def test_batch_irq():
+    data0, data1, bits = vectors()
+    check(pe.add().irq_en().debug_trig(3).debug_trig_p(1), data0, data1, bits)
+
+def test_batch_const():
+    data0, data1, bits = vectors()
+    check(pe.sub().rega(CONST, 7).flag(0x2), data0, data1, bits)
+
+def test_batch_custom_op():
+    # no kernel for the op: evaluated with the scalar path
+    data0, data1, bits = vectors()
+    check(PE(0x0, lambda a, b, c, d: a ^ b).flag(0x0), data0, data1, bits)
+    assert PE(0x0, lambda a, b, c, d: a ^ b).eval_batch([1], [3])[0].tolist() == [2]
@@ -0,0 +1,14 @@
+import json
+from pe.bench import benchmarks, compare, main
+
+def test_benchmarks():
+    for name, f in benchmarks().items():
+        f()
+
+def test_compare(tmp_path):
+    baseline = str(tmp_path / 'baseline.json')
+    assert main(['config', '--repeat', '1', '-o', baseline]) == 0
+    assert main(['config', '--repeat', '1', '--compare', baseline, '--threshold', '0.9']) == 0
+    results = json.load(open(baseline))['results']
+    faster = {name: {'per_second': r['per_second'] * 2} for name, r in results.items()}
+    assert [name for name, ratio in compare(results, faster)] == list(results)
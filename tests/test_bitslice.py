@@ -0,0 +1,62 @@
+from itertools import product
+import numpy as np
+from pe import batch, bitslice
+from pe.pe import FLAGS, PE
+from pe.bitutils import luteval
+from pe.verify import configs, vectors
+
+def test_pack():
+    bits = np.random.default_rng(0).integers(0, 2, 200).astype(bool)
+    words = bitslice.pack(bits)
+    assert len(words) == 4
+    assert (bitslice.unpack(words, 200) == bits).all()
+
+def test_lut():
+    rng = np.random.default_rng(1)
+    d, e, f = rng.integers(0, 2, (3, 130))
+    packed = [bitslice.pack(x) for x in (d, e, f)]
+    for code in [0x00, 0x96, 0xE8, 0xff]:
+        out = bitslice.lut(code, *packed)
+        assert (bitslice.unpack(out, 130) == luteval(code, d, e, f)).all()
+    codes = rng.integers(0, 256, 130)
+    out = bitslice.lut(bitslice.planes(codes, 8), *packed)
+    assert (bitslice.unpack(out, 130) == luteval(codes, d, e, f)).all()
+
+def test_flag():
+    # the flags of every configuration, combined as get_flag does
+    n = 1000
+    a, b, d = vectors(n)
+    lut_out = np.random.default_rng(2).integers(0, 2, n).astype(bool)
+    for name, (constructor, args) in configs().items():
+        pe = constructor(*args)
+        res, p = batch.ALU[pe._opcode](a, b, d, pe._alu.signed)
+        bits = batch.flags(pe._opcode, a, b, d, res) + (lut_out, p)
+        words = [bitslice.pack(x) for x in bits]
+        for flag_sel, (needs, predicate) in enumerate(FLAGS):
+            expected = [bool(predicate(*row)) for row in zip(*[x.tolist() for x in bits])]
+            out = bitslice.flag(flag_sel, *words)
+            assert (bitslice.unpack(out, n) == expected).all(), (name, flag_sel)
+
+def test_predicate():
+    # packed res_p against PE.__call__, for every configuration and flag_sel
+    n = 100
+    a, b, d = vectors(n)
+    e, f = np.random.default_rng(3).integers(0, 2, (2, n))
+    for name, (constructor, args) in configs().items():
+        for flag_sel, code in product(range(len(FLAGS)), [None, 0x96]):
+            pe = constructor(*args)
+            if code is not None:
+                pe.lut(code)
+            pe.flag_sel = flag_sel
+            out = bitslice.predicate(pe, a, b, d, e, f)
+            expected = [int(pe(*row)[1]) for row in zip(a.tolist(), b.tolist(), [0] * n,
+                                                        d.tolist(), e.tolist(), f.tolist())]
+            assert (bitslice.unpack(out, n) == expected).all(), (name, flag_sel, code)
+
+def test_predicate_custom_op():
+    xor = PE(0x13, lambda a, b, c, d: a ^ b)
+    try:
+        bitslice.predicate(xor, [1], [3])
+        assert False
+    except NotImplementedError:
+        pass
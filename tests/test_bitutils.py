@@ -0,0 +1,28 @@
+import numpy as np
+from pe.bitutils import fun2seq, fun2planes, lutinit, lutinits, luteval, seq2int
+
+def test_fun2seq():
+    assert fun2seq(lambda a, b: a and not b) == [0, 1, 0, 0]
+    assert fun2seq(lambda a, b, c: c) == [0, 0, 0, 0, 1, 1, 1, 1]
+
+def test_fun2planes():
+    for f, g in [(lambda a, b, c: a ^ b ^ c, lambda a, b, c: a ^ b ^ c),
+                 (lambda a, b, c: a & b | c, lambda a, b, c: a and b or c),
+                 (lambda a, b, c: ~a & c, lambda a, b, c: not a and c)]:
+        assert list(fun2planes(f)) == fun2seq(g)
+    assert list(fun2planes(lambda a, b: True)) == [1, 1, 1, 1]
+
+def test_lutinits():
+    table = (np.arange(256)[:, None] >> np.arange(8)) & 1
+    assert list(lutinits(table)) == list(range(256))
+    wide = fun2planes(lambda *bits: bits[0] ^ bits[6], 128)
+    assert lutinits(wide) == seq2int(list(wide))
+    assert lutinit(fun2planes(lambda a, b: a | b), 8) == lutinit([0, 1, 1, 1], 8)
+
+def test_luteval():
+    bits = np.arange(8)
+    for code in [0x00, 0x96, 0xE8, 0xff]:
+        out = luteval(code, bits & 1, bits >> 1 & 1, bits >> 2)
+        assert seq2int(list(out)) == code
+    codes = np.array([0x96, 0x01])
+    assert list(luteval(codes, 0, 0, 0)) == [False, True]
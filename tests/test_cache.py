@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import numpy as np
+import pe
+from pe.pe import PE, CONST
+from pe.cache import ResultCache
+from pe.verify import vectors
+
+def test_eval_batch(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    a, b, d = vectors(1000)
+    add = pe.add()
+    expected = add.eval_batch(a, b, 0, d)
+    for i in range(2):
+        for x, y in zip(cache.eval_batch(add, a, b, 0, d), expected):
+            assert (x == y).all()
+    assert (cache.misses, cache.hits) == (1, 1)
+
+    # a different configuration or different vectors is a miss
+    cache.eval_batch(pe.add().rega(CONST, 1), a, b, 0, d)
+    cache.eval_batch(add, a[::-1], b, 0, d)
+    assert (cache.misses, cache.hits) == (3, 1)
+    assert len(list(tmp_path.glob('*.npy'))) == 3
+
+def test_evict(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=15000)
+    keys = []
+    for i in range(5):
+        keys.append(cache.key(pe.add(), i))
+        cache.put(keys[-1], np.zeros(1000, np.uint32))
+        os.utime(cache.path(keys[-1]), (i, i))
+        cache.get(keys[0])
+    assert cache.get(keys[0]) is not None
+    assert [cache.get(key) is None for key in keys] == [False, True, True, False, False]
+
+def work(directory):
+    cache = ResultCache(directory, max_bytes=64 << 10)
+    a, b, d = vectors(1000)
+    for f in [pe.add, pe.sub, pe.or_, pe.and_] * 5:
+        res, res_p, irq = cache.eval_batch(f(), a, b, 0, d)
+        assert (res == f().eval_batch(a, b, 0, d)[0]).all()
+
+def test_concurrent(tmp_path):
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=work, args=(str(tmp_path),)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+    assert not list(tmp_path.glob('*.tmp'))
+
+def test_custom_op(tmp_path):
+    # the key cannot tell custom ops on one opcode apart
+    cache = ResultCache(str(tmp_path))
+    xor = PE(0x13, lambda a, b, c, d: a ^ b)
+    try:
+        cache.eval_batch(xor, [1], [3])
+        assert False
+    except NotImplementedError:
+        pass
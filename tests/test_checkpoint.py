@@ -0,0 +1,56 @@
+import pe
+from pe.pe import DELAY, VALID, INT
+from pe.fabric import Fabric
+from pe.array import PEArray
+from pe.checkpoint import STATE, snapshot, restore, branch
+
+def accumulator(backend=INT):
+    return pe.add().rega(DELAY, 0).backend(backend).debug_trig(3).irq_en(False, True)
+
+def run(p, stimulus):
+    return [p(a, b, clk=clk) for a, b in stimulus for clk in (0, 1)]
+
+def test_pe():
+    for backend in ['bv', 'int']:
+        p = accumulator(backend)
+        run(p, [(0, 1), (1, 2)])
+        state = p.snapshot()
+        assert len(state) == STATE.itemsize == 14
+        expected = run(p, [(0, 5), (0, 7)])
+        p.restore(state)
+        assert run(p, [(0, 5), (0, 7)]) == expected
+        assert p.snapshot() != state
+
+def fabric():
+    f = Fabric()
+    acc = f.place(accumulator(), 0, 0)
+    f.wire(acc, 'res', acc, 'data0')
+    f.input('in', acc, 'data1')
+    f.output('acc', acc, 'res')
+    return f
+
+def test_fabric_branch():
+    f = fabric()
+    for i in range(10):
+        f.step({'in': i})
+    states = f.snapshot()
+    scenarios = [[{'in': k}] * 5 for k in range(4)]
+    simulate = lambda f, stimulus: list(f.run(stimulus))
+    for workers in [1, 2]:
+        assert branch(f, scenarios, simulate, workers=workers) == \
+            [[{'acc': 45 + k * (n + 1)} for n in range(5)] for k in range(4)]
+    # the target is left at the checkpoint
+    assert (f.snapshot() == states).all()
+
+def test_bulk():
+    pes = [accumulator().rega(DELAY, i) for i in range(4)] + [pe.sub().regb(VALID, 9)]
+    states = snapshot(pes)
+    assert states['value'][:, 0].tolist() == [0, 1, 2, 3, 0]
+    array = PEArray.from_pes(pes)
+    assert (array.snapshot() == states).all()
+    for p in pes:
+        p(0, 0, clk=1)
+    restore(pes, states)
+    assert (snapshot(pes) == states).all()
+    array.restore(states)
+    assert (array.snapshot() == states).all()
@@ -0,0 +1,24 @@
+import pe
+from pe.pe import CONST, DELAY
+
+def test_compile_flags():
+    for flag_sel in range(16):
+        for a in [pe.add(), pe.sub(), pe.and_(), pe.mul1(True), pe.abs()]:
+            a.flag(flag_sel).lut(0xe8)
+            f = a.compile()
+            for args in [(1, 2, 0, 1, 1, 0), (0x8000, 0x8000, 0, 0, 1, 1),
+                         (0xffff, 1, 0, 1, 1, 1), (0, 0, 0, 0, 0, 0)]:
+                assert f(*args) == a(*args)
+
+def test_compile_irq():
+    a = pe.sub().irq_en().debug_trig(1).rega(CONST, 5)
+    f = a.compile()
+    assert f(0, 4) == a(0, 4)
+    assert f(0, 3) == a(0, 3)
+
+def test_compile_delay():
+    a = pe.add().rega(DELAY, 0)
+    b = pe.add().rega(DELAY, 0)
+    f = b.compile()
+    for clk, data0 in [(0, 1), (1, 2), (0, 3), (1, 4), (1, 5), (0, 6)]:
+        assert f(data0, 1, clk=clk) == a(data0, 1, clk=clk)
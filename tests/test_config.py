@@ -0,0 +1,20 @@
+import pytest
+from pe.config import Format, config, parse
+
+def test_config():
+    assert config('11bb', b=2) == 0b1110
+    assert config('aabb', a=1, b=2) == 0b0110
+    assert config('l0dsooooo', o=0x8) == 0b000001000
+    assert config('aa bb', a=1, b=2) == 0b0110
+
+def test_format():
+    f = Format('r' * 14 + 'ffffiia00soooooo')
+    assert f.width == 30
+    word = f.encode(o=0x15, s=1, i=2, f=0xE, r=0x2aa)
+    assert word == (0x2aa << 16) | (0xE << 12) | (2 << 10) | (1 << 6) | 0x15
+    assert f.decode(word) == dict(r=0x2aa, f=0xE, i=2, a=0, s=1, o=0x15)
+    assert parse('aabb') is parse('aabb')
+
+def test_format_consecutive():
+    with pytest.raises(ValueError):
+        Format('aba')
@@ -0,0 +1,36 @@
+import asyncio
+import sys
+import numpy as np
+import pytest
+from pe.cosim import Bridge, cosimulate
+
+# a model answering every vector with res 0, res_p 0
+ZEROS = [sys.executable, '-c', '''
+import struct, sys
+while True:
+    header = sys.stdin.buffer.read(8)
+    if len(header) < 8:
+        break
+    opcode, count = struct.unpack('<II', header)
+    sys.stdin.buffer.read(6 * count)
+    sys.stdout.buffer.write(bytes(4 * count))
+    sys.stdout.buffer.flush()
+''']
+
+def test_standin():
+    names = ['add', 'sub', 'ge_s', 'mul1']
+    results = asyncio.run(cosimulate(names, n=3000, processes=2, depth=2, batch=256))
+    assert results == [(name, 0, []) for name in names]
+
+def test_mismatches():
+    [(name, count, rows)] = asyncio.run(cosimulate(['or_'], n=100, command=ZEROS, batch=16))
+    assert count > 0 and len(rows) == 8
+    a, b, d, res, res_p, rtl_res, rtl_res_p = rows[0]
+    assert res == a | b and rtl_res == 0
+
+def test_model_exits():
+    async def run():
+        async with Bridge([sys.executable, '-c', 'pass']) as bridge:
+            await bridge.run(0, np.arange(4), np.arange(4))
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
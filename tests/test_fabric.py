@@ -0,0 +1,49 @@
+import pe
+from pe.pe import CONST, DELAY
+from pe.fabric import Fabric
+
+def test_chain():
+    f = Fabric(2, 1)
+    a = f.place(pe.add(), 0, 0)
+    b = f.place(pe.sub(), 1, 0)
+    f.input('x', a, 'data0').input('y', a, 'data1').input('z', b, 'data1')
+    f.wire(a, 'res', b, 'data0').output('out', b, 'res')
+    assert [out['out'] for out in f.run([{'x': 1, 'y': 2, 'z': 3},
+                                         {'x': 10, 'y': 20, 'z': 5}])] == [0, 25]
+    assert f.levels == [[0], [1]]
+
+def test_accumulator():
+    f = Fabric()
+    acc = f.place(pe.add().rega(DELAY, 0), 0, 0)
+    f.wire(acc, 'res', acc, 'data0').input('x', acc, 'data1').output('sum', acc, 'res')
+    xs = [3, 1, 4, 1, 5, 9]
+    assert [out['sum'] for out in f.run({'x': x} for x in xs)] == \
+           [sum(xs[:i+1]) for i in range(len(xs))]
+
+def test_lfsr():
+    taps, seed = 0xb400, 0xace1
+    f = Fabric(4, 1)
+    shift = f.place(pe.shr(False).rega(DELAY, seed).regb(CONST, 1), 0, 0)
+    lsb = f.place(pe.and_().rega(DELAY, seed).regb(CONST, 1).flag(0x1), 1, 0)
+    mask = f.place(pe.sel().rega(CONST, taps).regb(CONST, 0), 2, 0)
+    xor = f.place(pe.xor(), 3, 0)
+    f.wire(lsb, 'res_p', mask, 'bit0')
+    f.wire(shift, 'res', xor, 'data0').wire(mask, 'res', xor, 'data1')
+    f.wire(xor, 'res', shift, 'data0').wire(xor, 'res', lsb, 'data0')
+    f.output('state', xor, 'res')
+
+    state = seed
+    for out in f.run([{}] * 20):
+        state = (state >> 1) ^ (taps if state & 1 else 0)
+        assert out['state'] == state
+
+def test_loop():
+    f = Fabric()
+    a = f.place(pe.add(), 0, 0)
+    b = f.place(pe.add(), 0, 1)
+    f.wire(a, 'res', b, 'data0').wire(b, 'res', a, 'data0')
+    try:
+        f.schedule()
+        assert False
+    except ValueError:
+        pass
@@ -0,0 +1,67 @@
+import random
+import pytest
+import pe
+from pe.pe import DELAY, VALID, CONST
+from pe.fabric import Fabric
+from pe.fuse import source
+
+OPS = [pe.add, pe.sub, lambda: pe.ge(False).flag(0xF), pe.xor, lambda: pe.mul0(False),
+       lambda: pe.shr(True), lambda: pe.le(True).flag(0xB), pe.sel, lambda: pe.abs(True),
+       lambda: pe.add().flag(6), lambda: pe.mul1(True).flag(7),
+       lambda: pe.sub().flag(0xD).irq_en(True, True).debug_trig(5),
+       lambda: pe.or_().flag(0xE).lut(0xa5), lambda: pe.sub().rega(DELAY, 3),
+       lambda: pe.add().regb(VALID, 2), lambda: pe.lshl().regb(CONST, 3)]
+
+def chain(backend, fused):
+    # every op once, each reading the previous res and res_p
+    f = Fabric()
+    prev = None
+    for x, op in enumerate(OPS):
+        p = f.place(op().backend(backend), x, 0)
+        if prev is None:
+            f.input('a', p, 'data0')
+        else:
+            f.wire(prev, 'res', p, 'data0').wire(prev, 'res_p', p, 'bit0')
+        f.input('b', p, 'data1').input('e', p, 'bit1').input('f', p, 'bit2')
+        for output in ['res', 'res_p', 'irq']:
+            f.output((output, x), p, output)
+        prev = p
+    return f.fuse(fused)
+
+def test_fused():
+    rng = random.Random(0)
+    stimulus = [{'a': rng.randrange(1 << 16), 'b': rng.randrange(1 << 16),
+                 'e': rng.randrange(2), 'f': rng.randrange(2)} for _ in range(200)]
+    normalize = lambda outputs: [{k: int(v) for k, v in o.items()} for o in outputs]
+    expected = normalize(chain('int', False).run(stimulus))
+    for backend in ['int', 'bv']:
+        assert normalize(chain(backend, True).run(stimulus)) == expected
+
+def test_no_tuples():
+    f = chain('int', True).schedule()
+    code = source(f)
+    assert 'func_' not in code and 'res_0, p_0' not in code
+    # a bv PE is called through its compiled function
+    assert 'func_0' in source(chain('bv', True).schedule())
+
+def test_demand():
+    f = Fabric()
+    a = f.place(pe.mul0(True).backend('int').flag(6).irq_en(), 0, 0)
+    f.input('x', a, 'data0').input('y', a, 'data1').output('out', a, 'res')
+    f.schedule()
+    assert f.demand == [{'res'}]
+    assert f.step({'x': 300, 'y': 300}) == {'out': 90000 & 0xffff}
+    assert 'V_0' not in source(f) and 'irq_0 = False' in source(f)
+
+def test_outputs():
+    for backend in ['bv', 'int']:
+        p = pe.sub().flag(0x6).irq_en(True, True).backend(backend)
+        full = p.compile()
+        res_only = p.outputs({'res'}).compile()
+        flag_only = p.compile({'res_p'})
+        for a, b in [(0x8000, 1), (5, 7), (3, 3)]:
+            res, res_p, irq = full(a, b)
+            assert res_only(a, b) == (res, 0, False)
+            assert flag_only(a, b)[1] == res_p
+    with pytest.raises(ValueError):
+        pe.add().outputs({'carry'})
@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import pe
+from pe import isa
+
+def test_isa_names():
+    assert pe.ISA == isa.__all__
+    assert pe.add is isa.add
+    assert 'add' in dir(pe)
+
+def run(code, **env):
+    env = dict(os.environ, **env)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    subprocess.run([sys.executable, '-c', code], env=env, check=True)
+
+def test_int_backend_skips_hwtypes():
+    run("import sys, pe; assert pe.add()(1, 2)[0] == 3; assert 'hwtypes' not in sys.modules",
+        PE_BACKEND='int')
+
+def test_int_backend_isa_only():
+    # PE_BACKEND only applies to the isa PEs; a custom op is still bv
+    run("import pe; from pe.pe import PE, BV, INT\n"
+        "assert pe.add()._backend == INT\n"
+        "custom = PE(0x0, lambda a, b, c, d: a ^ b)\n"
+        "assert custom._backend == BV and custom(1, 3) == (2, 0, False)",
+        PE_BACKEND='int')
+
+def test_hwtypes_names():
+    # the hwtypes names load it on first use, whichever entry point is first
+    run("from pe.pe import ALU\n"
+        "assert ALU(lambda a, b, c, d: a + b, 0, 16)(1, 2) == 3")
+    run("from pe.pe import BitVector, ZERO\n"
+        "assert BitVector is not None and ZERO == 0")
+
+def test_int_backend_loader():
+    # decoded PEs keep the constructor's backend unless one is given
+    run("import pe; from pe.pe import PE, BV, INT; from pe import loader\n"
+        "word = pe.add().instruction\n"
+        "assert loader.decode(word)._backend == INT\n"
+        "assert all(p._backend == INT for p in loader.load([word, pe.sub().instruction]))\n"
+        "assert PE.from_instruction(word)(1, 2)[0] == 3\n"
+        "assert loader.decode(word, backend=BV)._backend == BV",
+        PE_BACKEND='int')
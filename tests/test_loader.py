@@ -0,0 +1,48 @@
+import numpy as np
+import pe
+from pe.isa import neg
+from pe.pe import PE, CONST, DELAY
+from pe.loader import opcodes, load
+from pe.verify import configs
+
+def test_opcodes():
+    assert opcodes()[0x0] is pe.add
+    assert opcodes()[0xf] is pe.shr
+    assert opcodes()[0x15] is neg
+
+def test_neg():
+    # neg is not in isa.__all__, and its constant b = 1 is not in the word
+    a = neg().flag(0x2)
+    b = PE.from_instruction(a.instruction, consts={'b': 1})
+    assert b.instruction == a.instruction
+    for x in [0, 1, 0x7fff, 0x8000, 0xffff]:
+        assert b(x) == a(x) == ((-x) & 0xffff, a(x)[1], False)
+
+def test_roundtrip():
+    for name, (f, args) in configs().items():
+        a = f(*args).flag(0x3).irq_en(True, False).rega(CONST, 7).regd(DELAY, 1)
+        b = PE.from_instruction(a.instruction, consts={'a': 7, 'd': 1})
+        assert b.instruction == a.instruction, name
+        for x, y in [(0, 0), (3, 5), (0x8000, 0x7fff), (0xffff, 1)]:
+            assert b(x, y, 0, 1) == a(x, y, 0, 1), (name, x, y)
+
+def test_lut():
+    a = pe.and_().flag(0xE).lut(0x96)
+    b = PE.from_instruction(a.instruction, lut=0x96, backend='int')
+    for bits in range(8):
+        args = (1, 2, 0, bits & 1, bits >> 1 & 1, bits >> 2)
+        assert b(*args) == a(*args)
+
+def test_load():
+    acc = pe.add().rega(DELAY, 0).instruction
+    words = np.array([pe.add().instruction, acc, acc], dtype=np.uint32)
+    pes = load(words, consts=[None, {'a': 5}, {'a': 5}])
+    assert pes[1] is not pes[2] and pes[1].RegA is not pes[2].RegA
+    pes[1](1, 1, clk=0)
+    pes[1](1, 1, clk=1)
+    assert pes[1](0, 1)[0] == 2 and pes[2](0, 1)[0] == 6
+
+    funcs = load(words, compiled=True)
+    assert funcs[0](1, 2)[0] == 3
+    a, b = load([words[0]] * 2, compiled=True)
+    assert a is b
@@ -0,0 +1,63 @@
+import random
+import pytest
+from pe import mapper
+from pe.mapper import select, netlist, evaluate
+
+def mac(x, w, acc):
+    return acc + x * w
+
+def sort3(a, b, c):
+    lo, hi = mapper.min(a, b), mapper.max(a, b)
+    return mapper.min(lo, c), mapper.min(mapper.max(lo, c), hi), mapper.max(hi, c)
+
+def ops(a, b):
+    return (select(a >= b, a, b), a >= b, a < b, mapper.eq(a, b), -a, ~b,
+            a * 8, (a >> 3) - 5, mapper.ashr(a, 2), abs(a), mapper.mulhi(a, b, True),
+            mapper.lt(a, b, True), select(a < b, a + 1, 3), a >> b, 12 + a * 0, a)
+
+def check(kernel, n=200):
+    f = netlist(kernel).fabric()
+    names = netlist(kernel).inputs
+    corners = [0, 1, 0x7fff, 0x8000, 0xffff]
+    rng = random.Random(0)
+    for i in range(n):
+        args = [rng.choice(corners) if i < 25 else rng.randrange(1 << 16) for _ in names]
+        outputs = f.step(dict(zip(names, args)))
+        assert {name: int(value) for name, value in outputs.items()} == evaluate(kernel, *args)
+
+def test_kernels():
+    for kernel in [mac, sort3, ops]:
+        check(kernel)
+
+def test_selection():
+    cells = netlist(mac).cells
+    assert [(c.op, c.x) for c in cells] == [('mul0', 0), ('add', 1)]
+    # max(a, b) and a >= b share a PE; x * 8 is a shift
+    ops_cells = netlist(ops).cells
+    assert [c.op for c in ops_cells].count('ge') == 1
+    assert ('lshl', None, ('a', 3)) in [(c.op, c.flag, c.sources) for c in ops_cells]
+    assert netlist(mac) is netlist(mac)
+
+def test_fold():
+    assert evaluate(lambda a: (3 - 5) * a + (1 << 20), 2) == {'out': 0xfffc}
+    assert len(netlist(lambda a: a * 1 + 0 | 0).cells) == 1  # or_ passing a through
+    # constant outputs are 16-bit, as the fabric gives them
+    assert evaluate(lambda a: (-1, 1 << 16, a >= 0), 5) == {'out0': 0xffff, 'out1': 0, 'out2': 1}
+    check(lambda a: (-1, 1 << 16), n=2)
+
+def test_place():
+    f = netlist(sort3).fabric(height=2)
+    assert all(y < 2 for x, y in f.grid)
+    with pytest.raises(ValueError):
+        netlist(sort3).fabric(width=1, height=1)
+
+def test_errors():
+    with pytest.raises(TypeError):
+        netlist(lambda a, b: (a >= b) + 1)
+    with pytest.raises(TypeError):
+        netlist(lambda a, b: a if a >= b else b)
+    # == would otherwise compare the nodes, not the values
+    with pytest.raises(TypeError):
+        netlist(lambda a, b: select(a == b, a, b))
+    with pytest.raises(TypeError):
+        netlist(lambda a, b: a != b)
@@ -0,0 +1,31 @@
+import pe
+from pe.pe import DELAY, INT
+from pe.fabric import Fabric
+
+def fabric():
+    # columns of accumulators, each adding the result of the column to its left
+    f = Fabric(4, 3)
+    for x in range(4):
+        for y in range(3):
+            acc = f.place(pe.add().rega(DELAY, x).backend(INT), x, y)
+            f.wire(acc, 'res', acc, 'data0')
+            if x:
+                f.wire(f[x-1, y], 'res', acc, 'data1')
+            else:
+                f.input('in{}'.format(y), acc, 'data1')
+            f.output((x, y), acc, 'res')
+    return f
+
+def test_parallel():
+    stimulus = [{'in0': i, 'in1': 2 * i, 'in2': 3 * i} for i in range(10)]
+    expected = list(fabric().run(stimulus))
+    for workers in [2, 3]:
+        f = fabric()
+        assert list(f.run(stimulus, workers=workers)) == expected
+        # register state is copied back from the workers
+        assert f.step({}) == fabric_after(stimulus).step({})
+
+def fabric_after(stimulus):
+    f = fabric()
+    list(f.run(stimulus))
+    return f
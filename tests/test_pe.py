@@ -1,4 +1,6 @@
+from hwtypes import BitVector
 import pe
+from pe.pe import COND
 
 def test_and():
     a = pe.and_()
@@ -94,3 +96,12 @@ def test_sel():
     assert res==2
 
 
+
+def test_cond_compare():
+    for signed in [False, True]:
+        cond = COND(lambda ge, eq, le: (ge, eq, le), signed)
+        for x, y in [(0, 0), (3, 5), (5, 3), (0x8000, 1), (1, 0x8000), (0xffff, 0xffff)]:
+            a, b = BitVector[16](x), BitVector[16](y)
+            sx, sy = (x - ((x & 0x8000) << 1), y - ((y & 0x8000) << 1)) if signed else (x, y)
+            ge, eq, le = (int(v) for v in cond(a, b, a - b))
+            assert (ge, eq, le) == (sx >= sy, sx == sy, sx <= sy), (signed, x, y)
@@ -0,0 +1,26 @@
+import io
+import pe
+from pe.pe import CONST, VALID, DELAY
+from pe.simulator import Simulator
+
+def test_run():
+    acc = pe.add().rega(DELAY, 0).regb(CONST, 1)
+    assert [res for res, res_p, irq in acc.run([(i,) for i in range(4)])] == [1, 1, 2, 3]
+
+def test_clk_en():
+    a = pe.add().rega(VALID, 0)
+    stimulus = [{'data0': 5}, {'data0': 6, 'clk_en': 0}, {'data0': 7}, {}]
+    assert [res for res, res_p, irq in a.run(stimulus)] == [0, 5, 5, 7]
+
+def test_vcd():
+    f = io.StringIO()
+    acc = pe.add().rega(DELAY, 0).backend('int')
+    with Simulator(acc, vcd=f) as sim:
+        outputs = list(sim.run([(1, 2), (1, 2), (3, 2)]))
+    assert [res for res, res_p, irq in outputs] == [2, 3, 3]
+    lines = f.getvalue().splitlines()
+    assert '$var wire 16 ) RegA $end' in lines
+    assert '$var wire 16 * res $end' in lines
+    assert lines[lines.index('$enddefinitions $end') + 1] == '#0'
+    # only the values that change
+    assert lines[-8:] == ['#3', '1!', '#4', '0!', 'b11 #', '#5', '1!', 'b11 )']
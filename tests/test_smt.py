@@ -0,0 +1,47 @@
+import pytest
+z3 = pytest.importorskip('z3')
+import pe
+from pe import smt
+from pe.pe import PE, CONST
+from pe.verify import configs, vectors
+
+def test_model():
+    a, b, d = vectors(25)
+    for k, (name, (f, args)) in enumerate(configs().items()):
+        for flag_sel in [k % 16, 0xF]:
+            p = f(*args).flag(flag_sel).lut(0x96).irq_en(True, False)
+            formula = smt.formula(p)
+            for x, y, z in zip(a, b, d):
+                assert formula(x, y, 0, z, 1, 0) == p(int(x), int(y), 0, int(z), 1, 0), \
+                    (name, flag_sel, x, y, z)
+
+def test_cached():
+    assert smt.formula(pe.add()) is smt.formula(pe.add())
+
+def test_sub():
+    # carry is not borrow, V is signed overflow
+    def spec(a, b, c, d, e, f):
+        return a - b, z3.UGE(a, b)
+    assert smt.check(pe.sub().flag(0x2), spec) is None
+
+    def spec(a, b, c, d, e, f):
+        wide = z3.SignExt(1, a) - z3.SignExt(1, b)
+        return None, wide != z3.SignExt(1, a - b)
+    assert smt.check(pe.sub().flag(0x6), spec) is None
+
+def test_equivalent():
+    assert smt.equivalent(pe.ge(True), pe.max(True)) is None
+    # lshl only uses b[3:0]
+    assert smt.equivalent(pe.lshl().regb(CONST, 0x13), pe.lshl().regb(CONST, 0x3), ['res']) is None
+
+    cex = smt.equivalent(pe.ge(True), pe.ge(False))
+    assert cex is not None
+    args = [cex[name] for name in ['data0', 'data1', 'c', 'bit0', 'bit1', 'bit2']]
+    assert pe.ge(True)(*args) != pe.ge(False)(*args)
+
+def test_custom_op():
+    # the model is of the isa op of an opcode, not of an arbitrary op
+    with pytest.raises(NotImplementedError):
+        smt.build(PE(0x13, lambda a, b, c, d: a ^ b))
+    with pytest.raises(NotImplementedError):
+        smt.formula(PE(0x13, lambda a, b, c, d: a ^ b))
@@ -0,0 +1,47 @@
+import pe
+from pe import stats
+from pe.pe import CONST, DELAY
+from pe.fabric import Fabric
+
+def test_profile():
+    add = pe.add()
+    sub = pe.sub().irq_en(True, False)
+    assert stats.ACTIVE is None
+    with pe.profile(timing=True) as s:
+        for i in range(4):
+            assert add(i, 1) == (i + 1, 0, False)
+        sub(3, 3)
+    assert stats.ACTIVE is None
+    assert s.calls == 5
+    assert s.opcodes == {0x0: 4, 0x1: 1}
+    assert s.triggers['irq'] == 1
+    assert set(stage for opcode, stage in s.time) == set(stats.STAGES)
+    assert 'registers' in s.summary()
+    assert all(line.startswith('PE;0x0') for line in s.collapsed())
+
+def test_profile_backends():
+    add = pe.add().backend('int')
+    table = pe.add().rega(CONST, 1).tabulate()
+    with pe.profile(timing=True) as s:
+        assert add(1, 2) == table(1, 2) == (3, 0, False)
+    assert s.calls == 2
+    assert set(s.time) == {(0x0, 'call')}
+
+def test_profile_fabric():
+    f = Fabric(1, 1)
+    acc = f.place(pe.add().rega(DELAY, 0), 0, 0)
+    f.wire(acc, 'res', acc, 'data0')
+    f.input('x', acc, 'data1')
+    f.output('y', acc, 'res')
+    with pe.profile() as s:
+        assert [o['y'] for o in f.run([{'x': 1}] * 3)] == [1, 2, 3]
+    assert s.calls == 3
+
+def test_profile_matches_call():
+    # the staged evaluation is PE.__call__'s, LUT included
+    for flag_sel in [0x0, 0x8, 0xE, 0xF]:
+        a = pe.xor().flag(flag_sel).lut(0x96).irq_en().debug_trig(2)
+        args = [(1, 3, 0, 1, 0, 1), (0xffff, 1, 0, 0, 1, 1), (5, 5, 0, 1, 1, 1)]
+        expected = [a(*x) for x in args]
+        with pe.profile(timing=True):
+            assert [a(*x) for x in args] == expected
@@ -0,0 +1,62 @@
+import numpy as np
+import pe
+from pe.pe import PE, CONST, DELAY
+from pe.table import TableCache, tabulate
+
+inputs = [(0, 0, 0, 0, 0, 0), (0x8000, 3, 0, 1, 1, 0), (0xffff, 0x1f, 0, 0, 1, 1),
+          (0x1234, 0xfff7, 0, 1, 0, 1), (7, 0x8000, 0, 1, 1, 1)]
+
+def check(make):
+    a = make()
+    b = make().tabulate()
+    assert b._table is not None
+    for args in inputs:
+        assert b(*args) == a(*args)
+    data0, data1 = np.array(inputs, dtype=np.uint16).T[:2]
+    res, res_p, irq = b.eval_batch(data0, data1)
+    for i, args in enumerate(inputs):
+        assert (res[i], res_p[i], irq[i]) == a(*args[:2])
+
+def test_tabulate_shift():
+    for flag_sel in [0x0, 0x4, 0x5]:
+        check(lambda: pe.lshl().flag(flag_sel))
+        check(lambda: pe.shr(True).flag(flag_sel).irq_en().debug_trig(1))
+
+def test_tabulate_const():
+    check(lambda: pe.and_().regb(CONST, 0x0ff0).flag(0x2))
+    check(lambda: pe.sel().rega(CONST, 3).flag(0xe).lut(0x96))
+
+def test_tabulate_invalidate():
+    a = pe.lshl().tabulate()
+    assert a._table is not None
+    a.flag(0x1)
+    assert a._table is None
+    assert a(1, 0) == (1, 1, False)
+
+def test_tabulate_rejects():
+    for a in [pe.add(), pe.lshl().rega(DELAY)]:
+        try:
+            a.tabulate()
+            assert False
+        except ValueError:
+            pass
+
+def test_tabulate_custom_op():
+    # the table key and fields assume the isa op of the opcode, so a
+    # custom op on the and opcode must not share and's table
+    xor = PE(0x13, lambda a, b, c, d: a ^ b).regb(CONST, 0xff)
+    try:
+        xor.tabulate()
+        assert False
+    except NotImplementedError:
+        pass
+    assert xor(0x1234)[0] == 0x12cb
+    assert pe.and_().regb(CONST, 0xff).tabulate()(0x1234)[0] == 0x34
+
+def test_table_cache():
+    cache = TableCache(10 << 20)
+    small = tabulate(pe.lshl(), cache=cache)
+    tabulate(pe.shr(False), cache=cache)
+    assert len(cache) == 2 and cache.nbytes == 2 * small.nbytes
+    tabulate(pe.shr(True), cache=cache)
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
@@ -0,0 +1,66 @@
+import importlib.util
+import os
+import pe
+from pe.cache import ResultCache
+
+def load(name):
+    # verilator/ is a script directory, not a package
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    spec = importlib.util.spec_from_file_location(name, os.path.join(root, 'verilator', name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+testvectors = load('testvectors')
+
+def rows(chunks):
+    return [row for chunk in chunks for row in chunk.tolist()]
+
+def test_random(tmp_path):
+    add = pe.add()
+    for cache in [None, ResultCache(str(tmp_path))]:
+        tests = testvectors.random(add, 500, 4, cache=cache)
+        assert len(tests) == 500
+        for x, y, res in tests:
+            assert 0 <= x < 16 and 0 <= y < 16 and res == x + y
+        assert {x for x, y, res in tests} == set(range(16))
+
+def test_cache_plain_function(tmp_path):
+    # only PEs are cached; a plain function is evaluated directly
+    cache = ResultCache(str(tmp_path))
+    tests = testvectors.complete(lambda x, y: (x * y,), 4, 16, cache=cache)
+    assert tests == [[x, y, x * y] for x in range(4) for y in range(4)]
+    assert cache.misses == 0
+
+def test_shards():
+    add = pe.add()
+    expected = testvectors.complete(add, 11, 16)
+    shards = [rows(testvectors.icomplete(add, 11, 16, shard, 4, chunk=8)) for shard in range(4)]
+    assert [row for shard in shards for row in shard] == expected
+    assert all(shards)
+    pairs = [{(x, y) for x, y, res in shard} for shard in shards]
+    assert sum(len(p) for p in pairs) == len(set.union(*pairs)) == 11 * 11
+
+def test_resume():
+    add = pe.add()
+    for sweep in [lambda cursor: testvectors.irandom(add, 300, 16, seed=3, chunk=64, cursor=cursor),
+                  lambda cursor: testvectors.icomplete(add, 17, 16, 1, 2, chunk=64, cursor=cursor)]:
+        full = rows(sweep(None))
+        for position in [0, 64, 100, 140]:
+            cursor = testvectors.Cursor(position)
+            assert rows(sweep(cursor)) == full[position:], position
+            assert cursor.position == len(full)
+
+def test_stop_and_resume():
+    add = pe.add()
+    cursor = testvectors.Cursor()
+    chunks = testvectors.irandom(add, 300, 16, chunk=64, cursor=cursor)
+    first = [next(chunks), next(chunks)]
+    assert cursor.position == 128
+    assert rows(first) + rows(testvectors.irandom(add, 300, 16, chunk=64, cursor=cursor)) == \
+        rows(testvectors.irandom(add, 300, 16, chunk=64))
+
+def test_cursor_save(tmp_path):
+    filename = str(tmp_path / 'cursor.json')
+    testvectors.Cursor(1234).save(filename)
+    assert testvectors.Cursor.load(filename).position == 1234
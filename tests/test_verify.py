@@ -0,0 +1,45 @@
+import numpy as np
+from pe.verify import configs, check, verify
+
+class Model:
+    # stand-in for the RTL, running the scalar python model
+
+    def __init__(self, offset=0):
+        self.offset = offset
+
+    def run(self, opcode, a, b, d):
+        for f, args in configs().values():
+            pe = f(*args).flag(0xF)
+            if pe.instruction & 0x1ff == opcode:
+                break
+        results = [pe(int(x), int(y), 0, int(z)) for x, y, z in zip(a, b, d)]
+        res = np.array([r[0] for r in results]) + self.offset
+        res_p = np.array([r[1] for r in results])
+        return res, res_p
+
+    def close(self):
+        pass
+
+def test_verify():
+    results = verify(n=32, rtl=Model, workers=2)
+    assert len(results) == len(configs())
+    for name, count, rows in results:
+        assert count == 0, (name, rows)
+
+def broken():
+    return Model(offset=1)
+
+def test_mismatch():
+    name, count, rows = check('add', n=32, rtl=broken, limit=3)
+    assert count == 32 and len(rows) == 3
+    a, b, d, res, res_p, rtl_res, rtl_res_p = rows[0]
+    assert rtl_res == res + 1
+
+def test_build_once(monkeypatch):
+    # the driver is built in the parent and its path passed to the jobs
+    import pe.verify
+    built = []
+    monkeypatch.setattr(pe.verify, 'verilator_binary', lambda: built.append(1) or 'binary')
+    monkeypatch.setattr(pe.verify, 'verilator_model', lambda binary: Model())
+    results = verify(n=8, workers=1)
+    assert built == [1] and all(count == 0 for name, count, rows in results)
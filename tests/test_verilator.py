@@ -0,0 +1,73 @@
+import importlib.util
+import os
+import struct
+import sys
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load(name):
+    # verilator/ is a script directory, not a package
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, 'verilator', name + '.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+v = load('verilator')
+
+# a driver binary stand-in answering res = a + b, res_p = d
+STUB = '''#!{}
+import struct, sys
+while True:
+    header = sys.stdin.buffer.read(8)
+    if len(header) < 8:
+        break
+    opcode, count = struct.unpack('<II', header)
+    tests = struct.unpack('<{{}}H'.format(3 * count), sys.stdin.buffer.read(6 * count))
+    results = []
+    for a, b, d in zip(tests[0::3], tests[1::3], tests[2::3]):
+        results += [(a + b) & 0xffff, d]
+    sys.stdout.buffer.write(struct.pack('<{{}}H'.format(2 * count), *results))
+    sys.stdout.buffer.flush()
+'''
+
+def test_vectors(tmp_path):
+    filename = str(tmp_path / 'add.pev')
+    for ncols in [3, 4]:
+        tests = np.arange(5 * ncols).reshape(5, ncols) * 4099 % (1 << 16)
+        v.write_vectors(filename, 0x1c0, tests)
+        with open(filename, 'rb') as f:
+            assert v.HEADER.unpack(f.read(v.HEADER.size)) == (v.MAGIC, 0x1c0, 5, ncols)
+        opcode, read = v.read_vectors(filename)
+        assert opcode == 0x1c0
+        assert read.dtype == np.dtype('<u2') and read.shape == (5, ncols)
+        assert (read == tests).all()
+
+def test_buildkey(tmp_path):
+    source = tmp_path / 'top.sv'
+    source.write_text('module top; endmodule\n')
+    key = v.buildkey([str(source)], 'top', 'driver', '-Wno-fatal')
+    assert key == v.buildkey([str(source)], 'top', 'driver', '-Wno-fatal')
+    assert key != v.buildkey([str(source)], 'top', 'driver 2', '-Wno-fatal')
+    assert key != v.buildkey([str(source)], 'top2', 'driver', '-Wno-fatal')
+    assert key != v.buildkey([str(source)], 'top', 'driver', '-Wall')
+    source.write_text('module top; wire x; endmodule\n')
+    assert key != v.buildkey([str(source)], 'top', 'driver', '-Wno-fatal')
+
+def test_frames():
+    frame = v.pack(0x1c0, [1, 2], [3, 4], [0, 1])
+    assert frame == struct.pack('<II6H', 0x1c0, 2, 1, 3, 0, 2, 4, 1)
+    res, res_p = v.unpack(struct.pack('<4H', 7, 1, 0xffff, 0))
+    assert res.tolist() == [7, 0xffff] and res_p.tolist() == [1, 0]
+
+def test_driver(tmp_path):
+    binary = tmp_path / 'Vstub'
+    binary.write_text(STUB.format(sys.executable))
+    binary.chmod(0o755)
+    a = np.arange(0, 60000, 997)
+    b = a[::-1] * 3 % (1 << 16)
+    with v.Driver(str(binary)) as driver:
+        for d in [0, 1]:
+            res, res_p = driver.run(0x0, a, b, d)
+            assert (res == (a + b) & 0xffff).all() and (res_p == d).all()
+    assert driver.process.returncode == 0
@@ -1,22 +1,32 @@
+import json
 from random import randint
 from itertools import product
+import numpy as np
 
 __all__ = ['random', 'complete']
+__all__ += ['irandom', 'icomplete', 'Cursor']
 
-def random(func, n, width):
+def random(func, n, width, cache=None):
     max = 1 << width
+    if cache is not None:
+        xy = [[randint(0,max-1), randint(0,max-1)] for i in range(n)]
+        x, y = np.array(xy, dtype=np.uint64).reshape(n, 2).T
+        return vectors(func, x, y, width, cache).tolist()
     tests = []
     for i in range(n):
-        x = randint(0,max)
-        y = randint(0,max)
+        x = randint(0,max-1)
+        y = randint(0,max-1)
         test = [x, y]
         result = func(*test)
         test.append(result[0])
         tests.append(test)
     return tests
 
-def complete(func, n, width):
+def complete(func, n, width, cache=None):
     max = 1 << width
+    if cache is not None:
+        index = np.arange(n * n, dtype=np.uint64)
+        return vectors(func, index // n, index % n, width, cache).tolist()
     tests = []
     for i in range(n):
         for j in range(n):
@@ -25,3 +35,82 @@ def complete(func, n, width):
             test.append(result[0])
             tests.append(test)
     return tests
+
+#
+# With cache (a pe.cache.ResultCache), results are read from or added to
+# the cache instead of evaluating func for every vector. The cache keys on
+# a PE's configuration, so any other func is evaluated uncached.
+#
+
+#
+# Streaming versions of random and complete.
+#
+# These yield (k, 3) arrays of [x, y, result] rows, at most chunk rows at a
+# time. A Cursor records how many vectors have been yielded, so a sweep that
+# is stopped can be resumed from the same cursor (saved with Cursor.save).
+#
+
+CHUNK = 1 << 16
+
+class Cursor:
+
+    def __init__(self, position=0):
+        self.position = position
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({'position': self.position}, f)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls(json.load(f)['position'])
+
+def dtype(width):
+    return np.uint16 if width <= 16 else np.uint32 if width <= 32 else np.uint64
+
+def results(func, x, y, cache=None):
+    if cache is not None and hasattr(func, 'instruction'):
+        return cache.eval_batch(func, x, y)[0]
+    if hasattr(func, 'eval_batch'):
+        return func.eval_batch(x, y)[0]
+    return np.array([func(int(a), int(b))[0] for a, b in zip(x, y)])
+
+def vectors(func, x, y, width, cache=None):
+    tests = np.empty((len(x), 3), dtype=dtype(width))
+    tests[:, 0] = x
+    tests[:, 1] = y
+    tests[:, 2] = results(func, x, y, cache)
+    return tests
+
+def irandom(func, n, width, seed=0, chunk=CHUNK, cursor=None, cache=None):
+    # n random vectors with x, y in [0, 2**width). Chunk i is drawn from
+    # its own stream seeded by (seed, i), so resuming reproduces the sweep.
+    cursor = cursor or Cursor()
+    while cursor.position < n:
+        i, offset = divmod(cursor.position, chunk)
+        rng = np.random.default_rng([seed, i])
+        xy = rng.integers(0, 1 << width, size=(2, min(chunk, n - i * chunk)),
+                          dtype=np.uint64)
+        x, y = xy[:, offset:]
+        tests = vectors(func, x, y, width, cache)
+        cursor.position += len(tests)
+        yield tests
+
+def shard_range(total, shard, nshards):
+    return total * shard // nshards, total * (shard + 1) // nshards
+
+def icomplete(func, n, width, shard=0, nshards=1, chunk=CHUNK, cursor=None, cache=None):
+    # all n*n pairs of x, y in [0, n), in the same order as complete().
+    # With nshards > 1 only the shard'th contiguous slice is generated, so
+    # nshards processes can split one sweep without overlap.
+    assert n <= 1 << width, n
+    assert 0 <= shard < nshards, shard
+    start, stop = shard_range(n * n, shard, nshards)
+    cursor = cursor or Cursor()
+    while start + cursor.position < stop:
+        lo = start + cursor.position
+        index = np.arange(lo, min(lo + chunk, stop), dtype=np.uint64)
+        tests = vectors(func, index // n, index % n, width, cache)
+        cursor.position += len(tests)
+        yield tests
@@ -5,6 +5,6 @@ from verilator import compile
 a = and_()
 
 tests = complete(a, 4, 16)
-compile('test_pe_comp_unq1',a.opcode,tests)
+compile('test_pe_comp_unq1',a.instruction,tests)
 
 
@@ -1,7 +1,44 @@
+import hashlib
+import inspect
 import os
+import shutil
+import struct
 import subprocess
+import numpy as np
 
 __all__ = ['harness', 'compile']
+__all__ += ['write_vectors', 'read_vectors']
+__all__ += ['driversource', 'build', 'Driver']
+
+#
+# Binary test-vector files
+#
+#   char     magic[4] = "PEV1"
+#   uint32   opcode
+#   uint32   count
+#   uint32   ncols
+#   uint16   tests[count][ncols]
+#
+# all little endian. The mmap harness reads the opcode and vectors from the
+# file at runtime, so one compiled model runs any number of vector files.
+#
+MAGIC = b'PEV1'
+HEADER = struct.Struct('<4sIII')
+
+def write_vectors(filename, opcode, tests):
+    tests = np.asarray(tests, dtype='<u2')
+    count, ncols = tests.shape
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, opcode, count, ncols))
+        f.write(tests.tobytes())
+
+def read_vectors(filename):
+    with open(filename, 'rb') as f:
+        magic, opcode, count, ncols = HEADER.unpack(f.read(HEADER.size))
+    assert magic == MAGIC, magic
+    tests = np.memmap(filename, dtype='<u2', mode='r', offset=HEADER.size,
+                      shape=(count, ncols))
+    return opcode, tests
 
 def testsource(tests):
     source = '''
@@ -27,11 +64,73 @@ def bodysource(tests):
         top->op_b = test[1];
         top->eval();
         std::cout << test[0] << ", " << test[1] << ", " << test[2] << ", " << top->res << "\\n";
-        //assert(top->res == test[2]);
+        assert(top->res == test[2]);
     }}
 '''.format(ntests=len(tests))
 
-def harness(name, opcode, tests):
+def mmapsource(vectors):
+    return '''
+    const char* path = argc > 1 ? argv[1] : "{vectors}";
+    int fd = open(path, O_RDONLY);
+    assert(fd >= 0);
+    struct stat st;
+    fstat(fd, &st);
+    const char* map = (const char*) mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    assert(map != MAP_FAILED);
+    assert(memcmp(map, "PEV1", 4) == 0);
+    uint32_t header[3];
+    memcpy(header, map + 4, sizeof(header));
+    uint32_t opcode = header[0], ntests = header[1], ncols = header[2];
+    const uint16_t* tests = (const uint16_t*) (map + 16);
+
+    top->op_code = opcode & 0x1ff;
+    top->op_a_shift = 0;
+    top->op_d_p = 0;
+
+    for(uint32_t i = 0; i < ntests; i++) {{
+        const uint16_t* test = tests + i * ncols;
+        top->op_a = test[0];
+        top->op_b = test[1];
+        top->eval();
+        std::cout << test[0] << ", " << test[1] << ", " << test[2] << ", " << top->res << "\\n";
+        assert(top->res == test[2]);
+    }}
+
+    munmap((void*) map, st.st_size);
+    close(fd);
+'''.format(vectors=vectors)
+
+def mmapharness(name, vectors):
+    return '''\
+#include "V{name}.h"
+#include "verilated.h"
+#include <cassert>
+#include <cstdint>
+#include <cstring>
+#include <iostream>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+int main(int argc, char **argv, char **env) {{
+    Verilated::commandArgs(argc, argv);
+    V{name}* top = new V{name};
+
+    {body}
+
+    delete top;
+    std::cout << "Success" << std::endl;
+    exit(0);
+}}'''.format(name=name, body=mmapsource(vectors))
+
+def harness(name, opcode, tests, vectors=None):
+    # With vectors, the tests are written to that binary file and the
+    # driver mmaps it at runtime (or the file named by argv[1]) instead of
+    # compiling them in.
+    if vectors is not None:
+        write_vectors(vectors, opcode, tests)
+        return mmapharness(name, os.path.abspath(vectors))
 
     test = testsource(tests)
     body = bodysource(tests)
@@ -59,17 +158,164 @@ int main(int argc, char **argv, char **env) {{
 }}'''.format(test=test,body=body,name=name,op=opcode&0x1ff)
 
 
-def compile(name, opcode, tests):
-    verilatorcpp = harness(name, opcode, tests)
+def compile(name, opcode, tests, vectors=None):
+    verilatorcpp = harness(name, opcode, tests, vectors)
     with open('build/sim_'+name+'.cpp', "w") as f:
         f.write(verilatorcpp)
 
 
 
+#
+# Compile-once, run-many builds
+#
+# build() keys each Verilator build on a hash of the verilog sources, the
+# top module, the C++ driver and the verilator flags, and reuses the binary
+# in cache/<key>/obj_dir when it already exists. Builds happen in a scratch
+# directory that is renamed into place, so concurrent builds of the same
+# key are safe.
+#
+VERILATOR = 'verilator {flags} --cc {sources} --exe {driver} --top-module {top} --Mdir obj_dir'
+CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'cache')
+
+def buildkey(sources, top, driver, flags):
+    h = hashlib.sha256()
+    for source in sources:
+        with open(source, 'rb') as f:
+            h.update(f.read())
+    for text in [top, driver, VERILATOR, flags]:
+        h.update(text.encode())
+    return h.hexdigest()[:16]
+
+def build(sources, top, driver, cache=CACHE, flags='-Wno-fatal'):
+    # Return the path of the verilated binary for sources + driver,
+    # building it only if it is not already in the cache.
+    sources = [os.path.abspath(source) for source in sources]
+    key = buildkey(sources, top, driver, flags)
+    dir = os.path.join(cache, key)
+    binary = os.path.join(dir, 'obj_dir', 'V' + top)
+    if os.path.exists(binary):
+        return binary
+
+    tmp = '{}.{}'.format(dir, os.getpid())
+    os.makedirs(tmp)
+    try:
+        with open(os.path.join(tmp, 'driver.cpp'), 'w') as f:
+            f.write(driver)
+        command = VERILATOR.format(flags=flags, sources=' '.join(sources),
+                                   driver='driver.cpp', top=top)
+        assert not subprocess.call(command, cwd=tmp, shell=True)
+        assert not subprocess.call('make -C obj_dir -j -f V{0}.mk V{0}'.format(top), cwd=tmp, shell=True)
+        try:
+            os.rename(tmp, dir)
+        except OSError:
+            pass  # built concurrently by someone else
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return binary
+
+#
+# Persistent driver
+#
+# Reads frames from stdin until EOF, each
+#
+#   uint32   opcode
+#   uint32   count
+#   uint16   tests[count][3]   op_a, op_b, op_d_p
+#
+# and answers each with uint16 results[count][2] (res, res_p) on stdout.
+#
+FRAME = struct.Struct('<II')
+
+def driversource(name):
+    return '''\
+#include "V{name}.h"
+#include "verilated.h"
+#include <cstdint>
+#include <cstdio>
+#include <vector>
+
+int main(int argc, char **argv, char **env) {{
+    Verilated::commandArgs(argc, argv);
+    V{name}* top = new V{name};
+    top->op_a_shift = 0;
+
+    uint32_t header[2];
+    std::vector<uint16_t> tests, results;
+    while (fread(header, sizeof(header), 1, stdin) == 1) {{
+        uint32_t opcode = header[0], ntests = header[1];
+        tests.resize(3 * ntests);
+        results.resize(2 * ntests);
+        if (fread(tests.data(), sizeof(uint16_t), tests.size(), stdin) != tests.size())
+            break;
+
+        top->op_code = opcode & 0x1ff;
+        for (uint32_t i = 0; i < ntests; i++) {{
+            top->op_a = tests[3*i];
+            top->op_b = tests[3*i+1];
+            top->op_d_p = tests[3*i+2];
+            top->eval();
+            results[2*i] = top->res;
+            results[2*i+1] = top->res_p;
+        }}
+        fwrite(results.data(), sizeof(uint16_t), results.size(), stdout);
+        fflush(stdout);
+    }}
+
+    delete top;
+    return 0;
+}}'''.format(name=name)
+
+def pack(opcode, a, b, d=0):
+    a = np.asarray(a)
+    tests = np.empty((len(a), 3), dtype='<u2')
+    tests[:, 0] = a
+    tests[:, 1] = b
+    tests[:, 2] = d
+    return FRAME.pack(opcode, len(a)) + tests.tobytes()
+
+def unpack(data):
+    results = np.frombuffer(data, dtype='<u2').reshape(-1, 2)
+    return results[:, 0], results[:, 1]
+
+class Driver:
+    # A running persistent driver; run() sends one frame and returns
+    # the (res, res_p) arrays.
+
+    def __init__(self, binary):
+        self.process = subprocess.Popen([binary], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+
+    @classmethod
+    def build(cls, sources, top, cache=CACHE):
+        return cls(build(sources, top, driversource(top), cache))
+
+    def run(self, opcode, a, b, d=0):
+        frame = pack(opcode, a, b, d)
+        self.process.stdin.write(frame)
+        self.process.stdin.flush()
+        n = 4 * ((len(frame) - FRAME.size) // 6)
+        data = self.process.stdout.read(n)
+        assert len(data) == n, 'driver exited'
+        return unpack(data)
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 def run_verilator_test(verilog_file_name, driver_name, top_module):
     (_, filename, _, _, _, _) = inspect.getouterframes(inspect.currentframe())[1]
     file_path = os.path.dirname(filename)
     build_dir = os.path.join(file_path, 'build')
-    assert not subprocess.call('verilator -Wall -Wno-INCABSPATH -Wno-DECLFILENAME --cc {}.v --exe {}.cpp --top-module {}'.format(verilog_file_name, driver_name, top_module), cwd=build_dir, shell=True)
-    assert not subprocess.call('make -C obj_dir -j -f V{0}.mk V{0}'.format(top_module), cwd=build_dir, shell=True)
-    assert not subprocess.call('./obj_dir/V{}'.format(top_module), cwd=build_dir, shell=True)
+    with open(os.path.join(build_dir, driver_name + '.cpp')) as f:
+        driver = f.read()
+    binary = build([os.path.join(build_dir, verilog_file_name + '.v')], top_module, driver,
+                   os.path.join(build_dir, 'cache'),
+                   '-Wall -Wno-INCABSPATH -Wno-DECLFILENAME')
+    assert not subprocess.call(binary, cwd=build_dir, shell=True)